@@ -0,0 +1,222 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from .interpreters import build_interpreter_wheels
+from .logger import setup_logging
+from .projects import build_projects
+from .symbols import Symbolizer, symbolize
+from .sysinfo import default_parallelism
+
+
+def _symbolize(args: argparse.Namespace):
+    symbolizer = Symbolizer()
+    for path in args.map:
+        symbolizer.load(path)
+    sys.stdout.writelines(symbolize(args.input, symbolizer))
+
+
+def _cythonize(args: argparse.Namespace):
+    import setuptools  # noqa: F401, must come before importing Cython
+    from Cython.Build import cythonize
+    from setuptools.extension import Extension
+
+    from .ninja import move_cython_depfile
+
+    pyx_path = Path(args.pyx)
+    generated = pyx_path.with_suffix(".cpp" if args.cplus else ".c")
+    # cythonize writes to build_dir/<.pyx path>
+    output = Path(args.output)
+    build_dir = None
+    if output != generated:
+        build_dir = str(output)[: -len(str(generated))] or None
+
+    cythonize(
+        [Extension("*", [str(pyx_path)], include_dirs=args.include_dirs)],
+        force=True,
+        quiet=True,
+        language="c++" if args.cplus else None,
+        compiler_directives=json.loads(args.directives),
+        include_path=args.include_dirs,
+        build_dir=build_dir,
+        c_line_in_traceback=args.c_line_in_traceback,
+        depfile=True,
+    )
+    move_cython_depfile(str(output))
+
+
+def _build_projects(args: argparse.Namespace):
+    setup_logging({"verbose": "info"})
+    config_settings = dict(setting.split("=", 1) for setting in args.config_settings)
+    if not build_projects(args.projects, args.outdir, args.jobs, config_settings):
+        sys.exit(1)
+
+
+def _build_wheels(args: argparse.Namespace):
+    setup_logging({"verbose": "info"})
+    config_settings = dict(setting.split("=", 1) for setting in args.config_settings)
+    try:
+        built = build_interpreter_wheels(
+            args.project, args.interpreters, args.outdir, args.jobs, config_settings
+        )
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+    if not built:
+        sys.exit(1)
+
+
+def _rebuild(args: argparse.Namespace):
+    from .build import rebuild_extensions
+
+    config_settings = dict(setting.split("=", 1) for setting in args.config_settings)
+    rebuild_extensions(args.modules, config_settings)
+
+
+def _toolchain(args: argparse.Namespace):
+    from .toolchain import capabilities, compiler_command
+
+    setup_logging({"verbose": "info"})
+    print(f"compiler: {' '.join(compiler_command())}")
+    for capability, supported in capabilities(refresh=args.refresh).items():
+        print(f"{capability}: {'yes' if supported else 'no'}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m hwh_backend")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    symbolize_parser = commands.add_parser(
+        "symbolize",
+        help="rewrite Cython C symbols in perf script or collapsed stack output "
+        "to Cython functions and source lines",
+    )
+    symbolize_parser.add_argument(
+        "input",
+        nargs="?",
+        type=argparse.FileType("r"),
+        default=sys.stdin,
+        help="profiler output (default: stdin)",
+    )
+    symbolize_parser.add_argument(
+        "--map",
+        action="append",
+        type=Path,
+        default=[],
+        help="symbol map, or a directory to search for them. Maps next to the "
+        "extensions in perf script output are found automatically",
+    )
+    symbolize_parser.set_defaults(func=_symbolize)
+
+    cythonize_parser = commands.add_parser(
+        "cythonize",
+        help="translate a .pyx file like the backend does, used by build.ninja",
+    )
+    cythonize_parser.add_argument("pyx")
+    cythonize_parser.add_argument("-o", dest="output", required=True)
+    cythonize_parser.add_argument(
+        "-I", dest="include_dirs", action="append", default=[]
+    )
+    cythonize_parser.add_argument("--directives", default="{}")
+    cythonize_parser.add_argument("--cplus", action="store_true")
+    cythonize_parser.add_argument(
+        "--no-c-in-traceback", dest="c_line_in_traceback", action="store_false"
+    )
+    cythonize_parser.set_defaults(func=_cythonize)
+
+    projects_parser = commands.add_parser(
+        "build-projects",
+        help="build wheels of several projects in the order of their "
+        "dependencies and cimports, sharing one pool of jobs",
+    )
+    projects_parser.add_argument("projects", nargs="+", type=Path)
+    projects_parser.add_argument(
+        "-o", "--outdir", type=Path, default=Path("dist"), help="(default: dist)"
+    )
+    projects_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=default_parallelism()[0],
+        help="parallel jobs of all builds (default: CPUs available)",
+    )
+    projects_parser.add_argument(
+        "-C",
+        "--config-setting",
+        dest="config_settings",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="config setting passed to every build",
+    )
+    projects_parser.set_defaults(func=_build_projects)
+
+    wheels_parser = commands.add_parser(
+        "build-wheels",
+        help="build a wheel of a project for each of several interpreters, "
+        "translating the Cython sources only once",
+    )
+    wheels_parser.add_argument(
+        "project", nargs="?", type=Path, default=Path("."), help="(default: .)"
+    )
+    wheels_parser.add_argument(
+        "-p",
+        "--python",
+        dest="interpreters",
+        action="append",
+        required=True,
+        help="interpreter to build a wheel for, can be given several times",
+    )
+    wheels_parser.add_argument(
+        "-o", "--outdir", type=Path, default=Path("dist"), help="(default: dist)"
+    )
+    wheels_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=default_parallelism()[0],
+        help="parallel jobs of all builds (default: CPUs available)",
+    )
+    wheels_parser.add_argument(
+        "-C",
+        "--config-setting",
+        dest="config_settings",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="config setting passed to every build",
+    )
+    wheels_parser.set_defaults(func=_build_wheels)
+
+    rebuild_parser = commands.add_parser(
+        "rebuild",
+        help="rebuild extension modules of the project in the current directory "
+        "in place, used by the import hook of editable installs",
+    )
+    rebuild_parser.add_argument("modules", nargs="+")
+    rebuild_parser.add_argument(
+        "-C",
+        "--config-setting",
+        dest="config_settings",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="config setting of the editable install",
+    )
+    rebuild_parser.set_defaults(func=_rebuild)
+
+    toolchain_parser = commands.add_parser(
+        "toolchain",
+        help="show which optional flags the compiler and linker support",
+    )
+    toolchain_parser.add_argument(
+        "--refresh", action="store_true", help="probe again instead of the cache"
+    )
+    toolchain_parser.set_defaults(func=_toolchain)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
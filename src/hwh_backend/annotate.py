@@ -0,0 +1,166 @@
+import html
+import os
+import re
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+from setuptools.extension import Extension
+
+from .logger import logger
+
+INDEX_NAME = "index.html"
+
+_LINE_RE = re.compile(
+    r'<pre class="cython line score-(\d+)"[^>]*>[^<]*<span class="">(\d+)</span>:'
+)
+_SCOPE_RE = re.compile(
+    r"^(\s*)(?:async\s+)?(?:(?:cdef\s+)?class|def|cpdef|cdef)\b[^(:=]*?(\w+)\s*[(:]"
+)
+
+
+def _annotate(
+    ext_modules: list[Extension],
+    compiler_directives: dict,
+    include_path: list[str],
+    build_dir: str,
+) -> list[tuple[str, str, str]]:
+    """Run cythonize with annotation into build_dir.
+
+    returns: (module name, .pyx path, .html path) of each extension
+    """
+    from Cython.Build import cythonize
+
+    pyx_sources = {ext.name: ext.sources[0] for ext in ext_modules}
+    cythonized = cythonize(
+        ext_modules,
+        nthreads=0,
+        annotate=True,
+        quiet=True,
+        compiler_directives=compiler_directives,
+        include_path=include_path,
+        build_dir=build_dir,
+    )
+    return [
+        (
+            ext.name,
+            pyx_sources[ext.name],
+            str(Path(ext.sources[0]).with_suffix(".html")),
+        )
+        for ext in cythonized
+    ]
+
+
+def start_annotation(
+    ext_modules: list[Extension],
+    compiler_directives: dict,
+    include_path: list[str],
+    build_dir: Path,
+) -> Future:
+    """Generate the annotation HTML in a low priority background process."""
+    logger.info(f"Generating annotations into {build_dir} in the background")
+    executor = ProcessPoolExecutor(max_workers=1, initializer=os.nice, initargs=(10,))
+    future = executor.submit(
+        _annotate, ext_modules, compiler_directives, include_path, str(build_dir)
+    )
+    executor.shutdown(wait=False)
+    return future
+
+
+def line_scores(html_path: Path) -> dict[int, int]:
+    """Python interaction score of each line of an annotation HTML file."""
+    return {
+        int(lineno): int(score)
+        for score, lineno in _LINE_RE.findall(html_path.read_text())
+    }
+
+
+def _line_scopes(pyx_path: Path) -> dict[int, str]:
+    """Map line numbers of a .pyx file to the qualified name of the enclosing
+    function or class."""
+    scopes: dict[int, str] = {}
+    stack: list[tuple[int, str]] = []
+    for lineno, line in enumerate(pyx_path.read_text().splitlines(), start=1):
+        if line.strip() and not line.lstrip().startswith("#"):
+            indent = len(line) - len(line.lstrip())
+            while stack and stack[-1][0] >= indent:
+                stack.pop()
+            if match := _SCOPE_RE.match(line):
+                stack.append((indent, match.group(2)))
+        scopes[lineno] = ".".join(name for _, name in stack) or "<module>"
+    return scopes
+
+
+def hotspots(
+    annotated: list[tuple[str, str, str]],
+) -> list[tuple[str, str, str, int, int]]:
+    """Count Python interaction (yellow) lines per function.
+
+    returns: (module, function, html path, yellow lines, total score), worst first
+    """
+    result = []
+    for module, pyx_path, html_path in annotated:
+        try:
+            scores = line_scores(Path(html_path))
+            scopes = _line_scopes(Path(pyx_path))
+        except OSError as e:
+            logger.warning(f"Cannot read annotation of {module}: {e}")
+            continue
+
+        functions: dict[str, list[int]] = {}
+        for lineno, score in scores.items():
+            if score > 0:
+                functions.setdefault(scopes.get(lineno, "<module>"), []).append(score)
+        result.extend(
+            (module, function, html_path, len(scored), sum(scored))
+            for function, scored in functions.items()
+        )
+    return sorted(result, key=lambda r: (r[3], r[4]), reverse=True)
+
+
+def _table(headers: list[str], rows: list[list[str]]) -> str:
+    head = "".join(f"<th>{h}</th>" for h in headers)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows
+    )
+    return f"<table><tr>{head}</tr>{body}</table>"
+
+
+def write_hotspot_index(
+    annotated: list[tuple[str, str, str]], build_dir: Path
+) -> Path:
+    """Write an HTML page ranking modules and functions by yellow lines."""
+    ranked = hotspots(annotated)
+
+    def link(module, html_path):
+        href = os.path.relpath(html_path, build_dir)
+        return f'<a href="{html.escape(href)}">{html.escape(module)}</a>'
+
+    modules: dict[str, list] = {}
+    for module, _, html_path, yellow, score in ranked:
+        totals = modules.setdefault(module, [html_path, 0, 0])
+        totals[1] += yellow
+        totals[2] += score
+
+    module_rows = [
+        [link(module, html_path), str(yellow), str(score)]
+        for module, (html_path, yellow, score) in sorted(
+            modules.items(), key=lambda m: (m[1][1], m[1][2]), reverse=True
+        )
+    ]
+    function_rows = [
+        [link(module, html_path), html.escape(function), str(yellow), str(score)]
+        for module, function, html_path, yellow, score in ranked
+    ]
+
+    index_path = build_dir / INDEX_NAME
+    index_path.write_text(
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        "<title>Cython Python interaction hotspots</title></head><body>"
+        "<h1>Modules</h1>"
+        + _table(["Module", "Yellow lines", "Score"], module_rows)
+        + "<h1>Functions</h1>"
+        + _table(["Module", "Function", "Yellow lines", "Score"], function_rows)
+        + "</body></html>\n"
+    )
+    logger.info(f"Wrote annotation hotspot index {index_path}")
+    return index_path
@@ -1,33 +1,109 @@
 import setuptools  # This must come before importing Cython!
+import hashlib
 import json
+import os
 import shutil
 import site
+import sys
 import sysconfig
+import time
 import warnings
 from collections.abc import Sequence
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
 from itertools import chain
 from importlib.metadata import distributions
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple, Union
 
-from Cython.Build import cythonize
+try:
+    import Cython
+except ImportError:  # Building from the generated C of an sdist, see sdist.py
+    Cython = None
 from setuptools.build_meta import (
     build_editable as _build_editable,
 )
 from setuptools.command.build_ext import build_ext
+from setuptools.command.install_lib import install_lib
 from setuptools.dist import Distribution
 from setuptools.extension import Extension
 
-from hwh_backend.hwh_config import SitePackages
+from hwh_backend.hwh_config import CythonConfig, Linker, PerfGate, SitePackages
 
+from . import jobserver, sizes, toolchain
+from .annotate import start_annotation, write_hotspot_index
+from .csource import cython_sources
+from .dispatch import (
+    DISPATCH_PACKAGE,
+    dispatched_modules,
+    expand_dispatch_variants,
+    write_loader,
+)
+from .editable import (
+    EDITABLE_MANIFEST,
+    add_import_hook,
+    extension_sources,
+    hook_source,
+    update_manifest,
+)
+from .incremental import (
+    STAMP_SUFFIX,
+    header_dependencies,
+    remove_if_flags_changed,
+    reuse_objects,
+    write_extension_stamp,
+)
+from .lazy import (
+    LAZY_MODULE,
+    lazy_packages,
+    public_names,
+    read_lazy_submodules,
+    write_lazy_module,
+)
+from .load_report import write_load_report
 from .logger import logger, setup_logging
+from .ninja import (
+    NINJA_FILE,
+    NinjaRecorder,
+    cython_command,
+    move_cython_depfile,
+    run_ninja,
+    supports_jobserver,
+    write_ninja_file,
+)
 from .parser import PyProject
+from .pch import PrecompiledHeader
+from .perf_gate import check_perf_gate
+from .placement import place_file, place_tree
+from .projects import notify_translated
+from .resolver import resolve_paths, stage_cimported_packages
+from .scheduler import CompileJob, CompileScheduler
+from .sdist import (
+    GENERATED_MANIFEST,
+    add_generated_sources,
+    generated_manifest,
+    pregenerated_sources,
+    translated_with_other_settings,
+)
+from .strip import strip_extensions
+from .symbols import write_symbol_map
+from .sysinfo import default_parallelism, memory_limit, parse_size
 
 # Global flag to prevent double builds
 _EXTENSIONS_BUILT = False
 
 # Global flag to pass --config-setting foo=bar values from python -m build
-_CONFIG_OPTIONS: Optional[dict[str, int | bool]] = None
+_CONFIG_OPTIONS: Optional[dict[str, int | bool | str]] = None
+
+# Annotations running in the background and their directories
+_ANNOTATION_JOBS: list[tuple[Future, Path]] = []
+
+# Build settings recorded in the dist-info of wheels
+BUILD_METADATA = "hwh_build.json"
+
+# Only needed to translate, building from the generated C of an sdist doesn't
+CYTHON_REQUIREMENT = "Cython<3.0.0"
 
 
 def _is_editable_install():
@@ -55,19 +131,165 @@ def _is_editable_install():
     return False
 
 
-def get_sitepackages(option: SitePackages):
-    # TODO: move to hwh config
-    match option:
-        case SitePackages.PURELIB:
-            return [sysconfig.get_path("purelib")]
-        case SitePackages.USER:
-            return [site.getusersitepackages()]
-        case SitePackages.SITE:
-            return site.getsitepackages()
-        case SitePackages.NONE:
-            return []
+def _get_cython_config(project: PyProject) -> CythonConfig:
+    """Cython configuration of the project with the selected profile applied."""
+    profile = (_CONFIG_OPTIONS or {}).get("profile")
+    return project.get_hwh_config(profile).cython
+
+
+def _build_base() -> str:
+    """Build directory. Each profile gets its own, so switching profiles
+    doesn't invalidate the objects of the others."""
+    profile = (_CONFIG_OPTIONS or {}).get("profile")
+    return f"build/{profile}" if profile else "build"
+
+
+def _linetrace(config: CythonConfig) -> bool:
+    return (_CONFIG_OPTIONS or {}).get("linetrace", config.linetrace)
+
+
+def _compiler_directives(config: CythonConfig) -> dict[str, str | bool]:
+    compiler_directives = config.compiler_directives.as_dict()
+    if _linetrace(config):
+        compiler_directives["linetrace"] = True
+    return compiler_directives
+
+
+def _optimize_size(config: CythonConfig) -> bool:
+    return (_CONFIG_OPTIONS or {}).get("optimize_size", config.optimize_size)
+
+
+def _optimize_link(config: CythonConfig) -> bool:
+    return (_CONFIG_OPTIONS or {}).get("optimize_link", config.optimize_link)
+
+
+def _size_setting(config: CythonConfig) -> str:
+    """Size optimizations of the build, named for the size report."""
+    enabled = [
+        name
+        for name, on in (
+            ("optimize_size", _optimize_size(config)),
+            ("optimize_link", _optimize_link(config)),
+        )
+        if on
+    ]
+    return "+".join(enabled) or sizes.BASELINE
+
+
+def _record_sizes(config: CythonConfig) -> bool:
+    """Whether the build records its extension sizes: with size optimizations,
+    or as the baseline without them."""
+    return _size_setting(config) != sizes.BASELINE or (_CONFIG_OPTIONS or {}).get(
+        "size_baseline", config.size_baseline
+    )
+
+
+def _extra_compile_args(config: CythonConfig) -> list[str]:
+    # Before the configured arguments, so they can override the defaults
+    extra_compile_args = []
+    if _optimize_size(config):
+        # PyMODINIT_FUNC keeps the module init functions visible
+        extra_compile_args += toolchain.supported_flags(
+            "fvisibility=hidden", "ffunction-sections"
+        )
+    extra_compile_args += config.extra_compile_args
+    if _linetrace(config):
+        extra_compile_args.append("-DCYTHON_TRACE_NOGIL=1")
+    return extra_compile_args
+
+
+def _linker(config: CythonConfig) -> Optional[str]:
+    """-fuse-ld value of the extension modules, None for the compiler's
+    default. -fuse-ld in extra_link_args takes precedence."""
+    if any(arg.startswith("-fuse-ld=") for arg in config.extra_link_args):
+        return None
+    return toolchain.select_linker((_CONFIG_OPTIONS or {}).get("linker", config.linker))
+
+
+def _extra_link_args(config: CythonConfig) -> list[str]:
+    extra_link_args = []
+    if _optimize_size(config):
+        extra_link_args += toolchain.supported_flags("gc-sections")
+    if _optimize_link(config):
+        extra_link_args += toolchain.supported_flags(
+            "Wl,-O1,--hash-style=gnu,--as-needed"
+        )
+    extra_link_args += config.extra_link_args
+    if linker := _linker(config):
+        extra_link_args.append(f"-fuse-ld={linker}")
+    return extra_link_args
+
+
+def _settings_hash(*settings) -> str:
+    return hashlib.sha256(
+        json.dumps(settings, sort_keys=True, default=str).encode()
+    ).hexdigest()[:12]
+
+
+def _cython_build_dir(config: CythonConfig, include_dirs: list[str]) -> Optional[str]:
+    """Directory of the generated C, None for next to the .pyx files.
+
+    Profiles and variants translate into a directory named after the
+    translation settings, so builds with identical directives share the
+    generated C. include_dirs are the resolved ones the .pxd files are found
+    in, e.g. site-packages or the staged cimported packages.
+    """
+    options = _CONFIG_OPTIONS or {}
+    if not (options.get("profile") or options.get("variants")):
+        return None
+    key = _settings_hash(
+        Cython.__version__ if Cython else None,
+        _compiler_directives(config),
+        config.c_line_in_traceback,
+        config.language,
+        include_dirs,
+    )
+    return f"build/cython/{key}"
+
+
+def _generated_c_settings(config: CythonConfig) -> str:
+    """Hash of the settings the generated C of an sdist depends on."""
+    return _settings_hash(
+        _compiler_directives(config), config.c_line_in_traceback, config.language
+    )
+
+
+def _build_temp(config: CythonConfig) -> str:
+    """Directory of the object files, named after the C flags so builds with
+    identical flags share their objects."""
+    key = _settings_hash(
+        sysconfig.get_platform(),
+        sys.implementation.cache_tag,
+        config.language,
+        _extra_compile_args(config),
+        config.include_dirs,
+        config.site_packages,
+        config.use_numpy_include,
+    )
+    return f"build/temp/{key}"
+
+
+def _set_build_dirs(dist: Distribution, config: CythonConfig):
+    dist.command_options["build"] = {
+        "build_base": ("hwh-backend", _build_base()),
+        "build_temp": ("hwh-backend", _build_temp(config)),
+    }
+
+
+def _staging_dir() -> Path:
+    """Directory of the wheel contents, metadata and build reports, per
+    interpreter so wheels for several interpreters can be built side by
+    side."""
+    return (
+        Path(_build_base())
+        / f"bdist.{sysconfig.get_platform()}-{sys.implementation.cache_tag}"
+    )
 
 
+def _set_staging_dirs(dist: Distribution):
+    staging_dir = _staging_dir()
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    dist.command_options["egg_info"] = {"egg_base": ("hwh-backend", str(staging_dir))}
 
 
 def resolve_package_path(
@@ -84,8 +306,43 @@ def resolve_package_path(
     )
 
 
-def _get_ext_modules(project: PyProject, config_settings: Optional[dict] = None):
-    """Get Cython extension modules configuration."""
+def _cythonize(
+    ext_modules: list[Extension], nthreads: int, force: bool, **options
+) -> list[Extension]:
+    """cythonize with one job token per translation, shared with make and the
+    compilers."""
+    from Cython.Build import cythonize
+
+    if nthreads > 1 and len(ext_modules) > 1:
+        with ProcessPoolExecutor(max_workers=nthreads) as executor:
+            futures = []
+            for ext in ext_modules:
+                held = ExitStack()
+                held.enter_context(jobserver.token())
+                future = executor.submit(
+                    partial(cythonize, [ext], force=force, **options)
+                )
+                future.add_done_callback(lambda _, held=held: held.close())
+                futures.append(future)
+            for future in futures:
+                future.result()
+        # The generated C is up to date now, this only collects the extensions
+        # and the dependency tree of the translations in this process
+        force = False
+
+    with jobserver.token():
+        return cythonize(ext_modules, force=force, **options)
+
+
+def _get_ext_modules(
+    project: PyProject,
+    config_settings: Optional[dict] = None,
+    modules: Optional[Sequence[str]] = None,
+):
+    """Get Cython extension modules configuration.
+
+    modules: names of the extension modules to build, all if None
+    """
     logger.debug("=== Starting _get_ext_modules ===")
     logger.debug(f"Project name: {project.package_name}")
     logger.debug(f"Project version: {project.package_version}")
@@ -99,24 +356,11 @@ def _get_ext_modules(project: PyProject, config_settings: Optional[dict] = None)
     logger.debug(f"Parsed build settings: {_CONFIG_OPTIONS}")
 
     # Create directory lists for Extension ctor and cythonize()
-    config = project.get_hwh_config().cython
-    site_packages = get_sitepackages(config.site_packages)
-    logger.debug(f"Site packages: {site_packages}")
-
-    library_dirs = config.library_dirs + site_packages
+    config = _get_cython_config(project)
+    include_dirs, library_dirs = resolve_paths(config)
+    # Package directories of upstream projects in a multi-project build
+    include_dirs += _CONFIG_OPTIONS.get("include_dirs", [])
     runtime_library_dirs = config.runtime_library_dirs
-    include_dirs = config.include_dirs + site_packages
-
-    if config.use_numpy_include:
-        try:
-            import numpy
-
-            include_dirs += [numpy.get_include()]
-        except ModuleNotFoundError as e:
-            logger.error(
-                "Numpy headers requested, but numpy installation was not found"
-            )
-            raise ModuleNotFoundError from e
 
     logger.debug(f"Library dirs: {library_dirs}")
     logger.debug(f"Runtime library dirs: {runtime_library_dirs}")
@@ -132,10 +376,25 @@ def _get_ext_modules(project: PyProject, config_settings: Optional[dict] = None)
         config.exclude_dirs
     )
 
-    linetrace =  _CONFIG_OPTIONS.get("linetrace", False)
-    extra_compile_args = config.extra_compile_args
-    if linetrace:
-        extra_compile_args += ["-DCYTHON_TRACE_NOGIL=1"]
+    if config.site_packages == SitePackages.INDEX:
+        pxd_paths = chain.from_iterable(path.glob("*.pxd") for path in package_paths)
+        # Packages found on the include path aren't looked up in the index
+        included_packages = [
+            path.name
+            for include_dir in _CONFIG_OPTIONS.get("include_dirs", [])
+            for path in Path(include_dir).glob("*")
+            if path.is_dir()
+        ]
+        staging_dir = stage_cimported_packages(
+            chain(pyx_paths, pxd_paths),
+            [*project.packages, *included_packages],
+            Path("build/pxd"),
+        )
+        include_dirs.append(str(staging_dir))
+
+    extra_compile_args = _extra_compile_args(config)
+    extra_link_args = _extra_link_args(config)
+    logger.debug(f"Extra link args: {extra_link_args}")
 
     # Create Extensions
     ext_modules = []
@@ -169,41 +428,108 @@ def _get_ext_modules(project: PyProject, config_settings: Optional[dict] = None)
             library_dirs=library_dirs,
             libraries=config.libraries,
             extra_compile_args=extra_compile_args,
-            extra_link_args=config.extra_link_args,
+            extra_link_args=extra_link_args,
             runtime_library_dirs=runtime_library_dirs,
         )
         logger.debug(f"Created Extension object: {ext.name}")
         ext_modules.append(ext)
 
+    if modules is not None:
+        ext_modules = [ext for ext in ext_modules if ext.name in modules]
+        if missing := set(modules) - {ext.name for ext in ext_modules}:
+            logger.warning(f"No extension modules named {sorted(missing)}")
+
     logger.debug(f"\nTotal extensions to build: {len(ext_modules)}")
     logger.debug("=== Finished _get_ext_modules ===\n")
 
     # Override config values with build settings.
     if not _CONFIG_OPTIONS:
         _CONFIG_OPTIONS = {}
-    nthreads = _CONFIG_OPTIONS.get("nthreads", config.nthreads)
+    nthreads = _resolve_nthreads(config)
     force = _CONFIG_OPTIONS.get("force", config.force)
     annotate = _CONFIG_OPTIONS.get("annotate", config.annotate)
 
-    compiler_directives = config.compiler_directives.as_dict()
-    if linetrace:
-        compiler_directives["linetrace"] = True
+    compiler_directives = _compiler_directives(config)
 
     logger.debug(f"\n=== FORCE = {force} ")
     logger.debug(f"\n=== ANNOTATE = {annotate} ")
     logger.debug(f"\n=== NTHREADS = {nthreads} ")
-    logger.debug(f"\n=== LINETRACE = {linetrace} ")
-
-    cythonized = cythonize(
-        ext_modules,
-        nthreads=nthreads,
-        force=force,
-        annotate=annotate,
-        compiler_directives=compiler_directives,
-        include_path=include_dirs,  # This helps find .pxd files
+    logger.debug(f"\n=== LINETRACE = {_linetrace(config)} ")
+
+    build_dir = _cython_build_dir(config, include_dirs)
+
+    # Building from an sdist with generated C, or with the C translated once
+    # for several interpreters, see sdist.py and interpreters.py
+    manifest_path = Path(_CONFIG_OPTIONS.get("generated_c", GENERATED_MANIFEST))
+    generated_c_settings = _generated_c_settings(config)
+    pregenerated = pregenerated_sources(manifest_path, generated_c_settings)
+    outdated = translated_with_other_settings(manifest_path, generated_c_settings)
+    forced, unforced = [], []
+    for ext in ext_modules:
+        pyx_path = Path(ext.sources[0]).as_posix()
+        if c_path := pregenerated.get(pyx_path):
+            ext.sources = [c_path, *ext.sources[1:]]
+        elif force or pyx_path in outdated:
+            forced.append(ext)
+        else:
+            unforced.append(ext)
+    if pregenerated:
+        logger.info(f"Using the generated C of {len(pregenerated)} modules")
+
+    jobserver.start(nthreads)
+    translated = []
+    for untranslated, force_translation in ((forced, True), (unforced, False)):
+        if not untranslated:
+            continue
+        translated += _cythonize(
+            untranslated,
+            nthreads,
+            force=force_translation,
+            compiler_directives=compiler_directives,
+            include_path=include_dirs,  # This helps find .pxd files
+            build_dir=build_dir,
+            c_line_in_traceback=config.c_line_in_traceback,
+            # ninja's dependencies of the generated C, see ninja.py
+            depfile=_CONFIG_OPTIONS.get("ninja", config.ninja),
+        )
+    if _CONFIG_OPTIONS.get("ninja", config.ninja):
+        for c_path in {ext.sources[0] for ext in translated}:
+            move_cython_depfile(c_path)
+    notify_translated()
+
+    translated_by_name = {ext.name: ext for ext in translated}
+    cythonized = [translated_by_name.get(ext.name, ext) for ext in ext_modules]
+
+    check_perf_gate(
+        {ext.name: Path(ext.sources[0]) for ext in cythonized},
+        Path(config.perf_baseline),
+        PerfGate(_CONFIG_OPTIONS.get("perf_gate", config.perf_gate)),
+        config.perf_gate_threshold,
     )
 
-    return cythonized
+    # Annotation HTML is generated off the critical path on a job token of
+    # its own, the result is collected once the wheel is written
+    if annotate:
+        annotate_dir = Path(_build_base()) / "annotate"
+        held = ExitStack()
+        held.enter_context(jobserver.token())
+        try:
+            job = start_annotation(
+                ext_modules, compiler_directives, include_dirs, annotate_dir
+            )
+        except BaseException:
+            held.close()
+            raise
+        job.add_done_callback(lambda _: held.close())
+        _ANNOTATION_JOBS.append((job, annotate_dir))
+
+    return expand_dispatch_variants(
+        cythonized,
+        config.dispatch_modules,
+        config.dispatch_targets,
+        # Next to the generated C, so variants sharing it share the objects
+        Path(build_dir or "build") / "dispatch",
+    )
 
 
 class EditableBuildExt(build_ext):
@@ -213,11 +539,25 @@ class EditableBuildExt(build_ext):
         super().initialize_options()
         self._is_editable = False
         self._original_build_lib = None
+        self._lazy_imports = False
+        self._symbol_map = False
+        self._pch_headers: list[str] = []
+        self._compile_args: list[str] = []
+        self._ninja = False
+        self._compiler_directives: dict[str, str | bool] = {}
+        self._c_line_in_traceback = True
+        self._memory_budget = None
+        # Variants are never built in place
+        self._variant = False
+        # Only some of the extensions are built, see rebuild_extensions
+        self._partial = False
+        self._size_setting = sizes.BASELINE
+        self._size_record: Optional[Path] = None
 
     def finalize_options(self):
         """Finalize build options and set up editable install if needed."""
         super().finalize_options()
-        self._is_editable = _is_editable_install()
+        self._is_editable = not self._variant and _is_editable_install()
 
         if self._is_editable:
             logger.debug("Configuring for editable install")
@@ -230,13 +570,33 @@ class EditableBuildExt(build_ext):
             logger.debug("Configuring for regular install")
 
         project = PyProject(Path())
-        config = project.get_hwh_config().cython
-        nthreads = config.nthreads
-        if _CONFIG_OPTIONS and "nthreads" in _CONFIG_OPTIONS:
-            nthreads = _CONFIG_OPTIONS["nthreads"]
-            logger.debug("nthreads overridden by command line option")
-        logger.debug(f"Using nthreads={nthreads}")
-        self.parallel = nthreads
+        config = _get_cython_config(project)
+        self.parallel = _resolve_nthreads(config)
+        self._lazy_imports = config.lazy_imports
+        self._symbol_map = (_CONFIG_OPTIONS or {}).get("symbol_map", config.symbol_map)
+        if (_CONFIG_OPTIONS or {}).get(
+            "precompiled_header", config.precompiled_header
+        ):
+            self._pch_headers = [
+                "Python.h",
+                *(["numpy/arrayobject.h"] if config.use_numpy_include else []),
+                *config.pch_headers,
+            ]
+        self._compile_args = _extra_compile_args(config)
+        self._ninja = (_CONFIG_OPTIONS or {}).get("ninja", config.ninja)
+        self._compiler_directives = _compiler_directives(config)
+        self._c_line_in_traceback = config.c_line_in_traceback
+        if self._symbol_map and not config.compiler_directives.emit_code_comments:
+            logger.warning(
+                "symbol_map needs the emit_code_comments directive, "
+                "the symbol maps won't have Cython source locations"
+            )
+        self._memory_budget = _resolve_memory_budget(
+            (_CONFIG_OPTIONS or {}).get("memory_budget", config.memory_budget)
+        )
+        self._size_setting = _size_setting(config)
+        if _record_sizes(config):
+            self._size_record = _staging_dir() / sizes.SIZES_FILE
 
     def run(self):
         """Run the build process."""
@@ -246,6 +606,195 @@ class EditableBuildExt(build_ext):
 
         # Run the actual build
         super().run()
+        self._report_sizes()
+        self._write_dispatch_loaders()
+        if self._lazy_imports:
+            self._write_lazy_modules()
+        if self._symbol_map:
+            self._write_symbol_maps()
+
+    def build_extensions(self):
+        """Build extensions in parallel within the memory budget."""
+        if self._ninja:
+            if ninja := shutil.which("ninja"):
+                self._build_with_ninja(ninja)
+                return
+            logger.warning("ninja not found, building without it")
+
+        reuse_objects(self.compiler, self.force)
+        if not self.force:
+            self._add_header_dependencies()
+        self._use_precompiled_header()
+
+        if self._memory_budget is None:
+            super().build_extensions()
+            return
+
+        self.check_extensions_list(self.extensions)
+        scheduler = CompileScheduler(
+            self._memory_budget,
+            self.parallel or 1,
+            Path(self.build_temp) / "hwh-compile-memory.json",
+        )
+        self.compiler.spawn = scheduler.spawn
+        jobs = [
+            CompileJob(
+                ext.name,
+                ext.sources,
+                ext.language or "c",
+                partial(self.build_extension, ext),
+            )
+            for ext in self.extensions
+        ]
+        for ext, future in zip(self.extensions, scheduler.run(jobs)):
+            with self._filter_build_errors(ext):
+                future.result()
+
+    def build_extension(self, ext):
+        ext_path = self.get_ext_fullpath(ext.name)
+        # Per output, not per build temp: builds with other flags have their
+        # own build temp but write the same output
+        stamp_path = (
+            Path("build/temp/extensions")
+            / f"{ext.name}-{_settings_hash(os.path.abspath(ext_path))}{STAMP_SUFFIX}"
+        )
+        if not self.force:
+            remove_if_flags_changed(ext, ext_path, stamp_path)
+        # One job token per extension, shared with make and the compilers
+        with jobserver.token():
+            super().build_extension(ext)
+        write_extension_stamp(ext, stamp_path)
+
+    def copy_file(self, infile, outfile, *args, **kwargs):
+        """Place built extensions with reflinks or hardlinks, see place_file."""
+        if self.dry_run:
+            return super().copy_file(infile, outfile, *args, **kwargs)
+        return outfile, place_file(Path(infile), Path(outfile))
+
+    def _use_precompiled_header(self):
+        if self._pch_headers:
+            PrecompiledHeader(
+                self.compiler,
+                self._pch_headers,
+                Path(self.build_temp) / "pch",
+                self._compile_args,
+            ).install()
+
+    def _build_with_ninja(self, ninja: str):
+        """Write the build steps into build.ninja and run ninja on it.
+
+        The compile and link commands are recorded from a forced build_ext run
+        that doesn't execute them, so they are exactly what build_ext would
+        run.
+        """
+        self.check_extensions_list(self.extensions)
+        recorder = NinjaRecorder()
+        self.compiler.spawn = recorder.spawn
+        force, self.force = self.force, True
+        self.compiler.force = True
+        self._use_precompiled_header()
+        try:
+            for ext in self.extensions:
+                self.build_extension(ext)
+        finally:
+            self.force = self.compiler.force = force
+
+        cython_commands = {}
+        for ext in self.extensions:
+            for source in ext.sources:
+                for pyx_path in cython_sources(Path(source)):
+                    cython_commands[source] = cython_command(
+                        str(pyx_path),
+                        source,
+                        self._compiler_directives,
+                        ext.include_dirs,
+                        self._c_line_in_traceback,
+                        cplus=ext.language == "c++",
+                    )
+
+        build_base = Path(self.get_finalized_command("build").build_base)
+        ninja_file = write_ninja_file(
+            build_base / NINJA_FILE, recorder.commands, cython_commands
+        )
+        jobs = self.parallel or 1
+        if jobserver.current() and supports_jobserver(ninja):
+            jobs = None
+        run_ninja(ninja, ninja_file, jobs)
+
+    def _add_header_dependencies(self):
+        """Rebuild extensions whose headers changed since the last build.
+
+        build_ext only compares the extension against its sources, the
+        headers come from the depfiles of the previous compile.
+        """
+        for ext in self.extensions:
+            objects = self.compiler.object_filenames(
+                ext.sources, output_dir=self.build_temp
+            )
+            headers = header_dependencies(objects)
+            ext.depends = [*ext.depends, *(h for h in headers if h not in ext.depends)]
+
+    def _report_sizes(self):
+        """Record the extension sizes, and with size optimizations report them
+        against the baseline."""
+        if self._size_record is None:
+            return
+        built = {
+            ext.name: Path(self.get_ext_fullpath(ext.name)) for ext in self.extensions
+        }
+        records = sizes.record_sizes(self._size_record, self._size_setting, built)
+        if self._size_setting == sizes.BASELINE:
+            return
+        report = sizes.size_report(records, self._size_setting, list(built))
+        report_path = _staging_dir() / sizes.SIZE_REPORT
+        # bdist_wheel runs build_ext again, with nothing left to build
+        if report_path.exists() and report_path.read_text() == report:
+            return
+        report_path.write_text(report)
+        logger.info(f"{report}Written to {report_path}")
+
+    def _write_dispatch_loaders(self):
+        """Write the import-time loaders of CPU dispatched modules."""
+        ext_names = [ext.name for ext in self.extensions]
+        for module_name, idents in dispatched_modules(ext_names).items():
+            loader_path = Path(self.get_ext_fullpath(module_name)).with_name(
+                f"{module_name.rpartition('.')[2]}.py"
+            )
+            filename = Path(self.get_ext_filename(module_name)).name
+            write_loader(loader_path, module_name, idents, filename)
+
+    def _write_symbol_maps(self):
+        """Write the C symbol to Cython source map next to each extension."""
+        for ext in self.extensions:
+            c_sources = [s for s in ext.sources if s.endswith((".c", ".cpp"))]
+            if c_sources:
+                write_symbol_map(
+                    Path(c_sources[0]), Path(self.get_ext_fullpath(ext.name))
+                )
+
+    def _write_lazy_modules(self):
+        """Write a PEP 562 lazy loader into each package with extensions."""
+        modules = {}
+        for ext in self.extensions:
+            name_parts = ext.name.split(".")
+            if DISPATCH_PACKAGE in name_parts:
+                # Variants are imported through their loader module
+                del name_parts[-3:-1]
+            pyx_paths = chain.from_iterable(
+                cython_sources(Path(source)) for source in ext.sources
+            )
+            modules[".".join(name_parts)] = sorted(
+                chain.from_iterable(map(public_names, pyx_paths))
+            )
+
+        for package, submodules in lazy_packages(modules).items():
+            lazy_path = Path(
+                self.get_ext_fullpath(f"{package}.{LAZY_MODULE}")
+            ).with_name(f"{LAZY_MODULE}.py")
+            if self._partial:
+                # Keep the modules that weren't rebuilt
+                submodules = read_lazy_submodules(lazy_path) | submodules
+            write_lazy_module(lazy_path, package, submodules)
 
     def _copy_extension_files(self):
         """Copy extension files to their final locations for editable installs."""
@@ -267,10 +816,42 @@ class EditableBuildExt(build_ext):
             # Ensure target directory exists
             target_path.parent.mkdir(parents=True, exist_ok=True)
 
-            # Copy the extension file
+            # Place the extension file
             if ext_path.exists():
-                shutil.copy2(ext_path, target_path)
-                logger.debug(f"Copied {ext_path} to {target_path}")
+                place_file(Path(ext_path), target_path)
+
+
+class PlacingInstallLib(install_lib):
+    """install_lib placing the built files into the wheel with reflinks or
+    hardlinks instead of copying them."""
+
+    def copy_tree(self, infile, outfile, *args, **kwargs):
+        if self.dry_run or self.get_exclusions():
+            return super().copy_tree(infile, outfile, *args, **kwargs)
+        return place_tree(Path(infile), Path(outfile))
+
+
+def _resolve_nthreads(config: CythonConfig) -> int:
+    """Parallelism of both Cython translation and C compilation."""
+    if _CONFIG_OPTIONS and "nthreads" in _CONFIG_OPTIONS:
+        nthreads, source = _CONFIG_OPTIONS["nthreads"], "config settings"
+    elif config.nthreads is not None:
+        nthreads, source = config.nthreads, "pyproject.toml"
+    else:
+        nthreads, source = default_parallelism()
+    logger.info(f"Using nthreads={nthreads} (from {source})")
+    return nthreads
+
+
+def _resolve_memory_budget(memory_budget: str) -> Optional[int]:
+    """Memory budget of parallel compile jobs in bytes, None for no limit."""
+    match memory_budget.lower():
+        case "none":
+            return None
+        case "auto":
+            return memory_limit()
+        case _:
+            return parse_size(memory_budget)
 
 
 def _parse_build_settings(config_settings: dict | None = None) -> dict[str, bool | int]:
@@ -295,6 +876,72 @@ def _parse_build_settings(config_settings: dict | None = None) -> dict[str, bool
         if config_settings.get("linetrace"):
             result["linetrace"] = True
 
+        if profile := config_settings.get("profile"):
+            result["profile"] = profile
+
+        if variants := config_settings.get("variants"):
+            result["variants"] = [
+                variant.strip() for variant in variants.split(",") if variant.strip()
+            ]
+
+        if memory_budget := config_settings.get("memory_budget"):
+            result["memory_budget"] = memory_budget
+
+        if perf_gate := config_settings.get("perf_gate"):
+            match perf_gate.lower():
+                case "true":
+                    result["perf_gate"] = PerfGate.FAIL
+                case "false":
+                    result["perf_gate"] = PerfGate.OFF
+                case _:
+                    result["perf_gate"] = PerfGate(perf_gate.lower())
+
+        if strip := config_settings.get("strip"):
+            result["strip"] = strip.lower() == "true"
+
+        if split_debug := config_settings.get("split_debug"):
+            result["split_debug"] = split_debug.lower() == "true"
+
+        if symbol_map := config_settings.get("symbol_map"):
+            result["symbol_map"] = symbol_map.lower() == "true"
+
+        if precompiled_header := config_settings.get("precompiled_header"):
+            result["precompiled_header"] = precompiled_header.lower() == "true"
+
+        if ninja := config_settings.get("ninja"):
+            result["ninja"] = ninja.lower() == "true"
+
+        if rebuild_on_import := config_settings.get("rebuild_on_import"):
+            result["rebuild_on_import"] = rebuild_on_import.lower() == "true"
+
+        if sdist_generated_c := config_settings.get("sdist_generated_c"):
+            result["sdist_generated_c"] = sdist_generated_c.lower() == "true"
+
+        if optimize_size := config_settings.get("optimize_size"):
+            result["optimize_size"] = optimize_size.lower() == "true"
+
+        if optimize_link := config_settings.get("optimize_link"):
+            result["optimize_link"] = optimize_link.lower() == "true"
+
+        if size_baseline := config_settings.get("size_baseline"):
+            result["size_baseline"] = size_baseline.lower() == "true"
+
+        if load_report := config_settings.get("load_report"):
+            result["load_report"] = load_report.lower() == "true"
+
+        if linker := config_settings.get("linker"):
+            result["linker"] = Linker(linker.lower())
+
+        if generated_c := config_settings.get("generated_c"):
+            result["generated_c"] = generated_c
+
+        if include_dirs := config_settings.get("include_dirs"):
+            result["include_dirs"] = [
+                include_dir
+                for include_dir in include_dirs.split(os.pathsep)
+                if include_dir
+            ]
+
     except Exception:
         logger.exception("Error parsing config settings")
         return {}
@@ -302,11 +949,28 @@ def _parse_build_settings(config_settings: dict | None = None) -> dict[str, bool
     return result
 
 
+def _finish_annotation():
+    """Wait for the background annotations and index their results. Runs
+    before the jobserver is stopped, the annotations hold job tokens."""
+    while _ANNOTATION_JOBS:
+        job, annotate_dir = _ANNOTATION_JOBS.pop(0)
+        try:
+            annotated = job.result()
+        except Exception:
+            logger.exception("Generating annotations failed")
+            continue
+        write_hotspot_index(annotated, annotate_dir)
+
+
 def _build_extension(
-    inplace: bool = False, config_settings={}
+    inplace: bool = False,
+    config_settings={},
+    variant: bool = False,
+    modules: Optional[Sequence[str]] = None,
 ) -> dict[str, Any]:
     """Build the extension modules with better editable install handling.
 
+    modules: names of the extension modules to build, all if None
     returns: dict of kwargs for Distribution object
     """
 
@@ -319,7 +983,9 @@ def _build_extension(
     dist_kwargs = {
         "name": name,
         "version": project.package_version,
-        "ext_modules": _get_ext_modules(project, config_settings=config_settings),
+        "ext_modules": _get_ext_modules(
+            project, config_settings=config_settings, modules=modules
+        ),
         "packages": project.packages,
         "package_data": {pkg: ["*.pxd", "*.so"] for pkg in project.packages},
         "include_package_data": True,
@@ -329,9 +995,12 @@ def _build_extension(
 
     dist = Distribution(dist_kwargs)
     dist.has_ext_modules = lambda: True
+    _set_build_dirs(dist, _get_cython_config(project))
 
     cmd = EditableBuildExt(dist)
     cmd.inplace = inplace
+    cmd._variant = variant
+    cmd._partial = modules is not None
     cmd.ensure_finalized()
     cmd.run()
 
@@ -340,51 +1009,130 @@ def _build_extension(
     return dist_kwargs
 
 
-def build_wheel(wheel_directory, config_settings=None, metadata_directory=None):
-    """Build wheel with explicit editable install handling."""
+def _build_variants():
+    """Build the extensions of each requested variant into build/<variant>.
+
+    Variants are profiles built next to the main build. They share the
+    generated C and the object files of builds with identical settings.
+    """
+    options = _CONFIG_OPTIONS or {}
+    profile = options.get("profile")
+    for variant in options.get("variants", []):
+        if variant == profile:
+            continue
+        logger.info(f"Building variant {variant}")
+        options["profile"] = variant
+        try:
+            _build_extension(variant=True)
+        finally:
+            options["profile"] = profile
+
 
+def get_requires_for_build_wheel(config_settings=None):
+    """Cython, unless the generated C of an sdist covers every module."""
     setup_logging(config_settings)
-    logger.info("=== Starting build_wheel ===")
+    global _CONFIG_OPTIONS
+    if not _CONFIG_OPTIONS:
+        _CONFIG_OPTIONS = _parse_build_settings(config_settings)
 
     project = PyProject(Path())
+    config = _get_cython_config(project)
+    # Annotations and variants are always translated
+    if _CONFIG_OPTIONS.get("annotate", config.annotate) or _CONFIG_OPTIONS.get(
+        "variants"
+    ):
+        return [CYTHON_REQUIREMENT]
+    manifest_path = Path(_CONFIG_OPTIONS.get("generated_c", GENERATED_MANIFEST))
+    pregenerated = pregenerated_sources(manifest_path, _generated_c_settings(config))
+    pyx_paths = _collect_pyx_paths(
+        project.get_all_package_paths(), config.sources, config.exclude_dirs
+    )
+    if all(path.as_posix() in pregenerated for path in pyx_paths):
+        logger.info("Building from the generated C, Cython isn't needed")
+        return []
+    return [CYTHON_REQUIREMENT]
 
-    # Build extensions first, this now handles all the Distribution setup
-    dist_kwargs = {
-        "entry_points": project.entrypoints,
-        "install_requires": [str(d) for d in project.runtime_dependencies],
-        "extras_require": project.toml.get("project", {}).get("optional-dependencies", None)
-    }
-    if not _EXTENSIONS_BUILT:
-        dist_kwargs |= _build_extension(
-            _is_editable_install(), config_settings=config_settings
-        )
-    else:
-        logger.debug("Extensions already built, skipping")
 
-    from wheel.bdist_wheel import bdist_wheel as wheel_command
+def get_requires_for_build_editable(config_settings=None):
+    return [CYTHON_REQUIREMENT]
 
-    class BdistWheelCommand(wheel_command):
-        def finalize_options(self):
-            super().finalize_options()
-            self.root_is_pure = False
-            self.user_options = config_settings
 
-        def run(self):
-            logger.debug("Running custom bdist_wheel command")
-            super().run()
+def get_requires_for_build_sdist(config_settings=None):
+    """Cython if the generated C is added to the sdist."""
+    config = _get_cython_config(PyProject(Path()))
+    if _parse_build_settings(config_settings).get(
+        "sdist_generated_c", config.sdist_generated_c
+    ):
+        return [CYTHON_REQUIREMENT]
+    return []
 
-    # Create distribution using same config from _build_extension
-    dist = Distribution(dist_kwargs)
-    dist.cmdclass = {"build_ext": EditableBuildExt}
-    dist.has_ext_modules = lambda: True
 
-    cmd = BdistWheelCommand(dist)
-    cmd.dist_dir = wheel_directory
-    cmd.distribution.script_name = "fubar"
-    cmd.ensure_finalized()
-    logger.debug("Starting wheel build")
-    cmd.run()
-    logger.debug("Finished wheel build")
+def build_wheel(wheel_directory, config_settings=None, metadata_directory=None):
+    """Build wheel with explicit editable install handling."""
+
+    setup_logging(config_settings)
+    logger.info("=== Starting build_wheel ===")
+
+    try:
+        project = PyProject(Path())
+
+        # Build extensions first, this now handles all the Distribution setup
+        dist_kwargs = {
+            "entry_points": project.entrypoints,
+            "install_requires": [str(d) for d in project.runtime_dependencies],
+            "extras_require": project.toml.get("project", {}).get("optional-dependencies", None)
+        }
+        if not _EXTENSIONS_BUILT:
+            dist_kwargs |= _build_extension(
+                _is_editable_install(), config_settings=config_settings
+            )
+            _build_variants()
+        else:
+            logger.debug("Extensions already built, skipping")
+
+        from wheel.bdist_wheel import bdist_wheel as wheel_command
+
+        class BdistWheelCommand(wheel_command):
+            def finalize_options(self):
+                super().finalize_options()
+                self.root_is_pure = False
+                self.user_options = config_settings
+
+            def run(self):
+                logger.debug("Running custom bdist_wheel command")
+                super().run()
+
+            def write_wheelfile(self, wheelfile_base, *args, **kwargs):
+                # Called once everything is installed into bdist_dir, right
+                # before the archive is made. Only the copies in bdist_dir are
+                # stripped, build_lib keeps the unstripped extensions.
+                _strip_wheel_contents(Path(self.bdist_dir))
+                _report_load_costs(Path(self.bdist_dir))
+                _write_build_metadata(Path(wheelfile_base))
+                super().write_wheelfile(wheelfile_base, *args, **kwargs)
+
+        # Create distribution using same config from _build_extension
+        dist = Distribution(dist_kwargs)
+        dist.cmdclass = {
+            "build_ext": EditableBuildExt,
+            "install_lib": PlacingInstallLib,
+        }
+        dist.has_ext_modules = lambda: True
+        _set_build_dirs(dist, _get_cython_config(project))
+
+        _set_staging_dirs(dist)
+
+        cmd = BdistWheelCommand(dist)
+        cmd.dist_dir = wheel_directory
+        cmd.bdist_dir = str(_staging_dir() / "wheel")
+        cmd.distribution.script_name = "fubar"
+        cmd.ensure_finalized()
+        logger.debug("Starting wheel build")
+        cmd.run()
+        logger.debug("Finished wheel build")
+    finally:
+        _finish_annotation()
+        jobserver.stop()
 
     # Find the built wheel
     wheel_path = next(Path(wheel_directory).glob("*.whl"))
@@ -393,6 +1141,44 @@ def build_wheel(wheel_directory, config_settings=None, metadata_directory=None):
     return wheel_path.name
 
 
+def _write_build_metadata(dist_info: Path):
+    """Record how the extensions were built in the dist-info of the wheel."""
+    config = _get_cython_config(PyProject(Path()))
+    # The compiler uses the last -fuse-ld, also one of extra_link_args
+    linkers = [
+        arg.removeprefix("-fuse-ld=")
+        for arg in _extra_link_args(config)
+        if arg.startswith("-fuse-ld=")
+    ]
+    metadata = {
+        "compiler": toolchain.compiler_command(),
+        "linker": linkers[-1] if linkers else "default",
+    }
+    (dist_info / BUILD_METADATA).write_text(json.dumps(metadata, indent=2))
+
+
+def _report_load_costs(bdist_dir: Path):
+    """Measure the load cost of the extensions as they are shipped, if
+    requested."""
+    config = _get_cython_config(PyProject(Path()))
+    if (_CONFIG_OPTIONS or {}).get("load_report", config.load_report):
+        write_load_report(bdist_dir, _staging_dir())
+
+
+def _strip_wheel_contents(bdist_dir: Path):
+    """Strip extension modules in the wheel staging directory if requested."""
+    config = _get_cython_config(PyProject(Path()))
+    options = _CONFIG_OPTIONS or {}
+    split_debug = options.get("split_debug", config.split_debug)
+    strip = options.get("strip", config.strip) or split_debug
+    if not strip:
+        return
+
+    debug_dir = Path(config.debug_dir).absolute() if split_debug else None
+    logger.info(f"Stripping extensions (debug info to {debug_dir})")
+    strip_extensions(bdist_dir, debug_dir)
+
+
 def build_editable(wheel_directory, config_settings=None, metadata_directory=None):
     """Build editable wheel."""
 
@@ -404,23 +1190,119 @@ def build_editable(wheel_directory, config_settings=None, metadata_directory=Non
 
     # Editable install=inplace
     logger.debug(f"passing config {config_settings}")
-    if not _EXTENSIONS_BUILT:
-        _build_extension(inplace=True, config_settings=config_settings)
+    started_ns = time.time_ns()
+    sources = {}
+    try:
+        if not _EXTENSIONS_BUILT:
+            dist_kwargs = _build_extension(
+                inplace=True, config_settings=config_settings
+            )
+            sources = extension_sources(dist_kwargs["ext_modules"])
+            _build_variants()
 
-    logger.debug("Calling setuptools build_editable")
-    result = _build_editable(wheel_directory, config_settings, metadata_directory)
+        logger.debug("Calling setuptools build_editable")
+        result = _build_editable(wheel_directory, config_settings, metadata_directory)
+    finally:
+        _finish_annotation()
+        jobserver.stop()
+
+    project = PyProject(Path())
+    config = _get_cython_config(project)
+    if (_CONFIG_OPTIONS or {}).get("rebuild_on_import", config.rebuild_on_import):
+        update_manifest(Path(EDITABLE_MANIFEST), sources, started_ns)
+        add_import_hook(
+            Path(wheel_directory) / result,
+            project.package_name,
+            hook_source(project.package_name, Path.cwd(), sources, config_settings),
+        )
     logger.debug(f"Editable build result: {result}")
     logger.debug("=== Finished build_editable ===\n")
     return result
 
 
+def rebuild_extensions(modules: Sequence[str], config_settings=None):
+    """Rebuild extension modules of an editable install in place, used by
+    its import hook."""
+    setup_logging(config_settings)
+    started_ns = time.time_ns()
+    try:
+        dist_kwargs = _build_extension(
+            inplace=True, config_settings=config_settings, modules=modules
+        )
+    finally:
+        _finish_annotation()
+        jobserver.stop()
+    update_manifest(
+        Path(EDITABLE_MANIFEST),
+        extension_sources(dist_kwargs["ext_modules"]),
+        started_ns,
+    )
+
+
 def build_sdist(sdist_directory, config_settings=None):
-    """Build source distribution. How is that meant to work with compiled code?"""
+    """Build source distribution, optionally with the generated C so that
+    building a wheel from it doesn't need Cython."""
 
     setup_logging(config_settings)
     from setuptools.build_meta import build_sdist as _build_sdist
 
-    return _build_sdist(sdist_directory, config_settings)
+    result = _build_sdist(sdist_directory, config_settings)
+
+    project = PyProject(Path())
+    config = _get_cython_config(project)
+    if _parse_build_settings(config_settings).get(
+        "sdist_generated_c", config.sdist_generated_c
+    ):
+        _add_generated_c(Path(sdist_directory) / result, project, config_settings)
+    return result
+
+
+def _translate(
+    project: PyProject, config_settings=None, in_sdist: bool = True
+) -> tuple[dict[str, str], dict]:
+    """Translate the extensions.
+
+    returns: .pyx file -> generated C, and the manifest of the generated C
+    """
+    try:
+        ext_modules = _get_ext_modules(project, config_settings=config_settings)
+    finally:
+        _finish_annotation()
+        jobserver.stop()
+
+    # CPU dispatch variants share the C of their module
+    sources = {}
+    for ext in ext_modules:
+        if pyx_paths := cython_sources(Path(ext.sources[0])):
+            sources.setdefault(str(pyx_paths[0]), ext.sources[0])
+
+    from Cython.Build.Dependencies import create_dependency_tree
+
+    # The dependency tree of the cythonize call above
+    dependency_tree = create_dependency_tree()
+    manifest = generated_manifest(
+        sources,
+        dependency_tree.all_dependencies,
+        _generated_c_settings(_get_cython_config(project)),
+        in_sdist=in_sdist,
+    )
+    return sources, manifest
+
+
+def _add_generated_c(sdist_path: Path, project: PyProject, config_settings=None):
+    """Translate the extensions and add the generated C to the sdist."""
+    sources, manifest = _translate(project, config_settings)
+    add_generated_sources(sdist_path, sources, manifest)
+
+
+def translate_extensions(manifest_path: Path, config_settings=None):
+    """Translate the extensions without compiling them, and write the
+    manifest of the generated C that builds use with the generated_c
+    config setting."""
+    setup_logging(config_settings)
+    _, manifest = _translate(PyProject(Path()), config_settings, in_sdist=False)
+    manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    logger.info(f"Translated {len(manifest['files'])} modules")
 
 
 def _pyx_paths_from_sources(sources: Sequence[str], package_paths: Sequence[Path]) -> List[Path]:
@@ -0,0 +1,47 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Optional
+
+from .logger import logger
+
+# Entries kept per cache file, the oldest are dropped first
+_MAX_ENTRIES = 32
+
+
+def cache_dir() -> Path:
+    """Per-user cache directory of hwh-backend."""
+    if override := os.environ.get("HWH_CACHE_DIR"):
+        return Path(override)
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "hwh-backend"
+
+
+def load(name: str, key: str) -> Optional[Any]:
+    """Cached value of key in the cache file name, None if there is none."""
+    try:
+        return json.loads((cache_dir() / f"{name}.json").read_text()).get(key)
+    except (OSError, ValueError):
+        return None
+
+
+def store(name: str, key: str, value: Any):
+    """Store a value in the cache file name. Failing to write is not an error,
+    the value is just computed again next time."""
+    path = cache_dir() / f"{name}.json"
+    try:
+        entries = json.loads(path.read_text())
+    except (OSError, ValueError):
+        entries = {}
+
+    entries.pop(key, None)
+    entries[key] = value
+    entries = dict(list(entries.items())[-_MAX_ENTRIES:])
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}")
+        tmp_path.write_text(json.dumps(entries, indent=2))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.debug(f"Cannot write cache {path}: {e}")
@@ -0,0 +1,129 @@
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+_METADATA_BEGIN = "/* BEGIN: Cython Metadata"
+_METADATA_END = "END: Cython Metadata */"
+
+
+def cython_metadata(c_path: Path) -> dict:
+    """Read the metadata block Cython writes at the top of generated C."""
+    header = []
+    with open(c_path) as f:
+        for line in f:
+            if line.startswith(_METADATA_BEGIN):
+                break
+        else:
+            return {}
+        for line in f:
+            if line.startswith(_METADATA_END):
+                break
+            header.append(line)
+    return json.loads("".join(header))
+
+
+def cython_sources(c_path: Path) -> list[Path]:
+    """The .pyx files the generated C was translated from."""
+    sources = cython_metadata(c_path).get("distutils", {}).get("sources", [])
+    return [Path(source) for source in sources if source.endswith(".pyx")]
+
+
+# Definition of a function generated from Cython code: Python wrapper (pw),
+# Python function implementation (pf) or C function (f)
+_FUNCTION_RE = re.compile(r"^static .*?\b(__pyx_(pw|pf|f)_\w+)\(.*\) \{$")
+_REFNANNY_RE = re.compile(r'__Pyx_RefNannySetupContext\("([^" ]+)')
+_MARKER_RE = re.compile(r'^/\* "(.+?)":(\d+)$')
+
+
+@dataclass
+class CFunction:
+    symbol: str
+    # pw, pf or f
+    kind: str
+    # e.g. "Vector.dot", None if the name couldn't be recovered
+    qualname: Optional[str]
+    # Location of the function definition in the Cython source
+    source_file: Optional[str]
+    source_line: Optional[int]
+    # Lines of the C function body, 1-based, inclusive
+    c_start: int
+    c_end: int
+    body: str
+    # (C line, Cython source, line) of every position marker in the body
+    markers: list[tuple[int, str, int]] = field(default_factory=list)
+
+
+def _decode_scopes(mangled: str) -> list[str]:
+    """Decode Cython's <length><name>_ name mangling."""
+    scopes = []
+    pos = 0
+    while match := re.match(r"\d+", mangled[pos:]):
+        length = int(match.group())
+        start = pos + match.end()
+        name = mangled[start : start + length]
+        if len(name) < length:
+            break
+        scopes.append(name)
+        pos = start + length
+        if mangled[pos : pos + 1] == "_":
+            pos += 1
+    return scopes
+
+
+def _qualname(symbol: str, kind: str, name: str, module_name: str) -> Optional[str]:
+    mangled = symbol[len(f"__pyx_{kind}_") :]
+    if not mangled.endswith(name):
+        return None
+    # Python functions have a counter in front of the name
+    prefix = mangled[: -len(name)].rstrip("0123456789")
+    scopes = _decode_scopes(prefix)[len(module_name.split(".")) :]
+    return ".".join([*scopes, name])
+
+
+def c_functions(c_path: Path) -> list[CFunction]:
+    """Functions generated from Cython code in a generated C file."""
+    module_name = cython_metadata(c_path).get("module_name", "")
+    functions = []
+    location: tuple[Optional[str], Optional[int]] = (None, None)
+    current: Optional[CFunction] = None
+    body: list[str] = []
+
+    with open(c_path) as f:
+        for lineno, line in enumerate(f, start=1):
+            if current is None:
+                if marker := _MARKER_RE.match(line.rstrip()):
+                    location = (marker.group(1), int(marker.group(2)))
+                elif match := _FUNCTION_RE.match(line.rstrip()):
+                    current = CFunction(
+                        symbol=match.group(1),
+                        kind=match.group(2),
+                        qualname=None,
+                        source_file=location[0],
+                        source_line=location[1],
+                        c_start=lineno,
+                        c_end=lineno,
+                        body="",
+                    )
+                    body = []
+                continue
+
+            if line.startswith("}"):
+                current.c_end = lineno
+                current.body = "".join(body)
+                if name := _REFNANNY_RE.search(current.body):
+                    current.qualname = _qualname(
+                        current.symbol, current.kind, name.group(1), module_name
+                    )
+                functions.append(current)
+                current = None
+                continue
+
+            body.append(line)
+            if marker := _MARKER_RE.match(line.strip()):
+                current.markers.append(
+                    (lineno, marker.group(1), int(marker.group(2)))
+                )
+
+    return functions
@@ -0,0 +1,184 @@
+import platform
+from collections import defaultdict
+from pathlib import Path
+
+from setuptools.extension import Extension
+
+from . import toolchain
+from .logger import logger
+from .placement import place_file
+
+# Microarchitecture levels understood by -march, and the /proc/cpuinfo flags
+# each of them requires. Ordered from the baseline to the most demanding.
+_X86_64_V2 = {"cx16", "lahf_lm", "popcnt", "sse4_1", "sse4_2", "ssse3"}
+_X86_64_V3 = _X86_64_V2 | {
+    "abm", "avx", "avx2", "bmi1", "bmi2", "f16c", "fma", "movbe", "xsave"
+}
+_X86_64_V4 = _X86_64_V3 | {"avx512f", "avx512bw", "avx512cd", "avx512dq", "avx512vl"}
+
+CPU_TARGETS: dict[str, set[str]] = {
+    "x86-64": set(),
+    "x86-64-v2": _X86_64_V2,
+    "x86-64-v3": _X86_64_V3,
+    "x86-64-v4": _X86_64_V4,
+}
+
+# Variants of pkg.mod are built as pkg._hwh_dispatch.<target>.mod
+DISPATCH_PACKAGE = "_hwh_dispatch"
+
+_LOADER_TEMPLATE = '''\
+# Generated by hwh-backend. Loads the best CPU specific build of {module}.
+import importlib.machinery
+import importlib.util
+import os
+import sys
+
+# (variant directory, required /proc/cpuinfo flags), best first
+_VARIANTS = {variants!r}
+
+
+def _cpu_flags():
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def _load():
+    forced = os.environ.get("HWH_CPU_TARGET")
+    flags = _cpu_flags()
+    here = os.path.dirname(__file__)
+    for target, required in _VARIANTS:
+        if forced and target != forced.replace("-", "_"):
+            continue
+        if not forced and not set(required) <= flags:
+            continue
+        path = os.path.join(here, "{dispatch_package}", target, {filename!r})
+        loader = importlib.machinery.ExtensionFileLoader(__name__, path)
+        spec = importlib.util.spec_from_file_location(__name__, path, loader=loader)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[__name__] = module
+        spec.loader.exec_module(module)
+        return module
+    raise ImportError("No build of {module} matches this CPU")
+
+
+_load()
+'''
+
+
+def _target_ident(target: str) -> str:
+    return target.replace("-", "_")
+
+
+def _variant_name(module_name: str, target: str) -> str:
+    package, _, name = module_name.rpartition(".")
+    return ".".join(
+        part for part in (package, DISPATCH_PACKAGE, _target_ident(target), name) if part
+    )
+
+
+def expand_dispatch_variants(
+    ext_modules: list[Extension],
+    modules: list[str],
+    targets: list[str],
+    build_dir: Path,
+) -> list[Extension]:
+    """Replace the selected cythonized extensions with one variant per target.
+
+    Each variant compiles its own copy of the generated C under build_dir, so
+    the object files of different targets don't overwrite each other.
+    """
+    if not modules:
+        return ext_modules
+
+    if platform.machine() not in ("x86_64", "AMD64"):
+        logger.warning(
+            f"CPU dispatch is only supported on x86-64, building {modules} normally"
+        )
+        return ext_modules
+
+    unsupported = [t for t in targets if not toolchain.supports(f"march={t}")]
+    if unsupported:
+        logger.warning(
+            f"The compiler doesn't support -march={', '.join(unsupported)}, "
+            "not building these CPU variants"
+        )
+        targets = [target for target in targets if target not in unsupported]
+        if not targets:
+            logger.warning(
+                f"No CPU target is supported by the compiler, building {modules} "
+                "normally"
+            )
+            return ext_modules
+
+    result = []
+    for ext in ext_modules:
+        if ext.name not in modules:
+            result.append(ext)
+            continue
+
+        for target in targets:
+            ident = _target_ident(target)
+            sources = []
+            for source in ext.sources:
+                variant_source = build_dir / ident / Path(source).relative_to(
+                    Path(source).anchor
+                )
+                # Renamed into place, builds running side by side don't see
+                # a partially written copy
+                place_file(Path(source), variant_source)
+                sources.append(str(variant_source))
+
+            variant = Extension(
+                _variant_name(ext.name, target),
+                sources,
+                include_dirs=ext.include_dirs,
+                define_macros=ext.define_macros,
+                undef_macros=ext.undef_macros,
+                library_dirs=ext.library_dirs,
+                libraries=ext.libraries,
+                runtime_library_dirs=ext.runtime_library_dirs,
+                extra_objects=ext.extra_objects,
+                extra_compile_args=ext.extra_compile_args + [f"-march={target}"],
+                extra_link_args=ext.extra_link_args,
+                depends=ext.depends,
+                language=ext.language,
+            )
+            logger.debug(f"Created CPU variant {variant.name} of {ext.name}")
+            result.append(variant)
+
+    return result
+
+
+def dispatched_modules(ext_names: list[str]) -> dict[str, list[str]]:
+    """Map dispatched module names to their variant directories."""
+    modules = defaultdict(list)
+    for name in ext_names:
+        parts = name.split(".")
+        if len(parts) < 3 or parts[-3] != DISPATCH_PACKAGE:
+            continue
+        modules[".".join(parts[:-3] + parts[-1:])].append(parts[-2])
+    return dict(modules)
+
+
+def write_loader(loader_path: Path, module_name: str, idents: list[str], filename: str):
+    """Write the pure Python module that imports the best variant."""
+    order = [_target_ident(target) for target in reversed(CPU_TARGETS)]
+    variants = [
+        (ident, sorted(CPU_TARGETS[ident.replace("_", "-")]))
+        for ident in sorted(idents, key=order.index)
+    ]
+    loader_path.write_text(
+        _LOADER_TEMPLATE.format(
+            module=module_name,
+            variants=variants,
+            dispatch_package=DISPATCH_PACKAGE,
+            filename=filename,
+        )
+    )
+    logger.debug(f"Wrote CPU dispatch loader {loader_path}")
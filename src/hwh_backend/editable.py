@@ -0,0 +1,190 @@
+import base64
+import hashlib
+import json
+import os
+import re
+import zipfile
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Optional
+
+from setuptools.extension import Extension
+
+from .csource import cython_metadata, cython_sources
+from .logger import logger
+
+# Fingerprints of the .pyx files the in-place extensions were built from
+EDITABLE_MANIFEST = "build/hwh-editable.json"
+
+_HOOK_TEMPLATE = '''\
+# Generated by hwh-backend. Rebuilds the extension modules of the editable
+# install of {project} when their .pyx file changed since they were built.
+import os
+import sys
+
+_PROJECT_DIR = {project_dir!r}
+_MANIFEST = {manifest!r}
+# extension module -> .pyx file
+_SOURCES = {sources!r}
+# Config settings of the install, rebuilds use the same flags
+_CONFIG_SETTINGS = {config_settings!r}
+
+
+class _StaleExtensionFinder:
+    """Checks the .pyx file of an extension module before it is imported,
+    and leaves the import itself to the other finders."""
+
+    _fingerprints = None
+
+    @classmethod
+    def find_spec(cls, fullname, path=None, target=None):
+        source = _SOURCES.get(fullname)
+        if source is None:
+            return None
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return None
+        if cls._fingerprints is None:
+            cls._fingerprints = _load_fingerprints()
+        if cls._fingerprints.get(fullname) != [stat.st_mtime_ns, stat.st_size]:
+            _rebuild(fullname)
+            cls._fingerprints = _load_fingerprints()
+        return None
+
+
+def _load_fingerprints():
+    import json
+
+    try:
+        with open(_MANIFEST) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {{}}
+
+
+def _rebuild(fullname):
+    import subprocess
+
+    sys.stderr.write(f"hwh-backend: rebuilding stale extension {{fullname}}\\n")
+    env = dict(os.environ, HWH_REBUILDING="1")
+    cmd = [sys.executable, "-m", "hwh_backend", "rebuild"]
+    for key, value in _CONFIG_SETTINGS.items():
+        cmd += ["-C", f"{{key}}={{value}}"]
+    result = subprocess.run(
+        [*cmd, fullname],
+        cwd=_PROJECT_DIR,
+        env=env,
+    )
+    if result.returncode:
+        import warnings
+
+        warnings.warn(
+            f"Rebuilding {{fullname}} failed, importing the stale build. "
+            "hwh-backend and Cython must be installed to rebuild on import",
+            ImportWarning,
+            stacklevel=2,
+        )
+
+
+if not os.environ.get("HWH_REBUILDING"):
+    sys.meta_path.insert(0, _StaleExtensionFinder)
+'''
+
+
+def fingerprint(path: Path) -> list[int]:
+    """Cheap fingerprint of a source file, compared by the import hook."""
+    stat = path.stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def extension_sources(ext_modules: Iterable[Extension]) -> dict[str, str]:
+    """Importable extension module -> absolute path of its .pyx file.
+
+    CPU dispatched modules are imported through their loader, which has the
+    name of the original module.
+    """
+    sources = {}
+    for ext in ext_modules:
+        c_path = Path(ext.sources[0])
+        pyx_paths = cython_sources(c_path)
+        if pyx_paths:
+            module = cython_metadata(c_path).get("module_name", ext.name)
+            sources[module] = str(pyx_paths[0].absolute())
+    return sources
+
+
+def update_manifest(manifest: Path, sources: dict[str, str], started_ns: int):
+    """Record the fingerprints of the .pyx files of the rebuilt modules.
+
+    A file changed since the build started, i.e. after Cython read it, is left
+    out so the hook rebuilds it again.
+    """
+    try:
+        fingerprints = json.loads(manifest.read_text())
+    except (OSError, ValueError):
+        fingerprints = {}
+
+    for module, source in sources.items():
+        try:
+            current = fingerprint(Path(source))
+        except OSError:
+            continue
+        if current[0] < started_ns:
+            fingerprints[module] = current
+        else:
+            fingerprints.pop(module, None)
+
+    manifest.parent.mkdir(parents=True, exist_ok=True)
+    manifest.write_text(json.dumps(fingerprints, indent=2, sort_keys=True))
+
+
+def hook_module_name(project_name: str) -> str:
+    return "_hwh_editable_" + re.sub(r"\W", "_", project_name).lower()
+
+
+def hook_source(
+    project_name: str,
+    project_dir: Path,
+    sources: dict[str, str],
+    config_settings: Optional[dict[str, str]] = None,
+) -> str:
+    return _HOOK_TEMPLATE.format(
+        project=project_name,
+        project_dir=str(project_dir.absolute()),
+        manifest=str((project_dir / EDITABLE_MANIFEST).absolute()),
+        sources=sources,
+        config_settings=dict(config_settings or {}),
+    )
+
+
+def _record_entry(name: str, data: bytes) -> str:
+    digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b"=")
+    return f"{name},sha256={digest.decode()},{len(data)}"
+
+
+def add_import_hook(wheel_path: Path, project_name: str, source: str):
+    """Add the import hook module and the .pth file installing it to an
+    editable wheel."""
+    module = hook_module_name(project_name)
+    added = {
+        f"{module}.py": source.encode(),
+        f"{module}.pth": f"import {module}\n".encode(),
+    }
+
+    tmp_path = wheel_path.with_name(f"{wheel_path.name}.tmp")
+    with zipfile.ZipFile(wheel_path) as src, zipfile.ZipFile(
+        tmp_path, "w", zipfile.ZIP_DEFLATED
+    ) as dst:
+        for info in src.infolist():
+            data = src.read(info)
+            if info.filename.endswith(".dist-info/RECORD"):
+                data += "".join(
+                    f"{_record_entry(name, content)}\n"
+                    for name, content in added.items()
+                ).encode()
+            dst.writestr(info, data)
+        for name, content in added.items():
+            dst.writestr(name, content)
+    os.replace(tmp_path, wheel_path)
+    logger.info(f"Added import hook {module} to {wheel_path.name}")
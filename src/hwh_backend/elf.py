@@ -0,0 +1,123 @@
+import mmap
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+_SHF_ALLOC = 0x2
+_SHT_RELA = 4
+_SHT_REL = 9
+_SHT_DYNSYM = 11
+_SHN_UNDEF = 0
+# STB_GLOBAL, STB_WEAK and STB_GNU_UNIQUE
+_EXPORTED_BINDINGS = {1, 2, 10}
+# STV_DEFAULT and STV_PROTECTED
+_EXPORTED_VISIBILITIES = {0, 3}
+
+
+@dataclass
+class ElfInfo:
+    """What an extension module costs on disk and when it is loaded."""
+
+    # Size of the file
+    file_size: int
+    # Size of the sections mapped into memory
+    loaded_size: int
+    # Symbols in the dynamic symbol table other objects can bind to
+    exported_symbols: int
+    # Dynamic relocations the loader applies, and the ones of them that need
+    # a symbol lookup
+    relocations: int
+    symbol_relocations: int
+
+
+@dataclass
+class _Section:
+    type: int
+    flags: int
+    offset: int
+    size: int
+    entsize: int
+
+
+def _sections(data, is_64: bool, endian: str) -> list[_Section]:
+    if is_64:
+        shoff, = struct.unpack_from(f"{endian}Q", data, 0x28)
+        shentsize, shnum = struct.unpack_from(f"{endian}HH", data, 0x3A)
+        fmt = f"{endian}IIQQQQIIQQ"
+    else:
+        shoff, = struct.unpack_from(f"{endian}I", data, 0x20)
+        shentsize, shnum = struct.unpack_from(f"{endian}HH", data, 0x2E)
+        fmt = f"{endian}IIIIIIIIII"
+
+    sections = []
+    for index in range(shnum):
+        _, type_, flags, _, offset, size, _, _, _, entsize = struct.unpack_from(
+            fmt, data, shoff + index * shentsize
+        )
+        sections.append(_Section(type_, flags, offset, size, entsize))
+    return sections
+
+
+def _exported_symbols(data, section: _Section, is_64: bool, endian: str) -> int:
+    # (offset of st_info, st_other, st_shndx) in an Elf32_Sym or Elf64_Sym
+    info_offset = 4 if is_64 else 12
+    exported = 0
+    for offset in range(section.offset, section.offset + section.size, section.entsize):
+        info, other, shndx = struct.unpack_from(f"{endian}BBH", data, offset + info_offset)
+        if (
+            shndx != _SHN_UNDEF
+            and info >> 4 in _EXPORTED_BINDINGS
+            and other & 0x3 in _EXPORTED_VISIBILITIES
+        ):
+            exported += 1
+    return exported
+
+
+def _symbol_relocations(
+    data, section: _Section, is_64: bool, endian: str
+) -> int:
+    # r_info follows r_offset in both Elf_Rel and Elf_Rela
+    fmt, shift = (f"{endian}Q", 32) if is_64 else (f"{endian}I", 8)
+    word = 8 if is_64 else 4
+    return sum(
+        1
+        for offset in range(section.offset, section.offset + section.size, section.entsize)
+        if struct.unpack_from(fmt, data, offset + word)[0] >> shift
+    )
+
+
+def elf_info(path: Path) -> Optional[ElfInfo]:
+    """Sizes, exported symbols and dynamic relocations of a shared object,
+    None if it isn't an ELF file.
+
+    raises: ValueError if the file is a truncated or corrupt ELF file
+    """
+    with open(path, "rb") as f:
+        if f.read(4) != b"\x7fELF":
+            return None
+        # Debug builds can be large, only the headers and tables are read
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                return _elf_info(data)
+            except (struct.error, IndexError) as e:
+                raise ValueError(f"{path} is not a valid ELF file: {e}") from e
+
+
+def _elf_info(data) -> ElfInfo:
+    is_64 = data[4] == 2
+    endian = "<" if data[5] == 1 else ">"
+
+    info = ElfInfo(len(data), 0, 0, 0, 0)
+    for section in _sections(data, is_64, endian):
+        if not section.flags & _SHF_ALLOC:
+            continue
+        info.loaded_size += section.size
+        if section.type == _SHT_DYNSYM and section.entsize:
+            info.exported_symbols += _exported_symbols(data, section, is_64, endian)
+        elif section.type in (_SHT_RELA, _SHT_REL) and section.entsize:
+            info.relocations += section.size // section.entsize
+            info.symbol_relocations += _symbol_relocations(
+                data, section, is_64, endian
+            )
+    return info
@@ -1,7 +1,8 @@
-import os
 from dataclasses import dataclass, field
 from enum import StrEnum
-from typing import Union, get_args, get_origin
+from typing import Optional, Union, get_args, get_origin
+
+from .dispatch import CPU_TARGETS
 
 
 class Language(StrEnum):
@@ -14,6 +15,24 @@ class SitePackages(StrEnum):
     USER = "user"  # use site.getusersitepackages()
     SITE = "site"  # use site.getsitepackages()
     NONE = "none"  # don't add sitepackages at all
+    # link only the cimported installed packages into a staging directory
+    INDEX = "index"
+
+
+class PerfGate(StrEnum):
+    OFF = "off"  # don't analyze generated code
+    WARN = "warn"  # warn about functions exceeding the baseline
+    FAIL = "fail"  # fail the build
+    UPDATE = "update"  # write the current counts as the new baseline
+
+
+class Linker(StrEnum):
+    DEFAULT = "default"  # the compiler's default linker
+    AUTO = "auto"  # the fastest linker that works, see toolchain.select_linker
+    BFD = "bfd"
+    GOLD = "gold"
+    LLD = "lld"
+    MOLD = "mold"
 
 
 @dataclass
@@ -58,6 +77,7 @@ class CythonCompilerDirectives:
     # TODO: c_string_type: ?? = ??
     # c_string_unicoding: ?? = ??
     type_version_tag: bool = True
+    emit_code_comments: bool = True
     # TODO: unraisable_traceback: bool = ?
     # TODO: iterable_coroutine: bool = ?
 
@@ -106,9 +126,14 @@ class CythonConfig:
     compiler_directives: CythonCompilerDirectives = field(
         default_factory=CythonCompilerDirectives
     )
-    nthreads: int = field(default_factory=lambda: os.cpu_count() or 1)
+    # None uses the CPUs available to the build, see default_parallelism()
+    nthreads: Optional[int] = None
     force: bool = False
     annotate: bool = False
+    # Cython compiler option, not a directive
+    c_line_in_traceback: bool = True
+    # linetrace directive and the C macro for tracing nogil code
+    linetrace: bool = False
     sources: list[str] = field(default_factory=list)
     exclude_dirs: list[str] = field(default_factory=list)
     include_dirs: list[str] = field(default_factory=list)
@@ -122,6 +147,69 @@ class CythonConfig:
     # include_dirs += numpy.get_include()
     use_numpy_include: bool = False
 
+    # Precompile Python.h, the NumPy headers with use_numpy_include, and
+    # pch_headers once per build and include them into every compile
+    precompiled_header: bool = False
+    pch_headers: list[str] = field(default_factory=list)
+
+    # Strip extension modules while assembling the wheel. With split_debug,
+    # the debug info is kept in separate .debug files under debug_dir
+    strip: bool = False
+    split_debug: bool = False
+    debug_dir: str = "build/debug"
+
+    # Write the build steps into build/build.ninja and build with ninja if it
+    # is installed
+    ninja: bool = False
+
+    # Keep the estimated peak memory of parallel compile jobs under this budget.
+    # "auto" uses the cgroup memory limit if there is one, "none" disables the
+    # limit
+    memory_budget: str = "auto"
+
+    # Compare Python C-API calls and refcount operations per function in the
+    # generated C against a baseline file
+    perf_gate: PerfGate = field(default=PerfGate.OFF)
+    perf_gate_threshold: int = 0
+    perf_baseline: str = "hwh-perf-baseline.json"
+
+    # Write a map from C symbols to Cython functions and source lines next to
+    # each extension, see python -m hwh_backend symbolize
+    symbol_map: bool = False
+
+    # Linker of the extension modules, passed as -fuse-ld
+    linker: Linker = field(default=Linker.DEFAULT)
+
+    # Hide all symbols but the module init functions and drop unreferenced
+    # code and data when linking. optimize_link adds the linker's own
+    # optimizations. Both report the extension sizes against the sizes
+    # recorded by the latest size_baseline build, which has neither
+    optimize_size: bool = False
+    optimize_link: bool = False
+    size_baseline: bool = False
+
+    # Import each extension of the wheel in a fresh interpreter and report
+    # its import time, dlopen time, memory and relocations
+    load_report: bool = False
+
+    # Generate a PEP 562 lazy loader module into packages with extensions
+    lazy_imports: bool = False
+
+    # build_sdist adds the generated C, which wheels built from the sdist
+    # compile without Cython if the sources are unchanged
+    sdist_generated_c: bool = False
+
+    # Editable installs rebuild extension modules whose .pyx file changed
+    # when they are imported
+    rebuild_on_import: bool = False
+
+    # [tool.hwh.cython.cpu_dispatch]: build these modules once per -march
+    # target and pick the best build at import time
+    dispatch_modules: list[str] = field(default_factory=list)
+    dispatch_targets: list[str] = field(
+        default_factory=lambda: ["x86-64", "x86-64-v2", "x86-64-v3", "x86-64-v4"]
+    )
+
     def __post_init__(self):
         if isinstance(self.compiler_directives, dict):
             self.compiler_directives = CythonCompilerDirectives(
@@ -137,6 +225,30 @@ class CythonConfig:
                     f"Invalid language: {self.language}. Valid options {valid_options}"
                 ) from e
 
+        if isinstance(self.perf_gate, str):
+            try:
+                self.perf_gate = PerfGate(self.perf_gate.lower())
+            except ValueError as e:
+                valid_options = [gate.value for gate in PerfGate]
+                raise ValueError(
+                    f"Invalid perf_gate: {self.perf_gate}. Valid options {valid_options}"
+                ) from e
+
+        if isinstance(self.linker, str):
+            try:
+                self.linker = Linker(self.linker.lower())
+            except ValueError as e:
+                valid_options = [linker.value for linker in Linker]
+                raise ValueError(
+                    f"Invalid linker: {self.linker}. Valid options {valid_options}"
+                ) from e
+
+        if invalid := set(self.dispatch_targets) - set(CPU_TARGETS):
+            raise ValueError(
+                f"Invalid CPU dispatch targets: {sorted(invalid)}. "
+                f"Valid options {list(CPU_TARGETS)}"
+            )
+
     @classmethod
     def from_pyproject(cls, tool_config: dict) -> "CythonConfig":
         cython_config = tool_config.get("cython", {})
@@ -148,14 +260,17 @@ class CythonConfig:
         include_dirs = modules.get("include_dirs", [])
         runtime_library_dirs = modules.get("runtime_library_dirs", [])
         library_dirs = modules.get("library_dirs", [])
+        cpu_dispatch = cython_config.get("cpu_dispatch", {})
         return cls(
             language=cython_config.get("language") or Language.C,
             compiler_directives=CythonCompilerDirectives(
                 **cython_config.get("compiler_directives", {})
             ),
-            nthreads=cython_config.get("nthreads", os.cpu_count() or 1),
+            nthreads=cython_config.get("nthreads"),
             force=cython_config.get("force", False),
             annotate=cython_config.get("annotate", False),
+            c_line_in_traceback=cython_config.get("c_line_in_traceback", True),
+            linetrace=cython_config.get("linetrace", False),
             sources=sources,
             exclude_dirs=exclude_dirs,
             include_dirs=include_dirs,
@@ -166,14 +281,68 @@ class CythonConfig:
             runtime_library_dirs=runtime_library_dirs,
             site_packages=cython_config.get("site_packages") or SitePackages.PURELIB,
             use_numpy_include=cython_config.get("use_numpy_include", False),
+            precompiled_header=cython_config.get("precompiled_header", False),
+            pch_headers=cython_config.get("pch_headers", []),
+            strip=cython_config.get("strip", False),
+            split_debug=cython_config.get("split_debug", False),
+            debug_dir=cython_config.get("debug_dir", "build/debug"),
+            ninja=cython_config.get("ninja", False),
+            memory_budget=str(cython_config.get("memory_budget", "auto")),
+            perf_gate=cython_config.get("perf_gate") or PerfGate.OFF,
+            perf_gate_threshold=cython_config.get("perf_gate_threshold", 0),
+            perf_baseline=cython_config.get(
+                "perf_baseline", "hwh-perf-baseline.json"
+            ),
+            symbol_map=cython_config.get("symbol_map", False),
+            linker=cython_config.get("linker") or Linker.DEFAULT,
+            optimize_size=cython_config.get("optimize_size", False),
+            optimize_link=cython_config.get("optimize_link", False),
+            size_baseline=cython_config.get("size_baseline", False),
+            load_report=cython_config.get("load_report", False),
+            lazy_imports=cython_config.get("lazy_imports", False),
+            sdist_generated_c=cython_config.get("sdist_generated_c", False),
+            rebuild_on_import=cython_config.get("rebuild_on_import", False),
+            dispatch_modules=cpu_dispatch.get("modules", []),
+            dispatch_targets=cpu_dispatch.get(
+                "targets", ["x86-64", "x86-64-v2", "x86-64-v3", "x86-64-v4"]
+            ),
         )
 
 
+def _merge_tables(base: dict, override: dict) -> dict:
+    """Recursively merge two TOML tables, values in override win."""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge_tables(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
 class HwhConfig:
-    def __init__(self, pyproject_data: dict):
+    def __init__(self, pyproject_data: dict, profile: Optional[str] = None):
         all_tools = pyproject_data.get("tool")
         config = {}
 
         if all_tools:
             config = all_tools.get("hwh", {})
+
+        # [tool.hwh.profiles.<name>] tables have the same layout as
+        # [tool.hwh.cython] and are merged on top of it
+        self.profiles: dict[str, dict] = config.get("profiles", {})
+        self.profile = profile
+        if profile:
+            try:
+                overrides = self.profiles[profile]
+            except KeyError as e:
+                raise ValueError(
+                    f"Unknown build profile: {profile}. "
+                    f"Valid options {list(self.profiles)}"
+                ) from e
+            config = {
+                **config,
+                "cython": _merge_tables(config.get("cython", {}), overrides),
+            }
+
         self.cython = CythonConfig.from_pyproject(config)
@@ -0,0 +1,122 @@
+import json
+import shlex
+from pathlib import Path
+
+from setuptools._distutils.ccompiler import CCompiler
+from setuptools._distutils.dep_util import newer_group
+from setuptools.extension import Extension
+
+from .logger import logger
+
+STAMP_SUFFIX = ".flags"
+DEPFILE_SUFFIX = ".d"
+
+
+def _stamp(compiler: CCompiler, cc_args, extra_postargs, pp_opts) -> str:
+    return json.dumps(
+        [compiler.compiler_so, cc_args, extra_postargs, pp_opts], sort_keys=True
+    )
+
+
+def parse_depfile(path: str) -> list[str]:
+    """Prerequisites of a make rule written by the compiler with -MMD."""
+    with open(path) as f:
+        content = f.read().replace("\\\n", " ")
+    # Only the first rule, -MP adds empty rules for the headers
+    rule = content.split("\n", 1)[0]
+    _, _, prerequisites = rule.partition(": ")
+    # Spaces in file names are escaped with a backslash
+    return shlex.split(prerequisites.replace("$$", "$"))
+
+
+def object_dependencies(obj: str) -> list[str]:
+    """Source and headers of an object as of its last compile, [] if unknown."""
+    try:
+        return parse_depfile(obj + DEPFILE_SUFFIX)
+    except OSError:
+        return []
+
+
+def header_dependencies(objects: list[str]) -> list[str]:
+    """Headers included by the sources of the objects."""
+    headers = {}
+    for obj in objects:
+        # The source comes first
+        for dependency in object_dependencies(obj)[1:]:
+            headers[dependency] = None
+    return list(headers)
+
+
+def reuse_objects(compiler: CCompiler, force: bool = False):
+    """Skip compiling objects that are up to date.
+
+    setuptools rebuilds all objects of an extension when the extension itself
+    is missing or outdated. An object is reused if it is newer than its source
+    and the headers it included, and was compiled with the same command line,
+    which is stored next to it. Included headers are written by the compiler
+    into a depfile next to the object.
+    """
+    compile_ = compiler._compile
+    depfiles = compiler.compiler_type == "unix"
+
+    def _compile(obj, src, ext, cc_args, extra_postargs, pp_opts):
+        stamp_path = obj + STAMP_SUFFIX
+        stamp = _stamp(compiler, cc_args, extra_postargs, pp_opts)
+        try:
+            with open(stamp_path) as f:
+                up_to_date = (
+                    not force
+                    and f.read() == stamp
+                    and not newer_group(
+                        [src, *object_dependencies(obj)], obj, missing="newer"
+                    )
+                )
+        except OSError:
+            up_to_date = False
+
+        if up_to_date:
+            logger.debug(f"Reusing up to date object {obj}")
+            return
+
+        if depfiles:
+            extra_postargs = [*extra_postargs, "-MMD", "-MF", obj + DEPFILE_SUFFIX]
+        compile_(obj, src, ext, cc_args, extra_postargs, pp_opts)
+        with open(stamp_path, "w") as f:
+            f.write(stamp)
+
+    compiler._compile = _compile
+
+
+def _extension_stamp(ext: Extension) -> str:
+    return json.dumps(
+        [
+            ext.extra_compile_args,
+            ext.extra_link_args,
+            ext.define_macros,
+            ext.libraries,
+            ext.library_dirs,
+            ext.runtime_library_dirs,
+            ext.extra_objects,
+        ],
+        sort_keys=True,
+    )
+
+
+def remove_if_flags_changed(ext: Extension, ext_path: str, stamp_path: Path):
+    """Remove a built extension whose compile or link flags changed since it
+    was built, so setuptools builds it again. setuptools only compares the
+    modification times of the sources with the extension's."""
+    try:
+        if stamp_path.read_text() == _extension_stamp(ext):
+            return
+    except OSError:
+        pass
+    if Path(ext_path).exists():
+        logger.debug(f"Flags of {ext.name} changed, building it again")
+        Path(ext_path).unlink()
+
+
+def write_extension_stamp(ext: Extension, stamp_path: Path):
+    """Record the flags the extension was built with."""
+    stamp_path.parent.mkdir(parents=True, exist_ok=True)
+    stamp_path.write_text(_extension_stamp(ext))
@@ -0,0 +1,133 @@
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from . import jobserver
+from .logger import logger
+from .projects import BUILD_WHEEL_SCRIPT
+
+_TRANSLATE_SCRIPT = (
+    "import json, sys\n"
+    "from pathlib import Path\n"
+    "from hwh_backend.build import translate_extensions\n"
+    "translate_extensions(Path(sys.argv[1]), json.loads(sys.argv[2]))\n"
+)
+
+# Fails unless the interpreter can run the backend
+_CACHE_TAG_SCRIPT = "import sys, hwh_backend.build; print(sys.implementation.cache_tag)"
+
+
+def interpreter_tag(python: str) -> str:
+    """Cache tag of an interpreter, e.g. cpython-312.
+
+    raises: ValueError if the interpreter doesn't exist or can't import the
+        backend and its dependencies
+    """
+    path = shutil.which(python)
+    if path is None:
+        raise ValueError(f"Interpreter {python} not found")
+    result = subprocess.run(
+        [path, "-c", _CACHE_TAG_SCRIPT], capture_output=True, text=True
+    )
+    if result.returncode:
+        error = (result.stderr.strip().splitlines() or ["unknown error"])[-1]
+        raise ValueError(f"{python} can't run hwh-backend: {error}")
+    return result.stdout.strip()
+
+
+def _run(cmd: list[str], project_dir: Path, name: str) -> bool:
+    """Run a build step with its output prefixed by name."""
+    proc = subprocess.Popen(
+        cmd,
+        cwd=project_dir,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    for line in proc.stdout:
+        sys.stderr.write(f"[{name}] {line}")
+    proc.wait()
+    if proc.returncode:
+        logger.error(f"{name}: failed with exit code {proc.returncode}")
+        return False
+    return True
+
+
+def _build(python: str, tag: str, project_dir: Path, wheel_dir: Path, settings: dict):
+    # Like make, hold a job token for each build process
+    with jobserver.token():
+        logger.info(f"{tag}: building")
+        cmd = [python, "-c", BUILD_WHEEL_SCRIPT, str(wheel_dir), json.dumps(settings)]
+        succeeded = _run(cmd, project_dir, tag)
+    if succeeded:
+        logger.info(f"{tag}: built")
+    return succeeded
+
+
+def build_interpreter_wheels(
+    project_dir: Path,
+    interpreters: Sequence[str],
+    wheel_dir: Path,
+    jobs: int,
+    config_settings: Optional[dict[str, str]] = None,
+) -> bool:
+    """Build a wheel of the project for each interpreter into wheel_dir.
+
+    The extensions are translated once by this interpreter, which needs
+    Cython. The generated C doesn't depend on the interpreter it is compiled
+    for, so the builds of the other interpreters use it through the
+    generated_c config setting, and only need the backend. They run in
+    parallel, sharing one jobserver with jobs tokens.
+
+    returns: whether all wheels were built
+    """
+    project_dir = project_dir.absolute()
+    wheel_dir = wheel_dir.absolute()
+    builds = {}
+    for python in interpreters:
+        tag = interpreter_tag(python)
+        if tag in builds:
+            logger.warning(f"{python} is another {tag} interpreter, skipping it")
+            continue
+        builds[tag] = shutil.which(python)
+
+    config_settings = dict(config_settings or {})
+    jobserver.start(jobs)
+    try:
+        with tempfile.TemporaryDirectory(prefix="hwh-interpreters-") as tmp_dir:
+            manifest = Path(tmp_dir) / "generated-c.json"
+            logger.info("Translating")
+            with jobserver.token():
+                translated = _run(
+                    [
+                        sys.executable,
+                        "-c",
+                        _TRANSLATE_SCRIPT,
+                        str(manifest),
+                        json.dumps(config_settings),
+                    ],
+                    project_dir,
+                    "translate",
+                )
+            if not translated:
+                return False
+
+            # Annotations were generated with the translation
+            settings = dict(config_settings, generated_c=str(manifest), annotate="false")
+            # The threads only wait for their build processes
+            with ThreadPoolExecutor(max_workers=len(builds)) as executor:
+                futures = [
+                    executor.submit(
+                        _build, python, tag, project_dir, wheel_dir, settings
+                    )
+                    for tag, python in builds.items()
+                ]
+            return all([future.result() for future in futures])
+    finally:
+        jobserver.stop()
@@ -0,0 +1,203 @@
+import os
+import re
+import select
+import shutil
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+from .logger import logger
+
+# --jobserver-fds is the name used before GNU make 4.2
+_AUTH_RE = re.compile(r"--jobserver-(?:auth|fds)=(\S+)")
+
+# Seconds between checks of the implicit token while waiting for a token
+_POLL_INTERVAL = 0.05
+
+
+class Jobserver:
+    """Client of a GNU make jobserver.
+
+    A process may always run one job on its implicit token. Every further
+    job needs a token, a byte read from the jobserver's fifo or pipe, which
+    has to be written back once the job is done.
+    """
+
+    def __init__(self, read_fd: int, write_fd: int, owned_fds: tuple = ()):
+        self.read_fd = read_fd
+        self.write_fd = write_fd
+        self._owned_fds = owned_fds
+        self._implicit = True
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_makeflags(cls, makeflags: str) -> Optional["Jobserver"]:
+        """Client of the jobserver in MAKEFLAGS, None if there is none or it
+        isn't accessible from this process."""
+        auths = _AUTH_RE.findall(makeflags)
+        if not auths:
+            return None
+        auth = auths[-1]
+
+        if auth.startswith("fifo:"):
+            path = auth.removeprefix("fifo:")
+            try:
+                if not stat.S_ISFIFO(os.stat(path).st_mode):
+                    raise OSError(f"{path} is not a fifo")
+                # Non-blocking, another client may take the token select
+                # saw before it is read
+                fd = os.open(path, os.O_RDWR | os.O_NONBLOCK)
+            except OSError as e:
+                logger.warning(f"Cannot open jobserver fifo: {e}")
+                return None
+            return cls(fd, fd, owned_fds=(fd,))
+
+        try:
+            read_fd, write_fd = (int(fd) for fd in auth.split(","))
+            os.fstat(read_fd)
+            os.fstat(write_fd)
+        except (ValueError, OSError):
+            # make only passes the pipe to recipes it knows run make, i.e.
+            # ones using $(MAKE) or prefixed with +
+            logger.warning(
+                f"Jobserver {auth} in MAKEFLAGS is not accessible, "
+                "prefix the recipe with + to share make's jobs"
+            )
+            return None
+
+        # Another client may take the token select saw before it is read.
+        # O_NONBLOCK on the inherited descriptor, or on a dup of it, would
+        # also make make's own reads non-blocking, reopening the pipe gives
+        # a description of our own.
+        try:
+            own_fd = os.open(f"/proc/self/fd/{read_fd}", os.O_RDONLY | os.O_NONBLOCK)
+        except OSError as e:
+            logger.debug(f"Cannot reopen jobserver pipe {read_fd}: {e}")
+            return cls(read_fd, write_fd)
+        return cls(own_fd, write_fd, owned_fds=(own_fd,))
+
+    def _read_token(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        """A token, None if there is none within timeout seconds."""
+        while True:
+            readable, _, _ = select.select([self.read_fd], [], [], timeout)
+            if not readable:
+                return None
+            try:
+                token = os.read(self.read_fd, 1)
+            except (BlockingIOError, InterruptedError):
+                # Another client took the token
+                if timeout is not None:
+                    return None
+                continue
+            if token:
+                return token
+
+    def _write_token(self, token: bytes):
+        os.write(self.write_fd, token)
+
+    @contextmanager
+    def token(self):
+        """Hold a job token, the implicit one if it is free."""
+        # The implicit token may be freed while waiting for one of the
+        # jobserver, e.g. make -j1 has none to hand out
+        while True:
+            with self._lock:
+                implicit, self._implicit = self._implicit, False
+            if implicit:
+                try:
+                    yield
+                finally:
+                    with self._lock:
+                        self._implicit = True
+                return
+            if token := self._read_token(timeout=_POLL_INTERVAL):
+                break
+
+        try:
+            yield
+        finally:
+            self._write_token(token)
+
+    def acquire_available(self, count: int) -> list[bytes]:
+        """Up to count tokens that are available without waiting."""
+        tokens = []
+        while len(tokens) < count and (token := self._read_token(timeout=0)):
+            tokens.append(token)
+        return tokens
+
+    def release(self, tokens: list[bytes]):
+        for token in tokens:
+            self._write_token(token)
+
+    def close(self):
+        for fd in self._owned_fds:
+            os.close(fd)
+
+
+class _JobserverServer:
+    """A jobserver of our own, a fifo holding the tokens of all but one job,
+    exported in MAKEFLAGS so the processes of the build share it."""
+
+    def __init__(self, jobs: int):
+        self.directory = tempfile.mkdtemp(prefix="hwh-jobserver-")
+        self.path = os.path.join(self.directory, "fifo")
+        os.mkfifo(self.path, 0o600)
+        self.client = Jobserver.from_makeflags(f"--jobserver-auth=fifo:{self.path}")
+        self.client.release([b"+"] * (jobs - 1))
+        self._makeflags = os.environ.get("MAKEFLAGS")
+        os.environ["MAKEFLAGS"] = f"-j{jobs} --jobserver-auth=fifo:{self.path}"
+
+    def close(self):
+        if self._makeflags is None:
+            os.environ.pop("MAKEFLAGS", None)
+        else:
+            os.environ["MAKEFLAGS"] = self._makeflags
+        self.client.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+_CURRENT: Optional[Jobserver] = None
+_SERVER: Optional[_JobserverServer] = None
+
+
+def start(jobs: int) -> Jobserver:
+    """Join the jobserver of MAKEFLAGS, or start one with jobs tokens if
+    there is none. Does nothing if a jobserver is already in use."""
+    global _CURRENT, _SERVER
+    if _CURRENT is not None:
+        return _CURRENT
+
+    _CURRENT = Jobserver.from_makeflags(os.environ.get("MAKEFLAGS", ""))
+    if _CURRENT is not None:
+        logger.info("Using the jobserver of MAKEFLAGS")
+    else:
+        _SERVER = _JobserverServer(max(jobs, 1))
+        _CURRENT = _SERVER.client
+        logger.debug(f"Started jobserver {_SERVER.path} with {jobs} jobs")
+    return _CURRENT
+
+
+def stop():
+    """Stop using the jobserver, and stop our own if we started one."""
+    global _CURRENT, _SERVER
+    if _SERVER is not None:
+        _SERVER.close()
+    elif _CURRENT is not None:
+        _CURRENT.close()
+    _CURRENT = _SERVER = None
+
+
+def current() -> Optional[Jobserver]:
+    return _CURRENT
+
+
+@contextmanager
+def token():
+    """Hold a job token of the current jobserver, if there is one."""
+    if _CURRENT is None:
+        yield
+        return
+    with _CURRENT.token():
+        yield
@@ -0,0 +1,96 @@
+import ast
+import re
+from collections import defaultdict
+from pathlib import Path
+
+from .logger import logger
+
+LAZY_MODULE = "_hwh_lazy"
+
+# Top level def/cpdef/class/cdef class statements of a .pyx file
+_PUBLIC_NAME_RE = re.compile(
+    r"^(?:def|cpdef(?:\s+[\w.*\[\]]+)*?|class|cdef\s+class)\s+([A-Za-z]\w*)\s*[(:]",
+    re.MULTILINE,
+)
+
+_LAZY_TEMPLATE = '''\
+# Generated by hwh-backend. Imports the extension modules of {package}
+# on first attribute access (PEP 562). Enable it by adding
+#
+#     from .{lazy_module} import __getattr__, __dir__
+#
+# to the __init__.py of the package instead of importing the extensions there.
+import importlib
+import sys
+
+# extension module -> public names it defines
+_SUBMODULES = {submodules!r}
+_ATTRIBUTES = {{
+    name: module for module, names in _SUBMODULES.items() for name in names
+}}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f"{package}.{{name}}")
+    if name in _ATTRIBUTES:
+        module = importlib.import_module(f"{package}.{{_ATTRIBUTES[name]}}")
+        value = getattr(module, name)
+        setattr(sys.modules[{package!r}], name, value)
+        return value
+    raise AttributeError(f"module {package!r} has no attribute {{name!r}}")
+
+
+def __dir__():
+    return sorted(
+        set(vars(sys.modules[{package!r}])) | set(_SUBMODULES) | set(_ATTRIBUTES)
+    )
+'''
+
+
+def public_names(pyx_path: Path) -> list[str]:
+    """Names defined at the top level of a .pyx file."""
+    try:
+        source = pyx_path.read_text()
+    except OSError:
+        logger.debug(f"Cannot read {pyx_path}, exporting no names")
+        return []
+    return sorted(set(_PUBLIC_NAME_RE.findall(source)))
+
+
+def lazy_packages(modules: dict[str, list[str]]) -> dict[str, dict[str, list[str]]]:
+    """Group extension modules and their public names by package.
+
+    modules: extension module name -> public names
+    """
+    packages = defaultdict(dict)
+    for module_name, names in modules.items():
+        package, _, name = module_name.rpartition(".")
+        if package:
+            packages[package][name] = names
+    return dict(packages)
+
+
+def write_lazy_module(path: Path, package: str, submodules: dict[str, list[str]]):
+    path.write_text(
+        _LAZY_TEMPLATE.format(
+            package=package, lazy_module=LAZY_MODULE, submodules=submodules
+        )
+    )
+    logger.debug(f"Wrote lazy loader {path}")
+
+
+def read_lazy_submodules(path: Path) -> dict[str, list[str]]:
+    """Submodules of an existing lazy loader, empty if there is none."""
+    try:
+        tree = ast.parse(path.read_text())
+    except (OSError, SyntaxError):
+        return {}
+    for node in tree.body:
+        if (
+            isinstance(node, ast.Assign)
+            and isinstance(node.targets[0], ast.Name)
+            and node.targets[0].id == "_SUBMODULES"
+        ):
+            return ast.literal_eval(node.value)
+    return {}
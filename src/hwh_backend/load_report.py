@@ -0,0 +1,222 @@
+import importlib.machinery
+import json
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+from .dispatch import DISPATCH_PACKAGE
+from .elf import elf_info
+from .logger import logger
+
+LOAD_REPORT = "load-report.txt"
+LOAD_REPORT_JSON = "load-report.json"
+
+# Run with -X importtime in a fresh interpreter. The parent package is
+# imported first, so its own cost isn't attributed to the extension. The
+# extension is then dlopened with the flags of the import system, and
+# imported, which runs its module init on the already loaded object.
+# importlib.import_module would bypass -X importtime. Run with -B, the
+# bytecode would end up in the wheel. The path is the one of the build, which
+# has the build dependencies the extensions may import, with root in front.
+_MEASURE_SCRIPT = """\
+import ctypes, json, os, sys, time
+
+root, name, path = sys.argv[1], sys.argv[2], sys.argv[3]
+sys.path[:] = [root, *json.loads(sys.argv[4])]
+
+
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+package = name.rpartition(".")[0]
+if package:
+    __import__(package)
+result = {"preloaded": name in sys.modules, "dlopen_ns": None}
+rss_before = rss()
+if path and not result["preloaded"]:
+    start = time.perf_counter_ns()
+    ctypes.CDLL(path, mode=sys.getdlopenflags())
+    result["dlopen_ns"] = time.perf_counter_ns() - start
+__import__(name)
+result["rss_bytes"] = rss() - rss_before
+print(json.dumps(result))
+"""
+
+
+@dataclass
+class LoadCost:
+    module: str
+    # From -X importtime, in microseconds. cumulative includes the modules
+    # imported by the module init
+    import_self_us: Optional[int] = None
+    import_cumulative_us: Optional[int] = None
+    dlopen_us: Optional[int] = None
+    # Resident memory added by loading and initializing the module
+    rss_kib: Optional[int] = None
+    relocations: Optional[int] = None
+    symbol_relocations: Optional[int] = None
+    file_size: Optional[int] = None
+    # Imported by its package's __init__, dlopen and memory aren't measured
+    preloaded: bool = False
+    error: Optional[str] = None
+
+
+def extension_modules(root: Path) -> dict[str, Optional[Path]]:
+    """Importable extension modules under root and their files.
+
+    CPU dispatch variants are imported through the loader of their module,
+    which has no file of its own.
+    """
+    suffixes = sorted(importlib.machinery.EXTENSION_SUFFIXES, key=len, reverse=True)
+    modules = {}
+    for path in sorted(root.rglob("*.so")):
+        rel_path = path.relative_to(root)
+        suffix = next((s for s in suffixes if rel_path.name.endswith(s)), None)
+        if suffix is None:
+            continue
+        parts = [*rel_path.parent.parts, rel_path.name[: -len(suffix)]]
+        if len(parts) >= 3 and parts[-3] == DISPATCH_PACKAGE:
+            modules.setdefault(".".join(parts[:-3] + parts[-1:]), None)
+        else:
+            modules[".".join(parts)] = path
+    return modules
+
+
+def parse_importtime(stderr: str, module: str) -> tuple[Optional[int], Optional[int]]:
+    """Self and cumulative import time of a module from -X importtime output."""
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = [field.strip() for field in line[len("import time:") :].split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            try:
+                return int(fields[0]), int(fields[1])
+            except ValueError:
+                return None, None
+    return None, None
+
+
+def _build_path() -> list[str]:
+    """sys.path of the build without the project directory, whose sources
+    would shadow the built package."""
+    project = Path.cwd().resolve()
+    return [entry for entry in sys.path if entry and Path(entry).resolve() != project]
+
+
+def measure(root: Path, module: str, path: Optional[Path]) -> LoadCost:
+    """Import one extension module from root in a fresh interpreter."""
+    cost = LoadCost(module)
+    try:
+        info = elf_info(path) if path is not None else None
+    except (OSError, ValueError) as e:
+        logger.debug(f"Cannot read {path}: {e}")
+        info = None
+    if info is not None:
+        cost.relocations = info.relocations
+        cost.symbol_relocations = info.symbol_relocations
+        cost.file_size = info.file_size
+
+    try:
+        result = subprocess.run(
+            [
+                sys.executable,
+                # Not -I, it would drop the build environment's PYTHONPATH
+                "-E",
+                "-s",
+                "-B",
+                "-X",
+                "importtime",
+                "-c",
+                _MEASURE_SCRIPT,
+                str(root.absolute()),
+                module,
+                str(path.absolute()) if path else "",
+                json.dumps(_build_path()),
+            ],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+    except subprocess.TimeoutExpired:
+        cost.error = "timed out"
+        return cost
+    if result.returncode:
+        errors = [
+            line
+            for line in result.stderr.splitlines()
+            if not line.startswith("import time:")
+        ]
+        cost.error = (errors or [f"exit code {result.returncode}"])[-1]
+        return cost
+
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    cost.import_self_us, cost.import_cumulative_us = parse_importtime(
+        result.stderr, module
+    )
+    cost.preloaded = measured["preloaded"]
+    if measured["dlopen_ns"] is not None:
+        cost.dlopen_us = measured["dlopen_ns"] // 1000
+    if not cost.preloaded:
+        cost.rss_kib = measured["rss_bytes"] // 1024
+    return cost
+
+
+def _cell(value: Optional[int]) -> str:
+    return "-" if value is None else str(value)
+
+
+def format_report(costs: list[LoadCost]) -> str:
+    """Costs ranked by cumulative import time, the most expensive first."""
+    ranked = sorted(
+        costs,
+        key=lambda cost: (cost.error is None, cost.import_cumulative_us or 0),
+        reverse=True,
+    )
+    width = max([len("module"), *(len(cost.module) for cost in ranked)])
+    lines = [
+        f"{'module':<{width}} {'import us':>10} {'self us':>9} {'dlopen us':>10} "
+        f"{'rss KiB':>8} {'relocs':>7} {'symbolic':>9} {'size':>10}"
+    ]
+    for cost in ranked:
+        if cost.error is not None:
+            lines.append(f"{cost.module:<{width}} failed: {cost.error}")
+            continue
+        lines.append(
+            f"{cost.module:<{width}} {_cell(cost.import_cumulative_us):>10} "
+            f"{_cell(cost.import_self_us):>9} {_cell(cost.dlopen_us):>10} "
+            f"{_cell(cost.rss_kib):>8} {_cell(cost.relocations):>7} "
+            f"{_cell(cost.symbol_relocations):>9} {_cell(cost.file_size):>10}"
+        )
+    if any(cost.preloaded for cost in ranked):
+        lines.append(
+            "- modules imported by their package's __init__ only have import times"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def write_load_report(root: Path, report_dir: Path) -> list[LoadCost]:
+    """Measure the load cost of every extension module under root, one at a
+    time so they don't disturb each other's timings, and write the report
+    into report_dir."""
+    costs = [
+        measure(root, module, path)
+        for module, path in extension_modules(root).items()
+    ]
+    report = format_report(costs)
+    report_dir.mkdir(parents=True, exist_ok=True)
+    (report_dir / LOAD_REPORT).write_text(report)
+    (report_dir / LOAD_REPORT_JSON).write_text(
+        json.dumps([asdict(cost) for cost in costs], indent=2)
+    )
+    logger.info(
+        f"Load cost of the extensions:\n{report}Written to {report_dir / LOAD_REPORT}"
+    )
+    for cost in costs:
+        if cost.error is not None:
+            logger.warning(f"Importing {cost.module} failed: {cost.error}")
+    return costs
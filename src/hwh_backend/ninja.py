@@ -0,0 +1,185 @@
+import json
+import os
+import shlex
+import subprocess
+import sys
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Optional
+
+from setuptools.errors import ExecError
+
+from .logger import logger
+
+NINJA_FILE = "build.ninja"
+
+# Depfiles of the generated C, by the path of the C file
+DEPFILE_DIR = "build/depfiles"
+
+# The backend has translated the sources when the file is written, a
+# generator rule isn't run again just because ninja has no log of it
+_RULES = """\
+rule cython
+  command = $cmd
+  depfile = $depfile
+  description = CYTHON $out
+  restat = 1
+  generator = 1
+
+rule cc
+  command = $cmd -MMD -MF $out.d
+  depfile = $out.d
+  description = CC $out
+
+rule link
+  command = $cmd
+  description = LINK $out
+"""
+
+
+def _escape_path(path: str) -> str:
+    return path.replace("$", "$$").replace(" ", "$ ").replace(":", "$:")
+
+
+def _escape(value: str) -> str:
+    return value.replace("$", "$$").replace("\n", "$\n")
+
+
+class NinjaRecorder:
+    """Drop-in replacement of CCompiler.spawn that records the compile and
+    link commands instead of running them."""
+
+    def __init__(self):
+        self.commands: list[list[str]] = []
+
+    def spawn(self, cmd: list[str], **kwargs):
+        self.commands.append(list(cmd))
+
+
+def cython_depfile(c_path: str) -> str:
+    """Where the depfile of a generated C file is kept."""
+    path = Path(c_path)
+    if path.is_absolute():
+        path = path.relative_to(path.anchor)
+    return str(Path(DEPFILE_DIR) / f"{path}.dep")
+
+
+def move_cython_depfile(c_path: str):
+    """Move the depfile cythonize wrote next to the generated C, often in the
+    source tree, to cython_depfile."""
+    depfile = cython_depfile(c_path)
+    os.makedirs(os.path.dirname(depfile), exist_ok=True)
+    os.replace(f"{c_path}.dep", depfile)
+
+
+def cython_command(
+    pyx_path: str,
+    c_path: str,
+    compiler_directives: dict,
+    include_path: Sequence[str],
+    c_line_in_traceback: bool = True,
+    cplus: bool = False,
+) -> list[str]:
+    """Command line translating a .pyx file like the backend does, see
+    python -m hwh_backend cythonize."""
+    cmd = [
+        sys.executable,
+        "-m",
+        "hwh_backend",
+        "cythonize",
+        "--directives",
+        json.dumps(compiler_directives, sort_keys=True),
+    ]
+    if cplus:
+        cmd.append("--cplus")
+    if not c_line_in_traceback:
+        cmd.append("--no-c-in-traceback")
+    for include_dir in include_path:
+        cmd += ["-I", include_dir]
+    return cmd + ["-o", c_path, pyx_path]
+
+
+def _edge(
+    rule: str,
+    outputs: list[str],
+    inputs: list[str],
+    cmd: list[str],
+    implicit: Sequence[str] = (),
+    depfile: Optional[str] = None,
+) -> str:
+    line = f"build {' '.join(map(_escape_path, outputs))}: {rule} "
+    line += " ".join(map(_escape_path, inputs))
+    if implicit:
+        line += " | " + " ".join(map(_escape_path, implicit))
+    line += f"\n  cmd = {_escape(shlex.join(cmd))}\n"
+    if depfile:
+        line += f"  depfile = {_escape(depfile)}\n"
+    return line
+
+
+def write_ninja_file(
+    path: Path,
+    commands: Sequence[list[str]],
+    cython_commands: dict[str, list[str]],
+) -> Path:
+    """Write a ninja build file of recorded compile and link commands.
+
+    cython_commands: generated C file -> command translating it
+    """
+    edges = []
+    for c_path, cmd in cython_commands.items():
+        edges.append(
+            _edge("cython", [c_path], [cmd[-1]], cmd, depfile=cython_depfile(c_path))
+        )
+
+    outputs = set()
+    for cmd in commands:
+        output = cmd[cmd.index("-o") + 1]
+        outputs.add(output)
+        if "-c" in cmd:
+            source = cmd[cmd.index("-o") - 1]
+            implicit = []
+            if "-include" in cmd:
+                # Precompiled header
+                gch = cmd[cmd.index("-include") + 1] + ".gch"
+                if gch in outputs:
+                    implicit.append(gch)
+            edges.append(_edge("cc", [output], [source], cmd, implicit))
+        else:
+            objects = [arg for arg in cmd if arg.endswith(".o")]
+            edges.append(_edge("link", [output], objects, cmd))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        "# Generated by hwh-backend\n"
+        "ninja_required_version = 1.3\n"
+        f"builddir = {_escape(str(path.parent))}\n\n"
+        + _RULES
+        + "\n"
+        + "\n".join(edges)
+    )
+    logger.info(f"Wrote {path} with {len(edges)} build steps")
+    return path
+
+
+def supports_jobserver(ninja: str) -> bool:
+    """ninja is a jobserver client since 1.13."""
+    try:
+        version = subprocess.run(
+            [ninja, "--version"], capture_output=True, text=True, check=True
+        ).stdout
+        return tuple(map(int, version.split(".")[:2])) >= (1, 13)
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return False
+
+
+def run_ninja(ninja: str, path: Path, jobs: Optional[int]):
+    """Run ninja on path. With jobs None, ninja takes its jobs from the
+    jobserver in MAKEFLAGS, which it ignores if -j is given."""
+    cmd = [ninja, "-f", str(path)]
+    if jobs is not None:
+        cmd += ["-j", str(max(jobs, 1))]
+    logger.debug(" ".join(cmd))
+    result = subprocess.run(cmd)
+    if result.returncode:
+        raise ExecError(f"ninja failed with exit code {result.returncode}")
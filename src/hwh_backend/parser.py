@@ -105,9 +105,9 @@ class PyProject:
         #       as "0.0.0" (???)
         return self.toml["project"].get("version")
 
-    def get_hwh_config(self) -> HwhConfig:
+    def get_hwh_config(self, profile: Optional[str] = None) -> HwhConfig:
         # TODO: switch to property
-        return HwhConfig(self.toml)
+        return HwhConfig(self.toml, profile)
 
     @property
     def setuptools_config(self) -> dict:
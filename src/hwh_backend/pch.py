@@ -0,0 +1,99 @@
+import hashlib
+import json
+import threading
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Optional
+
+from setuptools._distutils.ccompiler import CCompiler
+from setuptools.errors import CompileError
+
+from .logger import logger
+
+PCH_HEADER = "hwh_pch.h"
+
+_HEADER_LANGUAGES = {".c": "c-header", ".cpp": "c++-header", ".cc": "c++-header"}
+
+
+def pch_source(headers: Sequence[str]) -> str:
+    """Header to precompile. Cython defines PY_SSIZE_T_CLEAN before including
+    Python.h, the precompiled header has to do the same."""
+    includes = "".join(f'#include "{header}"\n' for header in headers)
+    return (
+        "/* Generated by hwh-backend */\n"
+        "#ifndef PY_SSIZE_T_CLEAN\n"
+        "#define PY_SSIZE_T_CLEAN\n"
+        "#endif\n" + includes
+    )
+
+
+class PrecompiledHeader:
+    """Precompiles the headers shared by all extensions and includes them into
+    every compile that uses the common flags.
+
+    The header is built on the first compile with the common flags, with that
+    compile's exact command line, into a directory named after it. Compiles
+    with other flags, e.g. CPU dispatch variants, don't use it. gcc and clang
+    also ignore a precompiled header that doesn't match the compile and parse
+    the headers as usual.
+    """
+
+    def __init__(
+        self,
+        compiler: CCompiler,
+        headers: Sequence[str],
+        build_dir: Path,
+        extra_postargs: Sequence[str],
+    ):
+        self.compiler = compiler
+        self.source = pch_source(headers)
+        self.build_dir = build_dir
+        self.extra_postargs = list(extra_postargs)
+        # key -> header path, None if building it failed
+        self._headers: dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def _build(self, compile_, ext, cc_args, pp_opts) -> Optional[str]:
+        key = hashlib.sha256(
+            json.dumps(
+                [self.compiler.compiler_so, ext, cc_args, pp_opts, self.extra_postargs]
+            ).encode()
+        ).hexdigest()[:12]
+        if key in self._headers:
+            return self._headers[key]
+
+        header = self.build_dir / key / PCH_HEADER
+        header.parent.mkdir(parents=True, exist_ok=True)
+        if not header.exists() or header.read_text() != self.source:
+            header.write_text(self.source)
+
+        try:
+            compile_(
+                f"{header}.gch",
+                str(header),
+                ext,
+                ["-x", _HEADER_LANGUAGES.get(ext, "c-header"), *cc_args],
+                self.extra_postargs,
+                pp_opts,
+            )
+        except CompileError as e:
+            logger.warning(f"Building the precompiled header failed, not using it: {e}")
+            self._headers[key] = None
+        else:
+            logger.debug(f"Using precompiled header {header}.gch")
+            self._headers[key] = str(header)
+        return self._headers[key]
+
+    def install(self):
+        """Include the precompiled header in the compiles of the compiler."""
+        compile_ = self.compiler._compile
+
+        def _compile(obj, src, ext, cc_args, extra_postargs, pp_opts):
+            if extra_postargs == self.extra_postargs:
+                with self._lock:
+                    header = self._build(compile_, ext, cc_args, pp_opts)
+                if header:
+                    extra_postargs = ["-include", header, *extra_postargs]
+            compile_(obj, src, ext, cc_args, extra_postargs, pp_opts)
+
+        self.compiler._compile = _compile
@@ -0,0 +1,102 @@
+import json
+import re
+from pathlib import Path
+
+from .csource import c_functions
+from .hwh_config import PerfGate
+from .logger import logger
+
+_REFCOUNT_RE = re.compile(
+    r"\b(?:Py_X?(?:INC|DEC)REF|Py_CLEAR|__Pyx_X?(?:INC|DEC)REF(?:_SET)?|__Pyx_X?CLEAR)"
+    r"\s*\("
+)
+_PYTHON_API_RE = re.compile(r"\b(?:Py_?[A-Z]\w*|_Py\w+|__Pyx_\w+)\s*\(")
+# RefNanny and tracing are bookkeeping, not Python interaction
+_IGNORED_RE = re.compile(r"__Pyx_(?:RefNanny\w*|X?GOTREF|X?GIVEREF|Trace\w*)\s*\(")
+_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+
+
+class PerfGateError(Exception):
+    """Python interaction of generated code has increased beyond the threshold."""
+
+
+def count_python_interaction(body: str) -> dict[str, int]:
+    """Count Python C-API calls and reference count operations in C code."""
+    code = _COMMENT_RE.sub("", body)
+    refcount = len(_REFCOUNT_RE.findall(code))
+    calls = len(_PYTHON_API_RE.findall(code))
+    ignored = len(_IGNORED_RE.findall(code))
+    return {"python_api": calls - refcount - ignored, "refcount": refcount}
+
+
+def function_counts(c_path: Path) -> dict[str, dict[str, int]]:
+    """Python interaction per Cython function of a generated C file.
+
+    Only function implementations are counted, argument parsing wrappers and
+    the generated pickling support don't depend on the user's code.
+    """
+    counts: dict[str, dict[str, int]] = {}
+    for function in c_functions(c_path):
+        if (
+            function.kind == "pw"
+            or function.qualname is None
+            or function.qualname.startswith("__pyx_")
+            or function.qualname.endswith("_cython__")
+        ):
+            continue
+        total = counts.setdefault(function.qualname, {"python_api": 0, "refcount": 0})
+        for key, value in count_python_interaction(function.body).items():
+            total[key] += value
+    return counts
+
+
+def check_perf_gate(
+    c_sources: dict[str, Path],
+    baseline_path: Path,
+    mode: PerfGate,
+    threshold: int = 0,
+):
+    """Compare the Python interaction of the generated C against the baseline.
+
+    c_sources: extension module name -> generated C file
+    """
+    if mode == PerfGate.OFF:
+        return
+
+    counts = {module: function_counts(c_path) for module, c_path in c_sources.items()}
+
+    try:
+        baseline = json.loads(baseline_path.read_text())
+    except FileNotFoundError:
+        baseline = None
+
+    if mode == PerfGate.UPDATE or baseline is None:
+        baseline = (baseline or {}) | counts
+        baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        logger.warning(f"Wrote Python interaction baseline to {baseline_path}")
+        return
+
+    regressions = []
+    for module, functions in counts.items():
+        for qualname, metrics in functions.items():
+            previous = baseline.get(module, {}).get(qualname)
+            if previous is None:
+                logger.debug(f"No baseline for {module}.{qualname}")
+                continue
+            for metric, value in metrics.items():
+                if value > previous.get(metric, 0) + threshold:
+                    regressions.append(
+                        f"{module}.{qualname}: {metric} "
+                        f"{previous.get(metric, 0)} -> {value}"
+                    )
+
+    if not regressions:
+        logger.info("Python interaction of generated code is within the baseline")
+        return
+
+    message = "Python interaction increased beyond the baseline in:\n  " + (
+        "\n  ".join(regressions)
+    )
+    if mode == PerfGate.FAIL:
+        raise PerfGateError(message)
+    logger.warning(message)
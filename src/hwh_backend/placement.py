@@ -0,0 +1,111 @@
+import errno
+import os
+import shutil
+from pathlib import Path
+
+from .logger import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# ioctl(dest_fd, FICLONE, src_fd) from linux/fs.h, supported by btrfs, XFS,
+# bcachefs and overlayfs on top of them
+_FICLONE = 0x40049409
+
+# Reasons a reflink or a hardlink isn't possible, try the next method
+_UNSUPPORTED = {
+    errno.EXDEV,
+    errno.EPERM,
+    errno.EINVAL,
+    errno.ENOTTY,
+    errno.EOPNOTSUPP,
+    errno.EMLINK,
+}
+
+
+def _reflink(src: Path, dst: Path):
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflinks are not supported")
+    with open(src, "rb") as src_file, open(dst, "xb") as dst_file:
+        fcntl.ioctl(dst_file.fileno(), _FICLONE, src_file.fileno())
+    shutil.copystat(src, dst)
+
+
+def is_unchanged(src: Path, dst: Path) -> bool:
+    """Whether dst already is a placement of src: the same file, or a file of
+    the same size and modification time, which every placement keeps."""
+    try:
+        src_stat, dst_stat = src.stat(), dst.stat()
+    except OSError:
+        return False
+    if (src_stat.st_dev, src_stat.st_ino) == (dst_stat.st_dev, dst_stat.st_ino):
+        return True
+    return (
+        src_stat.st_size == dst_stat.st_size
+        and src_stat.st_mtime_ns == dst_stat.st_mtime_ns
+    )
+
+
+def place_file(src: Path, dst: Path) -> bool:
+    """Place src at dst as a reflink, a hardlink or a copy, the first the
+    file system supports, keeping the modification time.
+
+    The file is placed under a temporary name and renamed over dst, so dst is
+    never partially written. An unchanged dst is left alone.
+
+    returns: whether dst was written
+    """
+    if dst.is_dir():
+        dst = dst / src.name
+    if is_unchanged(src, dst):
+        logger.debug(f"{dst} is up to date")
+        return False
+
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    try:
+        for method, place in (
+            ("reflinked", _reflink),
+            ("hardlinked", os.link),
+            ("copied", shutil.copy2),
+        ):
+            try:
+                place(src, tmp)
+                break
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED or place is shutil.copy2:
+                    raise
+                tmp.unlink(missing_ok=True)
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    logger.debug(f"{method.capitalize()} {src} to {dst}")
+    return True
+
+
+def place_tree(src: Path, dst: Path) -> list[str]:
+    """place_file every file under src to the same path under dst.
+
+    returns: paths of all files under dst, like distutils' copy_tree
+    """
+    outputs = []
+    for root, _, files in os.walk(src):
+        for name in files:
+            if name.startswith(".nfs"):
+                continue
+            src_path = Path(root) / name
+            dst_path = dst / src_path.relative_to(src)
+            place_file(src_path, dst_path)
+            outputs.append(str(dst_path))
+    return outputs
+
+
+def unshare(path: Path):
+    """Give a hardlinked file its own copy, before it is modified in place."""
+    if path.stat().st_nlink > 1:
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        shutil.copy2(path, tmp)
+        os.replace(tmp, path)
@@ -0,0 +1,220 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from graphlib import CycleError, TopologicalSorter
+from pathlib import Path
+from typing import Optional
+
+from packaging.utils import canonicalize_name
+
+from . import jobserver
+from .logger import logger
+from .parser import PyProject
+from .resolver import cimported_packages
+
+# Written by a build once its extensions are translated, see notify_translated
+TRANSLATED_FD_ENV = "HWH_TRANSLATED_FD"
+
+BUILD_WHEEL_SCRIPT = (
+    "import json, sys\n"
+    "from hwh_backend.build import build_wheel\n"
+    "build_wheel(sys.argv[1], json.loads(sys.argv[2]))\n"
+)
+
+
+class Project:
+    """A project of a multi-project build."""
+
+    def __init__(self, project_dir: Path):
+        self.project_dir = project_dir.absolute()
+        self.pyproject = PyProject(self.project_dir)
+        self.name = canonicalize_name(self.pyproject.package_name)
+        self.package_paths = self.pyproject.get_all_package_paths()
+        self.packages = {package.split(".")[0] for package in self.pyproject.packages}
+
+    @property
+    def package_roots(self) -> list[str]:
+        """Directories containing the packages, the include path of
+        downstream projects cimporting them."""
+        return sorted({str(path.parent) for path in self.package_paths})
+
+    def requires(self) -> set[str]:
+        """Names of the distributions this project depends on."""
+        return {canonicalize_name(req.name) for req in self.pyproject.all_dependencies}
+
+    def cimports(self) -> set[str]:
+        """Top level packages cimported by the project's Cython files."""
+        paths = [
+            path
+            for package_path in self.package_paths
+            for pattern in ("*.pyx", "*.pxd")
+            for path in package_path.glob(pattern)
+        ]
+        return cimported_packages(paths) - self.packages
+
+
+def project_graph(projects: Sequence[Project]) -> dict[str, set[str]]:
+    """Upstream projects of each project, from their dependencies and
+    cimports.
+
+    raises: ValueError if the projects depend on each other in a cycle
+    """
+    by_package = {
+        package: project.name for project in projects for package in project.packages
+    }
+    names = {project.name for project in projects}
+    graph = {}
+    for project in projects:
+        upstream = project.requires() & names
+        upstream |= {by_package[p] for p in project.cimports() if p in by_package}
+        graph[project.name] = upstream - {project.name}
+
+    try:
+        tuple(TopologicalSorter(graph).static_order())
+    except CycleError as e:
+        raise ValueError(f"Projects depend on each other in a cycle: {e.args[1]}")
+    return graph
+
+
+def notify_translated():
+    """Tell the multi-project build that started this build that the
+    extensions are translated, so downstream projects can start."""
+    fd = os.environ.pop(TRANSLATED_FD_ENV, None)
+    if fd is None:
+        return
+    try:
+        os.write(int(fd), b"1")
+        os.close(int(fd))
+    except (OSError, ValueError) as e:
+        logger.debug(f"Cannot notify the multi-project build: {e}")
+
+
+class _ProjectBuild:
+    def __init__(self, project: Project):
+        self.project = project
+        self.translated = threading.Event()
+        self.done = threading.Event()
+        self.succeeded = False
+
+    def _wait_translated(self, read_fd: int):
+        with os.fdopen(read_fd, "rb") as f:
+            if f.read(1):
+                logger.info(f"{self.project.name}: translated")
+        self.translated.set()
+
+    def run(
+        self,
+        upstream: Sequence["_ProjectBuild"],
+        wheel_dir: Path,
+        config_settings: dict[str, str],
+    ):
+        try:
+            for build in upstream:
+                build.translated.wait()
+            failed = [
+                build.project.name
+                for build in upstream
+                if build.done.is_set() and not build.succeeded
+            ]
+            if failed:
+                logger.error(
+                    f"{self.project.name}: not built, {', '.join(failed)} failed"
+                )
+                return
+
+            include_dirs = [
+                root for build in upstream for root in build.project.package_roots
+            ]
+            settings = dict(config_settings)
+            if include_dirs:
+                settings["include_dirs"] = os.pathsep.join(
+                    filter(None, [settings.get("include_dirs"), *include_dirs])
+                )
+            # Like make, hold a job token for each build process. The build
+            # runs its first job on it, and takes tokens for further ones
+            with jobserver.token():
+                self.succeeded = self._build(wheel_dir, settings)
+        finally:
+            self.done.set()
+            self.translated.set()
+
+    def _build(self, wheel_dir: Path, config_settings: dict[str, str]) -> bool:
+        read_fd, write_fd = os.pipe()
+        env = dict(os.environ, **{TRANSLATED_FD_ENV: str(write_fd)})
+        logger.info(f"{self.project.name}: building")
+        proc = subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                BUILD_WHEEL_SCRIPT,
+                str(wheel_dir.absolute()),
+                json.dumps(config_settings),
+            ],
+            cwd=self.project.project_dir,
+            env=env,
+            pass_fds=(write_fd,),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+        os.close(write_fd)
+        waiter = threading.Thread(target=self._wait_translated, args=(read_fd,))
+        waiter.start()
+
+        for line in proc.stdout:
+            sys.stderr.write(f"[{self.project.name}] {line}")
+        proc.wait()
+        waiter.join()
+
+        if proc.returncode:
+            logger.error(
+                f"{self.project.name}: build failed with exit code {proc.returncode}"
+            )
+            return False
+        logger.info(f"{self.project.name}: built")
+        return True
+
+
+def build_projects(
+    project_dirs: Sequence[Path],
+    wheel_dir: Path,
+    jobs: int,
+    config_settings: Optional[dict[str, str]] = None,
+) -> bool:
+    """Build wheels of several projects into wheel_dir.
+
+    Every project is built in its own process, all sharing one jobserver with
+    jobs tokens. A project starts once its upstream projects have translated
+    their extensions, with their package directories on its include path so
+    their .pxd files are found without installing them first.
+
+    returns: whether all projects were built
+    """
+    projects = [Project(Path(project_dir)) for project_dir in project_dirs]
+    graph = project_graph(projects)
+    order = list(TopologicalSorter(graph).static_order())
+    logger.info(f"Build order: {', '.join(order)}")
+
+    builds = {project.name: _ProjectBuild(project) for project in projects}
+    jobserver.start(jobs)
+    try:
+        # The threads only wait for their build processes
+        with ThreadPoolExecutor(max_workers=len(builds)) as executor:
+            futures = [
+                executor.submit(
+                    builds[name].run,
+                    [builds[upstream] for upstream in graph[name]],
+                    wheel_dir,
+                    config_settings or {},
+                )
+                for name in order
+            ]
+        for future in futures:
+            future.result()
+    finally:
+        jobserver.stop()
+    return all(build.succeeded for build in builds.values())
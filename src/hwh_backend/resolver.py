@@ -0,0 +1,211 @@
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import site
+import sys
+import sysconfig
+import threading
+from collections.abc import Iterable
+from importlib.metadata import distributions
+from pathlib import Path
+
+from . import cache
+from .hwh_config import CythonConfig, SitePackages
+from .logger import logger
+
+_CACHE_NAME = "paths"
+
+# numpy.get_include() of NumPy 2 and 1
+_NUMPY_INCLUDE_DIRS = ("_core/include", "core/include")
+_NUMPY_HEADER = "numpy/arrayobject.h"
+
+# Files of installed distributions that can be cimported or included
+_INDEXED_SUFFIXES = (".pxd", ".pxi", ".h", ".hpp")
+_CIMPORT_RE = re.compile(
+    r"^\s*(?:cimport\s+([^#\n]+)|from\s+([\w.]+)\s+cimport\b)",
+    re.MULTILINE,
+)
+
+
+def environment_fingerprint() -> str:
+    """Changes when the interpreter or the installed packages change.
+
+    Installing, upgrading or removing a package changes the modification time
+    of the directory on sys.path it lives in.
+    """
+    entries: list = [sys.executable, sys.version, sys.prefix, sys.base_prefix]
+    for path in sys.path:
+        try:
+            entries.append([path, os.stat(path or ".").st_mtime_ns])
+        except OSError:
+            pass
+    return hashlib.sha256(json.dumps(entries).encode()).hexdigest()[:16]
+
+
+def get_sitepackages(option: SitePackages) -> list[str]:
+    match option:
+        case SitePackages.PURELIB:
+            return [sysconfig.get_path("purelib")]
+        case SitePackages.USER:
+            return [site.getusersitepackages()]
+        case SitePackages.SITE:
+            return site.getsitepackages()
+        case SitePackages.NONE | SitePackages.INDEX:
+            return []
+
+
+def find_numpy_include() -> str:
+    """NumPy's include directory, without importing NumPy."""
+    spec = importlib.util.find_spec("numpy")
+    if spec is None or not spec.submodule_search_locations:
+        raise ModuleNotFoundError(
+            "Numpy headers requested, but numpy installation was not found"
+        )
+
+    for location in spec.submodule_search_locations:
+        for include_dir in _NUMPY_INCLUDE_DIRS:
+            path = Path(location) / include_dir
+            if (path / _NUMPY_HEADER).is_file():
+                return str(path)
+
+    raise FileNotFoundError(
+        f"Numpy headers requested, but {_NUMPY_HEADER} was not found in "
+        f"{list(spec.submodule_search_locations)}"
+    )
+
+
+def _resolve(key: str, compute, verify) -> object:
+    """Cached value of key for this environment, computed if missing or if
+    the cached value fails verification."""
+    fingerprint = environment_fingerprint()
+    cached = cache.load(_CACHE_NAME, fingerprint) or {}
+    if key in cached and verify(cached[key]):
+        logger.debug(f"Using cached {key}: {cached[key]}")
+        return cached[key]
+
+    value = compute()
+    cache.store(_CACHE_NAME, fingerprint, cached | {key: value})
+    return value
+
+
+def resolve_paths(config: CythonConfig) -> tuple[list[str], list[str]]:
+    """Include and library directories of the extensions.
+
+    returns: include_dirs, library_dirs
+    raises: ValueError if a configured directory doesn't exist
+    """
+    # Fail here rather than with a missing header or library in the compiler
+    for setting, paths in (
+        ("include_dirs", config.include_dirs),
+        ("library_dirs", config.library_dirs),
+    ):
+        for path in paths:
+            if not Path(path).is_dir():
+                raise ValueError(f"{setting}: directory {path} does not exist")
+
+    site_packages = get_sitepackages(config.site_packages)
+    logger.debug(f"Site packages: {site_packages}")
+
+    include_dirs = config.include_dirs + site_packages
+    library_dirs = config.library_dirs + site_packages
+
+    if config.use_numpy_include:
+        include_dirs.append(
+            _resolve(
+                "numpy_include",
+                find_numpy_include,
+                lambda path: (Path(path) / _NUMPY_HEADER).is_file(),
+            )
+        )
+
+    return include_dirs, library_dirs
+
+
+def build_pxd_index() -> dict[str, list[str]]:
+    """Top level packages of installed distributions that ship .pxd files or
+    headers, read from the distributions' RECORD files.
+
+    returns: package name -> top level files and directories of the package
+    """
+    index: dict[str, list[str]] = {}
+    for dist in distributions():
+        for file in dist.files or []:
+            if not file.name.endswith(_INDEXED_SUFFIXES) or ".." in file.parts:
+                continue
+            top_level = file.parts[0]
+            name = top_level.split(".")[0]
+            root = str(dist.locate_file(top_level))
+            entries = index.setdefault(name, [])
+            if root not in entries:
+                entries.append(root)
+    return index
+
+
+def pxd_index() -> dict[str, list[str]]:
+    """The .pxd index of this environment, cached by its fingerprint."""
+    return _resolve("pxd_index", build_pxd_index, lambda index: True)
+
+
+def cimported_packages(paths: Iterable[Path]) -> set[str]:
+    """Top level packages cimported by .pyx and .pxd files."""
+    packages = set()
+    for path in paths:
+        for cimports, from_cimport in _CIMPORT_RE.findall(path.read_text()):
+            for module in (cimports.split(",") if cimports else [from_cimport]):
+                # cimport a.b as c
+                module = (module.split() or [""])[0]
+                # Relative cimports stay within the project
+                if module and not module.startswith("."):
+                    packages.add(module.split(".")[0])
+    return packages
+
+
+def _in_cython_includes(package: str) -> bool:
+    """Whether package is one of the .pxd packages shipped with Cython, e.g.
+    libc or cpython."""
+    spec = importlib.util.find_spec("Cython")
+    if spec is None or spec.origin is None:
+        return False
+    includes = Path(spec.origin).parent / "Includes"
+    return any(includes.glob(f"{package}*"))
+
+
+def stage_cimported_packages(
+    paths: Iterable[Path], own_packages: Iterable[str], staging_dir: Path
+) -> Path:
+    """Link the installed packages cimported by paths into a directory of
+    staging_dir named after the links, so concurrent builds staging other
+    packages don't change each other's links.
+
+    Adding that directory to the include path instead of the whole
+    site-packages keeps Cython and the C compiler from searching it on every
+    cimport and #include.
+
+    returns: the directory of the links
+    """
+    index = pxd_index()
+    own_packages = {package.split(".")[0] for package in own_packages}
+    links: dict[str, str] = {}
+    for package in sorted(cimported_packages(paths) - own_packages):
+        if package in index:
+            for root in index[package]:
+                links[Path(root).name] = root
+        elif package != "cython" and not _in_cython_includes(package):
+            logger.warning(f"cimported package {package} is not installed")
+
+    key = hashlib.sha256(json.dumps(links, sort_keys=True).encode()).hexdigest()[:12]
+    links_dir = staging_dir / key
+    links_dir.mkdir(parents=True, exist_ok=True)
+    for name, target in links.items():
+        link = links_dir / name
+        if link.is_symlink():
+            continue
+        # Created under a name of its own and renamed, a concurrent build may
+        # create the same link
+        tmp_link = links_dir / f".{name}.{os.getpid()}.{threading.get_ident()}"
+        tmp_link.symlink_to(target)
+        os.replace(tmp_link, link)
+    logger.debug(f"Staged cimported packages {sorted(links)} in {links_dir}")
+    return links_dir
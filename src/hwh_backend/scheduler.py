@@ -0,0 +1,162 @@
+import json
+import os
+import statistics
+import subprocess
+import threading
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from setuptools.errors import ExecError
+
+from .logger import logger
+
+# Peak memory of a compile job before anything has been measured:
+# a fixed cost plus a multiple of the generated source size
+_DEFAULT_BASE = 64 << 20
+_DEFAULT_BYTES_PER_SOURCE_BYTE = {"c": 16, "c++": 48}
+
+
+class MemoryBudget:
+    """Weighted semaphore over a memory budget in bytes."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self._used = 0
+        self._running = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def reserve(self, amount: int):
+        with self._cond:
+            # A job larger than the whole budget is allowed to run alone
+            self._cond.wait_for(
+                lambda: self._running == 0 or self._used + amount <= self.total
+            )
+            self._used += amount
+            self._running += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._used -= amount
+                self._running -= 1
+                self._cond.notify_all()
+
+
+class CompileJob:
+    def __init__(
+        self, name: str, sources: Sequence[str], language: str, run: Callable
+    ):
+        self.name = name
+        self.source_size = sum(
+            os.path.getsize(source) for source in sources if os.path.exists(source)
+        )
+        self.language = language
+        self.run = run
+
+
+class CompileScheduler:
+    """Runs compile jobs in parallel while keeping the estimated peak memory
+    of the running jobs under a budget.
+
+    The peak RSS of every process spawned by a job is measured and stored in
+    history_path, so later builds estimate from measurements instead of the
+    generated source size alone.
+    """
+
+    def __init__(self, budget: int, workers: int, history_path: Path):
+        self.budget = MemoryBudget(budget)
+        self.workers = max(workers, 1)
+        self.history_path = history_path
+        self.history: dict[str, dict[str, int]] = self._load_history()
+        self._current = threading.local()
+        self._lock = threading.Lock()
+
+    def _load_history(self) -> dict[str, dict[str, int]]:
+        try:
+            return json.loads(self.history_path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _save_history(self):
+        self.history_path.parent.mkdir(parents=True, exist_ok=True)
+        self.history_path.write_text(
+            json.dumps(self.history, indent=2, sort_keys=True)
+        )
+
+    def estimate(self, job: CompileJob) -> int:
+        """Estimated peak memory of a job in bytes."""
+        if previous := self.history.get(job.name):
+            # Scale the last measurement up if the source has grown
+            scale = job.source_size / max(previous["source_size"], 1)
+            return int(previous["peak_rss"] * max(scale, 1))
+
+        ratios = [
+            entry["peak_rss"] / entry["source_size"]
+            for entry in self.history.values()
+            if entry["source_size"]
+        ]
+        if ratios:
+            return int(statistics.median(ratios) * job.source_size)
+
+        per_byte = _DEFAULT_BYTES_PER_SOURCE_BYTE.get(job.language, 16)
+        return _DEFAULT_BASE + per_byte * job.source_size
+
+    def spawn(self, cmd: list[str], **kwargs):
+        """Drop-in replacement of CCompiler.spawn that measures peak RSS."""
+        logger.debug(" ".join(cmd))
+        try:
+            proc = subprocess.Popen(cmd, env=kwargs.get("env"))
+        except OSError as e:
+            # Like distutils.spawn, so a missing compiler is a CompileError
+            raise ExecError(f"command {cmd[0]!r} failed: {e.args[-1]}") from e
+        _, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+
+        peak = getattr(self._current, "peak", None)
+        if peak is not None:
+            # ru_maxrss is in kilobytes on Linux
+            self._current.peak = max(peak, rusage.ru_maxrss * 1024)
+
+        if proc.returncode:
+            raise ExecError(
+                f"command {cmd[0]!r} failed with exit code {proc.returncode}"
+            )
+
+    def _run_job(self, job: CompileJob, estimate: int):
+        with self.budget.reserve(estimate):
+            self._current.peak = 0
+            try:
+                job.run()
+            finally:
+                peak, self._current.peak = self._current.peak, None
+
+        if peak:
+            logger.debug(
+                f"{job.name}: estimated {estimate >> 20} MiB, peak {peak >> 20} MiB"
+            )
+            with self._lock:
+                self.history[job.name] = {
+                    "source_size": job.source_size,
+                    "peak_rss": peak,
+                }
+
+    def run(self, jobs: Sequence[CompileJob]) -> list:
+        """Run the jobs, biggest first.
+
+        returns: futures of the jobs, in the order they were given
+        """
+        estimates = {job.name: self.estimate(job) for job in jobs}
+        logger.info(
+            f"Compiling {len(jobs)} extensions with {self.workers} workers "
+            f"and a memory budget of {self.budget.total >> 20} MiB"
+        )
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                job.name: executor.submit(self._run_job, job, estimates[job.name])
+                for job in sorted(jobs, key=lambda j: estimates[j.name], reverse=True)
+            }
+        self._save_history()
+        return [futures[job.name] for job in jobs]
@@ -0,0 +1,148 @@
+import hashlib
+import io
+import json
+import os
+import tarfile
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+from .logger import logger
+
+# Generated C of an sdist, and the hashes of the Cython sources it was
+# translated from
+GENERATED_MANIFEST = "hwh-generated-c.json"
+
+
+def file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def sdist_c_path(pyx_path: str, c_path: str) -> str:
+    """Path of the generated C in the sdist, next to its .pyx file."""
+    return Path(pyx_path).with_suffix(Path(c_path).suffix).as_posix()
+
+
+def generated_manifest(
+    sources: dict[str, str],
+    dependencies: Callable[[str], Iterable[str]],
+    settings: str,
+    in_sdist: bool = True,
+) -> dict:
+    """Manifest of the generated C of an sdist.
+
+    sources: .pyx file -> generated C
+    dependencies: the .pyx, .pxd and .pxi files a .pyx file is translated from
+    settings: hash of the translation settings
+    in_sdist: whether the C is moved next to the .pyx files in an sdist, or
+        used where it was generated
+    """
+    root = Path.cwd()
+    files = {}
+    for pyx_path, c_path in sources.items():
+        hashes = {}
+        for dependency in sorted(dependencies(pyx_path)):
+            path = Path(dependency).absolute()
+            # Files of other packages, e.g. libc or numpy, can't be verified
+            if path.is_relative_to(root):
+                hashes[path.relative_to(root).as_posix()] = file_hash(path)
+        if in_sdist:
+            c_path = sdist_c_path(pyx_path, c_path)
+        files[Path(pyx_path).as_posix()] = {
+            "c": Path(c_path).as_posix(),
+            "sources": hashes,
+        }
+    return {"settings": settings, "files": files}
+
+
+def add_generated_sources(sdist_path: Path, sources: dict[str, str], manifest: dict):
+    """Add the generated C and its manifest to an sdist, together with the
+    Cython sources in the manifest that the sdist doesn't include.
+
+    sources: .pyx file -> generated C
+    """
+    added = {
+        sdist_c_path(pyx_path, c_path): Path(c_path).read_bytes()
+        for pyx_path, c_path in sources.items()
+    }
+    added[GENERATED_MANIFEST] = json.dumps(manifest, indent=2, sort_keys=True).encode()
+
+    tmp_path = sdist_path.with_name(f"{sdist_path.name}.tmp")
+    with tarfile.open(sdist_path, "r:gz") as src:
+        members = src.getmembers()
+        root = members[0].name.split("/")[0]
+        included = {member.name for member in members}
+        for entry in manifest["files"].values():
+            for path in entry["sources"]:
+                if f"{root}/{path}" not in included:
+                    added[path] = Path(path).read_bytes()
+        names = {f"{root}/{name}" for name in added}
+        # As new as the newest source, so the C is up to date for timestamp checks
+        mtime = max(member.mtime for member in members)
+        with tarfile.open(tmp_path, "w:gz", format=src.format) as dst:
+            for member in members:
+                if member.name not in names:
+                    fileobj = src.extractfile(member) if member.isfile() else None
+                    dst.addfile(member, fileobj)
+            for name, data in added.items():
+                info = tarfile.TarInfo(f"{root}/{name}")
+                info.size = len(data)
+                info.mtime = mtime
+                info.mode = 0o644
+                dst.addfile(info, io.BytesIO(data))
+    os.replace(tmp_path, sdist_path)
+    logger.info(f"Added {len(sources)} generated C files to {sdist_path.name}")
+    logger.debug(f"Added {sorted(added)} to {sdist_path.name}")
+
+
+def _read_manifest(manifest_path: Path) -> dict:
+    try:
+        return json.loads(manifest_path.read_text())
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable {manifest_path}: {e}")
+        return {}
+
+
+def translated_with_other_settings(manifest_path: Path, settings: str) -> set[str]:
+    """.pyx files whose generated C in an sdist was translated with other
+    settings. The C is as new as the .pyx files, so only a forced translation
+    replaces it.
+    """
+    manifest = _read_manifest(manifest_path)
+    if not manifest or manifest.get("settings") == settings:
+        return set()
+    return set(manifest.get("files", {}))
+
+
+def pregenerated_sources(manifest_path: Path, settings: str) -> dict[str, str]:
+    """Generated C of an sdist that is still valid, i.e. translated with the
+    same settings from sources with unchanged hashes.
+
+    returns: .pyx file -> generated C
+    """
+    manifest = _read_manifest(manifest_path)
+    if not manifest:
+        return {}
+
+    if manifest.get("settings") != settings:
+        logger.info(
+            "The generated C was translated with other settings, translating again"
+        )
+        return {}
+
+    valid = {}
+    for pyx_path, entry in manifest.get("files", {}).items():
+        try:
+            unchanged = Path(entry["c"]).is_file() and all(
+                file_hash(Path(path)) == digest
+                for path, digest in entry["sources"].items()
+            )
+        except OSError:
+            unchanged = False
+        if unchanged:
+            valid[pyx_path] = entry["c"]
+        else:
+            logger.info(f"{pyx_path} changed since its C was generated")
+    logger.debug(f"Using generated C of {sorted(valid)}")
+    return valid
@@ -0,0 +1,80 @@
+import json
+from dataclasses import asdict
+from pathlib import Path
+
+from .elf import elf_info
+from .logger import logger
+
+# Sizes of the extensions of the latest build per size optimization setting
+SIZES_FILE = "hwh-extension-sizes.json"
+SIZE_REPORT = "size-report.txt"
+
+# Setting of size_baseline builds, without size optimizations, the "before"
+# of the report
+BASELINE = "default"
+
+
+def record_sizes(record_path: Path, setting: str, extensions: dict[str, Path]) -> dict:
+    """Record the ELF info of the built extensions under setting.
+
+    extensions: extension module -> built file
+    returns: all recorded sizes, extension -> setting -> ElfInfo as a dict
+    """
+    try:
+        records = json.loads(record_path.read_text())
+    except (OSError, ValueError):
+        records = {}
+
+    for name, path in extensions.items():
+        try:
+            info = elf_info(path)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Cannot read {path}: {e}")
+            continue
+        if info is not None:
+            records.setdefault(name, {})[setting] = asdict(info)
+
+    record_path.parent.mkdir(parents=True, exist_ok=True)
+    record_path.write_text(json.dumps(records, indent=2, sort_keys=True))
+    return records
+
+
+def _change(before: int, after: int) -> str:
+    """Relative change, empty without a before."""
+    return f"{(after - before) / before:+.1%}" if before else ""
+
+
+def size_report(records: dict, setting: str, extensions: list[str]) -> str:
+    """Sizes of the extensions built with setting against their baseline,
+    largest first."""
+    rows = [
+        (name, records[name])
+        for name in extensions
+        if setting in records.get(name, {})
+    ]
+    rows.sort(key=lambda row: row[1][setting]["file_size"], reverse=True)
+    width = max([len("extension"), *(len(name) for name, _ in rows)])
+    header = (
+        f"{'extension':<{width}} {'file before':>12} {'file after':>12} "
+        f"{'change':>8} {'loaded before':>14} {'loaded after':>13} {'exports':>11}"
+    )
+    lines = [f"Extension sizes, {setting} against {BASELINE}", header]
+    for name, sizes in rows:
+        after = sizes[setting]
+        # - without a baseline
+        before = sizes.get(BASELINE, {})
+        change = _change(before.get("file_size", 0), after["file_size"])
+        exports = f"{before.get('exported_symbols', '-')} -> {after['exported_symbols']}"
+        lines.append(
+            f"{name:<{width}} {before.get('file_size', '-'):>12} "
+            f"{after['file_size']:>12} {change:>8} "
+            f"{before.get('loaded_size', '-'):>14} {after['loaded_size']:>13} "
+            f"{exports:>11}"
+        )
+    if missing := [name for name, sizes in rows if BASELINE not in sizes]:
+        lines.append(
+            f"- no baseline of {', '.join(missing)}: build once with "
+            "size_baseline=true and without optimize_size and optimize_link "
+            "to record the sizes before"
+        )
+    return "\n".join(lines) + "\n"
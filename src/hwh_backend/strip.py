@@ -0,0 +1,91 @@
+import re
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+from .logger import logger
+from .placement import unshare
+
+_BUILD_ID_RE = re.compile(r"Build ID:\s*([0-9a-f]+)")
+
+
+def _run(*args: str) -> str:
+    return subprocess.run(args, check=True, capture_output=True, text=True).stdout
+
+
+def _has_debug_info(so_path: Path) -> bool:
+    """Check whether the shared object still carries .debug_* sections."""
+    return ".debug_" in _run("readelf", "-S", "--wide", str(so_path))
+
+
+def _build_id(so_path: Path) -> Optional[str]:
+    match = _BUILD_ID_RE.search(_run("readelf", "-n", str(so_path)))
+    return match.group(1) if match else None
+
+
+def _debug_file_path(so_path: Path, root: Path, debug_dir: Path) -> Path:
+    """Location of the split debug file.
+
+    Uses the .build-id/xx/yyyy.debug layout understood by gdb, debuginfod and
+    friends when the object has a GNU build-id, otherwise mirrors the path of
+    the extension inside the wheel.
+    """
+    if build_id := _build_id(so_path):
+        return debug_dir / ".build-id" / build_id[:2] / f"{build_id[2:]}.debug"
+    return debug_dir / f"{so_path.relative_to(root)}.debug"
+
+
+def strip_extension(
+    so_path: Path, root: Path, debug_dir: Optional[Path] = None
+) -> Optional[Path]:
+    """Strip a single extension module in place.
+
+    If debug_dir is given and the object has debug info, the debug info is
+    first copied to a separate file which the stripped object refers to via
+    .gnu_debuglink.
+
+    returns: path of the split debug file, if one was written
+    """
+    debug_path = None
+    if debug_dir is not None and _has_debug_info(so_path):
+        debug_path = _debug_file_path(so_path, root, debug_dir)
+        debug_path.parent.mkdir(parents=True, exist_ok=True)
+        _run("objcopy", "--only-keep-debug", str(so_path), str(debug_path))
+
+    # strip writes into hardlinked files, which would strip the build too
+    unshare(so_path)
+    _run("strip", "--strip-debug", "--strip-unneeded", str(so_path))
+
+    if debug_path is not None:
+        _run("objcopy", f"--add-gnu-debuglink={debug_path}", str(so_path))
+        logger.debug(f"Split debug info of {so_path} into {debug_path}")
+
+    return debug_path
+
+
+def strip_extensions(root: Path, debug_dir: Optional[Path] = None) -> list[Path]:
+    """Strip all extension modules found under root.
+
+    returns: list of stripped extension modules
+    """
+    missing = [tool for tool in ("strip", "objcopy", "readelf") if not shutil.which(tool)]
+    if missing:
+        logger.warning(f"Cannot strip extensions, missing tools: {missing}")
+        return []
+
+    stripped = []
+    for so_path in sorted(root.rglob("*.so")):
+        # Also without debug info, the symbol table isn't needed to load it
+        size_before = so_path.stat().st_size
+        try:
+            strip_extension(so_path, root, debug_dir)
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Failed to strip {so_path}: {e.stderr.strip()}")
+            continue
+        logger.info(
+            f"Stripped {so_path.relative_to(root)}: "
+            f"{size_before} -> {so_path.stat().st_size} bytes"
+        )
+        stripped.append(so_path)
+    return stripped
@@ -0,0 +1,132 @@
+import json
+import re
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Optional
+
+from .csource import c_functions, cython_metadata
+from .logger import logger
+
+# Written next to the extension module: <extension filename>.pyxmap.json
+SIDECAR_SUFFIX = ".pyxmap.json"
+
+_SYMBOL_RE = re.compile(r"\b__pyx_(?:pw|pf|f)_\w+")
+# perf script prints the DSO of a frame in parentheses
+_DSO_RE = re.compile(r"\(([^()\s]+\.so)\)")
+# perf script -F +srcline, addr2line: file.c:123
+_SRCLINE_RE = re.compile(r"([\w./+-]+\.c(?:pp)?):(\d+)\b")
+
+
+def sidecar_path(ext_path: Path) -> Path:
+    return ext_path.with_name(ext_path.name + SIDECAR_SUFFIX)
+
+
+def symbol_map(c_path: Path) -> dict:
+    """Map the C functions of a generated C file to their Cython source.
+
+    Built from the position markers Cython writes into the generated C, which
+    requires the emit_code_comments directive.
+    """
+    return {
+        "module": cython_metadata(c_path).get("module_name"),
+        "c_file": c_path.name,
+        "functions": {
+            function.symbol: {
+                "qualname": function.qualname,
+                "file": function.source_file,
+                "line": function.source_line,
+                "c_lines": [function.c_start, function.c_end],
+                "markers": [list(marker) for marker in function.markers],
+            }
+            for function in c_functions(c_path)
+        },
+    }
+
+
+def write_symbol_map(c_path: Path, ext_path: Path) -> Optional[Path]:
+    """Write the symbol map of an extension next to it, if outdated."""
+    path = sidecar_path(ext_path)
+    if path.exists() and path.stat().st_mtime >= c_path.stat().st_mtime:
+        return None
+    path.write_text(json.dumps(symbol_map(c_path)))
+    logger.debug(f"Wrote symbol map {path}")
+    return path
+
+
+class Symbolizer:
+    """Rewrites C symbols and C source lines of Cython extensions in profiler
+    output to the Cython functions and source lines."""
+
+    def __init__(self):
+        self.functions: dict[str, dict] = {}
+        # C file name -> functions sorted by their first C line
+        self.c_files: dict[str, list[dict]] = {}
+        self._loaded: set[Path] = set()
+
+    def load(self, path: Path):
+        """Load a symbol map, or all symbol maps under a directory."""
+        paths = path.rglob(f"*{SIDECAR_SUFFIX}") if path.is_dir() else [path]
+        for sidecar in paths:
+            sidecar = sidecar.resolve()
+            if sidecar in self._loaded:
+                continue
+            self._loaded.add(sidecar)
+            data = json.loads(sidecar.read_text())
+            functions = self.c_files.setdefault(data["c_file"], [])
+            for symbol, function in data["functions"].items():
+                function = {**function, "symbol": symbol, "module": data["module"]}
+                self.functions[symbol] = function
+                functions.append(function)
+            functions.sort(key=lambda f: f["c_lines"][0])
+
+    def load_for_extension(self, ext_path: Path):
+        path = sidecar_path(ext_path)
+        if path.exists():
+            self.load(path)
+
+    def function_name(self, symbol: str) -> Optional[str]:
+        function = self.functions.get(symbol)
+        if function is None:
+            return None
+        name = f"{function['module']}.{function['qualname'] or symbol}"
+        if function["file"]:
+            name += f" ({function['file']}:{function['line']})"
+        return name
+
+    def source_line(self, c_file: str, c_line: int) -> Optional[str]:
+        """Cython source line of a line in generated C."""
+        functions = self.c_files.get(Path(c_file).name)
+        if not functions:
+            return None
+        starts = [function["c_lines"][0] for function in functions]
+        index = bisect_right(starts, c_line) - 1
+        if index < 0 or c_line > functions[index]["c_lines"][1]:
+            return None
+        function = functions[index]
+        location = (function["file"], function["line"])
+        for marker_line, source, line in function["markers"]:
+            if marker_line > c_line:
+                break
+            location = (source, line)
+        if location[0] is None:
+            return None
+        return f"{location[0]}:{location[1]}"
+
+    def rewrite(self, line: str) -> str:
+        for dso in _DSO_RE.findall(line):
+            self.load_for_extension(Path(dso))
+
+        line = _SYMBOL_RE.sub(
+            lambda m: self.function_name(m.group()) or m.group(), line
+        )
+        return _SRCLINE_RE.sub(
+            lambda m: self.source_line(m.group(1), int(m.group(2))) or m.group(),
+            line,
+        )
+
+
+def symbolize(lines: Iterable[str], symbolizer: Symbolizer) -> Iterator[str]:
+    """Rewrite perf script or collapsed stack output line by line."""
+    for line in lines:
+        yield symbolizer.rewrite(line)
@@ -0,0 +1,132 @@
+import math
+import os
+from pathlib import Path
+from typing import Optional
+
+from .logger import logger
+
+_CGROUP_ROOT = Path("/sys/fs/cgroup")
+_PROC_CGROUP = Path("/proc/self/cgroup")
+
+# cgroup v1 reports "no limit" as a huge page aligned number
+_UNLIMITED = 1 << 60
+
+
+def _read_int(path: Path) -> Optional[int]:
+    try:
+        value = path.read_text().strip()
+    except OSError:
+        return None
+    if value == "max":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _cgroup_dirs(controller: Optional[str] = None) -> list[Path]:
+    """Directories of the cgroup of this process and its ancestors, innermost
+    first, in the hierarchy of a cgroup v1 controller or of cgroup v2 if
+    controller is None.
+
+    A limit of any of them applies, the innermost one isn't necessarily the
+    lowest.
+    """
+    mount = _CGROUP_ROOT if controller is None else _CGROUP_ROOT / controller
+    try:
+        lines = _PROC_CGROUP.read_text().splitlines()
+    except OSError:
+        lines = []
+    for line in lines:
+        # "<hierarchy>:<controllers>:<path>", v2 has no controllers
+        try:
+            _, controllers, path = line.split(":", 2)
+        except ValueError:
+            continue
+        if controller is None:
+            if controllers:
+                continue
+        elif controller in controllers.split(","):
+            mount = _CGROUP_ROOT / controllers
+        else:
+            continue
+        # Without a cgroup namespace the path may not exist in the mount,
+        # the mount root is then the cgroup of the container
+        cgroup = mount / path.lstrip("/")
+        return [cgroup, *(p for p in cgroup.parents if p.is_relative_to(mount))]
+    return [mount]
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    """Lowest CPU quota of the cgroup and its ancestors in CPUs, None if
+    unlimited."""
+    quotas = []
+    for cgroup in _cgroup_dirs():
+        try:
+            # v2: "<quota> <period>" or "max <period>"
+            quota, period = (cgroup / "cpu.max").read_text().split()
+            if quota != "max":
+                quotas.append(int(quota) / int(period))
+        except (OSError, ValueError):
+            pass
+
+    for cgroup in _cgroup_dirs("cpu"):
+        quota = _read_int(cgroup / "cpu.cfs_quota_us")
+        period = _read_int(cgroup / "cpu.cfs_period_us")
+        # v1 uses -1 for no quota
+        if quota is not None and quota > 0 and period:
+            quotas.append(quota / period)
+    return min(quotas, default=None)
+
+
+def default_parallelism() -> tuple[int, str]:
+    """Number of parallel jobs this build may use, and where it came from.
+
+    os.cpu_count() reports all CPUs of the host, also inside containers, so
+    use the CPU affinity mask and the cgroup CPU quota instead.
+    """
+    try:
+        count, source = len(os.sched_getaffinity(0)), "CPU affinity"
+    except AttributeError:
+        count, source = os.cpu_count() or 1, "os.cpu_count()"
+
+    quota = _cgroup_cpu_quota()
+    if quota is not None and math.ceil(quota) < count:
+        count, source = max(math.ceil(quota), 1), "cgroup CPU quota"
+
+    return count, source
+
+
+def _cgroup_memory_limit() -> Optional[int]:
+    paths = [
+        *(cgroup / "memory.max" for cgroup in _cgroup_dirs()),  # v2
+        *(cgroup / "memory.limit_in_bytes" for cgroup in _cgroup_dirs("memory")),
+    ]
+    limits = [
+        limit
+        for limit in map(_read_int, paths)
+        if limit is not None and limit < _UNLIMITED
+    ]
+    return min(limits, default=None)
+
+
+def memory_limit() -> Optional[int]:
+    """Memory limit of this build in bytes from its cgroup, None if it isn't
+    limited."""
+    if (limit := _cgroup_memory_limit()) is not None:
+        logger.debug(f"Memory limit {limit} bytes from cgroup")
+    return limit
+
+
+_SIZE_UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+
+
+def parse_size(size: str) -> int:
+    """Parse sizes like "512M" or "16G" to bytes."""
+    value = size.strip().lower().removesuffix("b").removesuffix("i")
+    unit = value[-1:] if value[-1:] in _SIZE_UNITS else ""
+    try:
+        return int(float(value.removesuffix(unit)) * _SIZE_UNITS[unit])
+    except ValueError as e:
+        raise ValueError(f"Invalid size: {size}") from e
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sysconfig
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from . import cache
+from .logger import logger
+
+_CACHE_NAME = "toolchain"
+
+_TEST_PROGRAM = "int hwh_probe(void) { return 0; }\nint main(void) { return hwh_probe(); }\n"
+
+# Linkers selectable with -fuse-ld=<name>, and the executables they run
+LINKERS = {
+    "mold": ("ld.mold", "mold"),
+    "lld": ("ld.lld",),
+    "gold": ("ld.gold",),
+    "bfd": ("ld.bfd", "ld"),
+}
+
+# Linkers tried by linker = "auto", fastest first. gold is left out, binutils
+# deprecated it and it is only marginally faster than bfd
+AUTO_LINKERS = ("mold", "lld")
+
+# capability -> (compile or link, flags). -Werror makes compilers that only
+# warn about unknown flags, like clang, fail the probe
+PROBES: dict[str, tuple[str, list[str]]] = {
+    **{
+        f"march={target}": ("compile", [f"-march={target}"])
+        for target in ("x86-64", "x86-64-v2", "x86-64-v3", "x86-64-v4")
+    },
+    **{f"fuse-ld={linker}": ("link", [f"-fuse-ld={linker}"]) for linker in LINKERS},
+    "flto=auto": ("link", ["-flto=auto"]),
+    "fprofile-use": ("compile", ["-fprofile-use", "-Wno-missing-profile"]),
+    "fvisibility=hidden": ("compile", ["-fvisibility=hidden"]),
+    "ffunction-sections": ("compile", ["-ffunction-sections", "-fdata-sections"]),
+    "gc-sections": ("link", ["-Wl,--gc-sections"]),
+    "Wl,-O1,--hash-style=gnu,--as-needed": (
+        "link", ["-Wl,-O1,--hash-style=gnu,--as-needed"]
+    ),
+}
+
+
+def compiler_command() -> list[str]:
+    """The C compiler of extension builds, as setuptools picks it."""
+    return shlex.split(os.environ.get("CC") or sysconfig.get_config_var("CC") or "cc")
+
+
+def _fingerprint(path: Optional[str]) -> Optional[list]:
+    if path is None:
+        return None
+    try:
+        return [os.path.realpath(path), os.stat(path).st_mtime_ns]
+    except OSError:
+        return None
+
+
+def toolchain_key(compiler: list[str]) -> Optional[str]:
+    """Cache key of the compiler and the linkers it can use: their paths,
+    modification times and the compiler's version. None if there is no
+    compiler."""
+    path = shutil.which(compiler[0])
+    if path is None:
+        return None
+    try:
+        version = subprocess.run(
+            [*compiler, "--version"], capture_output=True, text=True, timeout=30
+        ).stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    linkers = {
+        name: [_fingerprint(shutil.which(exe)) for exe in executables]
+        for name, executables in LINKERS.items()
+    }
+    entries = [compiler, _fingerprint(path), version, linkers]
+    return hashlib.sha256(json.dumps(entries).encode()).hexdigest()[:16]
+
+
+def _probe(compiler: list[str], kind: str, flags: list[str], work_dir: Path) -> bool:
+    source = work_dir / "probe.c"
+    output = work_dir / f"probe-{hashlib.sha256(str(flags).encode()).hexdigest()[:8]}"
+    if kind == "compile":
+        cmd = [*compiler, "-Werror", *flags, "-c", str(source), "-o", f"{output}.o"]
+    else:
+        # Linked like an extension module
+        cmd = [
+            *compiler, "-Werror", "-fPIC", "-shared", *flags, str(source),
+            "-o", f"{output}.so",
+        ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return result.returncode == 0
+
+
+def probe_toolchain(compiler: list[str]) -> dict[str, bool]:
+    """Which of the PROBES the compiler and linker support, by compiling and
+    linking a test program with each."""
+    with tempfile.TemporaryDirectory(prefix="hwh-probe-") as work_dir:
+        (Path(work_dir) / "probe.c").write_text(_TEST_PROGRAM)
+        with ThreadPoolExecutor() as executor:
+            results = {
+                name: executor.submit(_probe, compiler, kind, flags, Path(work_dir))
+                for name, (kind, flags) in PROBES.items()
+            }
+            return {name: future.result() for name, future in results.items()}
+
+
+_CAPABILITIES: Optional[dict[str, bool]] = None
+
+
+def capabilities(refresh: bool = False) -> dict[str, bool]:
+    """Capabilities of the toolchain, probed once per compiler and cached in
+    the per-user cache."""
+    global _CAPABILITIES
+    if _CAPABILITIES is not None and not refresh:
+        return _CAPABILITIES
+
+    compiler = compiler_command()
+    key = toolchain_key(compiler)
+    if key is None:
+        logger.warning(f"Compiler {compiler[0]} not found, assuming no capabilities")
+        _CAPABILITIES = {name: False for name in PROBES}
+        return _CAPABILITIES
+
+    cached = None if refresh else cache.load(_CACHE_NAME, key)
+    if cached is not None and set(cached) == set(PROBES):
+        logger.debug(f"Using cached toolchain capabilities of {compiler}")
+        _CAPABILITIES = cached
+    else:
+        logger.info(f"Probing the capabilities of {shlex.join(compiler)}")
+        _CAPABILITIES = probe_toolchain(compiler)
+        cache.store(_CACHE_NAME, key, _CAPABILITIES)
+    logger.debug(f"Toolchain capabilities: {_CAPABILITIES}")
+    return _CAPABILITIES
+
+
+def supports(capability: str) -> bool:
+    """Whether the toolchain supports a capability of PROBES."""
+    return capabilities()[capability]
+
+
+_WARNED: set[str] = set()
+
+
+def supported_flags(*wanted: str) -> list[str]:
+    """Flags of the capabilities of PROBES the toolchain supports. The others
+    are left out with a warning."""
+    flags = []
+    for capability in wanted:
+        if supports(capability):
+            flags += PROBES[capability][1]
+        elif capability not in _WARNED:
+            _WARNED.add(capability)
+            logger.warning(f"The toolchain doesn't support -{capability}, not using it")
+    return flags
+
+
+def select_linker(linker: str) -> Optional[str]:
+    """-fuse-ld value of the linker setting, None for the compiler's default.
+
+    raises: ValueError if the selected linker doesn't work with the compiler
+    """
+    if linker == "default":
+        return None
+    if linker == "auto":
+        return next(
+            (name for name in AUTO_LINKERS if supports(f"fuse-ld={name}")), None
+        )
+    if not supports(f"fuse-ld={linker}"):
+        raise ValueError(
+            f"Linking with -fuse-ld={linker} doesn't work with "
+            f"{shlex.join(compiler_command())}, is {linker} installed?"
+        )
+    return linker
@@ -0,0 +1,63 @@
+from hwh_backend.annotate import _line_scopes, hotspots, line_scores, write_hotspot_index
+
+PYX = """
+cdef class BaseOp:
+    def __init__(self, double value):
+        print("Hello")
+        self.value = value
+
+    cpdef double compute(self):
+        return self.value * 2.0
+
+def helper(x):
+    return [x]
+"""
+
+
+def _html_line(lineno, score):
+    return (
+        f'<pre class="cython line score-{score}" onclick="f()">'
+        f'+<span class="">{lineno:02d}</span>: code</pre>\n'
+    )
+
+
+def _annotated(tmp_path):
+    pyx = tmp_path / "base.pyx"
+    pyx.write_text(PYX)
+    scores = {2: 0, 3: 31, 4: 8, 5: 0, 7: 47, 8: 0, 10: 12, 11: 5}
+    html = tmp_path / "base.html"
+    html.write_text("".join(_html_line(n, s) for n, s in scores.items()))
+    return [("pkg.base", str(pyx), str(html))]
+
+
+def test_line_scores(tmp_path):
+    _annotated(tmp_path)
+    scores = line_scores(tmp_path / "base.html")
+    assert scores[3] == 31
+    assert scores[2] == 0
+
+
+def test_line_scopes(tmp_path):
+    pyx = tmp_path / "base.pyx"
+    pyx.write_text(PYX)
+    scopes = _line_scopes(pyx)
+    assert scopes[2] == "BaseOp"
+    assert scopes[4] == "BaseOp.__init__"
+    assert scopes[8] == "BaseOp.compute"
+    assert scopes[11] == "helper"
+
+
+def test_hotspots_ranking(tmp_path):
+    ranked = hotspots(_annotated(tmp_path))
+    assert [(r[1], r[3], r[4]) for r in ranked] == [
+        ("BaseOp.__init__", 2, 39),
+        ("helper", 2, 17),
+        ("BaseOp.compute", 1, 47),
+    ]
+
+
+def test_write_hotspot_index(tmp_path):
+    index = write_hotspot_index(_annotated(tmp_path), tmp_path)
+    content = index.read_text()
+    assert 'href="base.html"' in content
+    assert "BaseOp.__init__" in content
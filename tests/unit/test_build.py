@@ -1,10 +1,19 @@
+import json
 import pytest
+from concurrent.futures import Future
 from pathlib import Path
 
+from setuptools.extension import Extension
+
+from hwh_backend import build, jobserver, sysinfo
 from hwh_backend.build import (
     _parse_build_settings,
     _collect_pyx_paths,
+    _resolve_memory_budget,
 )
+from hwh_backend.hwh_config import CythonConfig
+from hwh_backend.parser import PyProject
+from hwh_backend.sdist import GENERATED_MANIFEST, generated_manifest
 
 
 @pytest.mark.parametrize(
@@ -77,5 +86,230 @@ def test_parse_invalid_build_settings():
     assert "nthreads" not in parsed
 
 
+def test_parse_strip_build_settings():
+    parsed = _parse_build_settings({"strip": "true", "split_debug": "false"})
+    assert parsed["strip"] is True
+    assert parsed["split_debug"] is False
+
+
+def test_parse_profile_build_settings():
+    assert _parse_build_settings({"profile": "dev"})["profile"] == "dev"
+
+
+def test_parse_variants_build_settings():
+    settings = _parse_build_settings({"variants": "release, coverage"})
+    assert settings["variants"] == ["release", "coverage"]
+
+
+def test_linetrace_does_not_modify_config(monkeypatch):
+    monkeypatch.setattr(build, "_CONFIG_OPTIONS", {"linetrace": True})
+    config = CythonConfig(extra_compile_args=["-O2"])
+    assert build._extra_compile_args(config) == ["-O2", "-DCYTHON_TRACE_NOGIL=1"]
+    assert build._extra_compile_args(config) == ["-O2", "-DCYTHON_TRACE_NOGIL=1"]
+    assert config.extra_compile_args == ["-O2"]
+
+
+def test_variants_share_build_dirs_by_settings(monkeypatch):
+    monkeypatch.setattr(build, "_CONFIG_OPTIONS", {"variants": ["a", "b"]})
+    release = CythonConfig(extra_compile_args=["-O3"])
+    bench = CythonConfig(extra_compile_args=["-O3"], strip=True)
+    debug = CythonConfig(extra_compile_args=["-O0"])
+    coverage = CythonConfig(extra_compile_args=["-O3"], linetrace=True)
+
+    include_dirs = ["/venv/site-packages"]
+    release_c = build._cython_build_dir(release, include_dirs)
+    assert release_c == build._cython_build_dir(bench, include_dirs)
+    assert release_c == build._cython_build_dir(debug, include_dirs)
+    assert release_c != build._cython_build_dir(coverage, include_dirs)
+    # Other .pxd files on the include path
+    assert release_c != build._cython_build_dir(release, ["build/pxd/0123abcd"])
+    assert build._build_temp(release) == build._build_temp(bench)
+    assert build._build_temp(release) != build._build_temp(debug)
+    assert build._build_temp(release) != build._build_temp(coverage)
+
+
+def test_resolve_memory_budget(tmp_path, monkeypatch):
+    assert _resolve_memory_budget("none") is None
+    assert _resolve_memory_budget("2G") == 2 << 30
+    # Without a cgroup limit, auto keeps the parallel build of setuptools
+    monkeypatch.setattr(sysinfo, "_CGROUP_ROOT", tmp_path)
+    assert _resolve_memory_budget("auto") is None
+    assert _parse_build_settings({"memory_budget": "8G"})["memory_budget"] == "8G"
+
+
+def test_parse_perf_gate_build_settings():
+    from hwh_backend.hwh_config import PerfGate
+
+    assert _parse_build_settings({"perf_gate": "true"})["perf_gate"] == PerfGate.FAIL
+    assert _parse_build_settings({"perf_gate": "update"})["perf_gate"] == PerfGate.UPDATE
+
+
 def test_parse_empty_build_settings():
     assert _parse_build_settings(None) == {}
+
+
+def test_staging_dir_per_interpreter(monkeypatch):
+    import sys
+
+    monkeypatch.setattr(build, "_CONFIG_OPTIONS", {"profile": "release"})
+    staging_dir = build._staging_dir()
+    assert staging_dir.parent == Path("build/release")
+    assert staging_dir.name.endswith(sys.implementation.cache_tag)
+
+
+def test_parse_generated_c_build_settings():
+    assert _parse_build_settings({"generated_c": "c.json"})["generated_c"] == "c.json"
+
+
+def test_extra_link_args_linker(monkeypatch):
+    monkeypatch.setattr(build.toolchain, "select_linker", lambda linker: "lld")
+    monkeypatch.setattr(build, "_CONFIG_OPTIONS", {})
+    config = CythonConfig(extra_link_args=["-lm"])
+    assert build._extra_link_args(config) == ["-lm", "-fuse-ld=lld"]
+    assert config.extra_link_args == ["-lm"]
+
+    # An explicit -fuse-ld wins
+    config = CythonConfig(extra_link_args=["-fuse-ld=bfd"])
+    assert build._extra_link_args(config) == ["-fuse-ld=bfd"]
+
+
+@pytest.mark.parametrize(
+    "extra_link_args,linker",
+    [
+        ([], "lld"),
+        (["-fuse-ld=gold"], "gold"),
+        (["-fuse-ld=gold", "-fuse-ld=bfd"], "bfd"),
+    ],
+)
+def test_build_metadata_linker(tmp_path, monkeypatch, extra_link_args, linker):
+    monkeypatch.setattr(build.toolchain, "select_linker", lambda linker: "lld")
+    monkeypatch.setattr(build.toolchain, "compiler_command", lambda: ["cc"])
+    monkeypatch.setattr(build, "_CONFIG_OPTIONS", {})
+    monkeypatch.setattr(
+        build,
+        "_get_cython_config",
+        lambda project: CythonConfig(extra_link_args=extra_link_args),
+    )
+    monkeypatch.setattr(build, "PyProject", lambda path: None)
+
+    build._write_build_metadata(tmp_path)
+    metadata = json.loads((tmp_path / build.BUILD_METADATA).read_text())
+    assert metadata["linker"] == linker
+
+
+def test_extra_link_args_default_linker(monkeypatch):
+    def probe(refresh=False):
+        raise AssertionError("probed the toolchain")
+
+    monkeypatch.setattr(build.toolchain, "capabilities", probe)
+    monkeypatch.setattr(build, "_CONFIG_OPTIONS", {})
+    assert build._extra_link_args(CythonConfig(extra_link_args=["-lm"])) == ["-lm"]
+
+
+def test_size_optimization_flags(monkeypatch):
+    monkeypatch.setattr(
+        build.toolchain, "supported_flags", lambda *wanted: [f"-{c}" for c in wanted]
+    )
+    monkeypatch.setattr(build.toolchain, "select_linker", lambda linker: None)
+    monkeypatch.setattr(build, "_CONFIG_OPTIONS", {"optimize_size": True})
+    config = CythonConfig(extra_compile_args=["-fvisibility=default"])
+
+    # The configured arguments come last and win
+    assert build._extra_compile_args(config) == [
+        "-fvisibility=hidden",
+        "-ffunction-sections",
+        "-fvisibility=default",
+    ]
+    assert build._extra_link_args(config) == ["-gc-sections"]
+    assert build._size_setting(config) == "optimize_size"
+    config = CythonConfig(optimize_link=True)
+    assert build._size_setting(config) == "optimize_size+optimize_link"
+
+
+def test_record_sizes_only_when_asked(monkeypatch):
+    monkeypatch.setattr(build, "_CONFIG_OPTIONS", {})
+    assert not build._record_sizes(CythonConfig())
+    assert build._record_sizes(CythonConfig(size_baseline=True))
+    assert build._record_sizes(CythonConfig(optimize_link=True))
+
+
+def test_parse_report_build_settings():
+    parsed = _parse_build_settings(
+        {
+            "load_report": "true",
+            "optimize_size": "true",
+            "optimize_link": "false",
+            "size_baseline": "true",
+        }
+    )
+    assert parsed == {
+        "load_report": True,
+        "optimize_size": True,
+        "optimize_link": False,
+        "size_baseline": True,
+    }
+
+
+def test_cythonize_returns_job_tokens(tmp_path, monkeypatch):
+    monkeypatch.delenv("MAKEFLAGS", raising=False)
+    monkeypatch.chdir(tmp_path)
+    for name in ("a", "b", "c"):
+        (tmp_path / f"{name}.pyx").write_text("def f():\n    return 1\n")
+    client = jobserver.start(2)
+    try:
+        translated = build._cythonize(
+            [Extension(name, [f"{name}.pyx"]) for name in ("a", "b", "c")],
+            2,
+            force=False,
+            quiet=True,
+        )
+        assert [ext.sources for ext in translated] == [["a.c"], ["b.c"], ["c.c"]]
+        assert client.acquire_available(2) == [b"+"]
+    finally:
+        jobserver.stop()
+
+
+def test_cython_required_unless_generated_c_covers_every_module(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(build, "_CONFIG_OPTIONS", None)
+    (tmp_path / "pyproject.toml").write_text(
+        '[project]\nname = "pkg"\nversion = "0.1.0"\n\n[tool.hwh.cython]\n'
+    )
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "__init__.py").touch()
+    for name in ("a", "b"):
+        (tmp_path / "pkg" / f"{name}.pyx").write_text("def f():\n    return 1\n")
+        (tmp_path / "pkg" / f"{name}.c").write_text("/* generated */\n")
+    settings = build._generated_c_settings(
+        build._get_cython_config(PyProject(tmp_path))
+    )
+
+    def write_manifest(modules):
+        sources = {f"pkg/{name}.pyx": f"pkg/{name}.c" for name in modules}
+        manifest = generated_manifest(sources, lambda path: [path], settings)
+        (tmp_path / GENERATED_MANIFEST).write_text(json.dumps(manifest))
+
+    write_manifest(["a"])
+    assert build.get_requires_for_build_wheel() == [build.CYTHON_REQUIREMENT]
+    write_manifest(["a", "b"])
+    assert build.get_requires_for_build_wheel() == []
+    assert build.get_requires_for_build_editable() == [build.CYTHON_REQUIREMENT]
+
+
+def test_finish_annotation_indexes_every_job(tmp_path, monkeypatch):
+    jobs = []
+    for name in ("release", "bench"):
+        job = Future()
+        job.set_result([])
+        jobs.append((job, tmp_path / name))
+        (tmp_path / name).mkdir()
+    failed = Future()
+    failed.set_exception(RuntimeError("boom"))
+    monkeypatch.setattr(
+        build, "_ANNOTATION_JOBS", [jobs[0], (failed, tmp_path), jobs[1]]
+    )
+
+    build._finish_annotation()
+    assert (tmp_path / "release" / "index.html").exists()
+    assert (tmp_path / "bench" / "index.html").exists()
+    assert build._ANNOTATION_JOBS == []
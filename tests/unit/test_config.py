@@ -5,6 +5,7 @@ from hwh_backend.hwh_config import (
     CythonCompilerDirectives,
     CythonConfig,
     Language,
+    Linker,
     SitePackages,
 )
 
@@ -29,6 +30,13 @@ def test_invalid_language():
         CythonConfig(language="invalid")
 
 
+def test_linker_config():
+    assert CythonConfig().linker == Linker.DEFAULT
+    assert CythonConfig.from_pyproject({"cython": {"linker": "LLD"}}).linker == Linker.LLD
+    with pytest.raises(ValueError, match="Invalid linker"):
+        CythonConfig(linker="link.exe")
+
+
 def test_compiler_directives_validation():
     with pytest.raises(TypeError):
         CythonCompilerDirectives(boundscheck="invalid")
@@ -141,3 +149,47 @@ def test_library_config_from_pyproject(tmp_path):
     assert config.library_dirs == ["/usr/local/lib"]
     assert config.runtime_library_dirs == ["/usr/local/lib"]
     assert config.extra_link_args == ["-Wl,--no-as-needed"]
+
+
+def test_profile_overrides():
+    """Profiles are merged on top of [tool.hwh.cython]."""
+    from hwh_backend.hwh_config import HwhConfig
+
+    pyproject = {
+        "tool": {
+            "hwh": {
+                "cython": {
+                    "annotate": True,
+                    "modules": {
+                        "include_dirs": ["include"],
+                        "extra_compile_args": ["-O2"],
+                    },
+                    "compiler_directives": {"wraparound": False},
+                },
+                "profiles": {
+                    "release": {
+                        "modules": {"extra_compile_args": ["-O3"]},
+                        "compiler_directives": {"boundscheck": False},
+                    },
+                },
+            }
+        }
+    }
+
+    default = HwhConfig(pyproject).cython
+    assert default.extra_compile_args == ["-O2"]
+    assert default.compiler_directives.boundscheck
+
+    release = HwhConfig(pyproject, profile="release").cython
+    assert release.annotate
+    assert release.include_dirs == ["include"]
+    assert release.extra_compile_args == ["-O3"]
+    assert not release.compiler_directives.boundscheck
+    assert not release.compiler_directives.wraparound
+
+
+def test_unknown_profile():
+    from hwh_backend.hwh_config import HwhConfig
+
+    with pytest.raises(ValueError, match="Unknown build profile"):
+        HwhConfig({"tool": {"hwh": {"profiles": {"dev": {}}}}}, profile="release")
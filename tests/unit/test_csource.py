@@ -0,0 +1,86 @@
+from pathlib import Path
+
+from hwh_backend.csource import c_functions, cython_metadata, cython_sources
+
+GENERATED_HEADER = """/* Generated by Cython 0.29.37 */
+
+/* BEGIN: Cython Metadata
+{
+    "distutils": {
+        "name": "pkg.mod",
+        "sources": [
+            "pkg/mod.pyx"
+        ]
+    },
+    "module_name": "pkg.mod"
+}
+END: Cython Metadata */
+
+#include "Python.h"
+"""
+
+
+def test_cython_metadata(tmp_path):
+    c_path = tmp_path / "mod.c"
+    c_path.write_text(GENERATED_HEADER)
+    assert cython_metadata(c_path)["module_name"] == "pkg.mod"
+    assert cython_sources(c_path) == [Path("pkg/mod.pyx")]
+
+
+def test_cython_metadata_missing(tmp_path):
+    c_path = tmp_path / "handwritten.c"
+    c_path.write_text("int x;\n")
+    assert cython_metadata(c_path) == {}
+    assert cython_sources(c_path) == []
+
+
+GENERATED_FUNCTIONS = '''
+/* "pkg/mod.pyx":7
+ *         self.value = value
+ *
+ *     cpdef double compute(self):             # <<<<<<<<<<<<<<
+ */
+
+static double __pyx_f_3pkg_3mod_6BaseOp_compute(struct __pyx_obj *__pyx_v_self, int skip) {
+  double __pyx_r;
+  __Pyx_RefNannySetupContext("compute", 0);
+
+  /* "pkg/mod.pyx":8
+ *     cpdef double compute(self):
+ *         return self.value * 2.0             # <<<<<<<<<<<<<<
+ */
+  __pyx_t_1 = __Pyx_PyObject_GetAttrStr(__pyx_v_self, __pyx_n_s_value);
+  __Pyx_GOTREF(__pyx_t_1);
+  __Pyx_DECREF(__pyx_t_1); __pyx_t_1 = 0;
+  __pyx_r = 2.0;
+  __Pyx_RefNannyFinishContext();
+  return __pyx_r;
+}
+
+static PyObject *__pyx_pw_3pkg_3mod_6BaseOp_3compute(PyObject *__pyx_v_self, PyObject *unused) {
+  __Pyx_RefNannySetupContext("compute (wrapper)", 0);
+  return NULL;
+}
+
+static PyObject *__pyx_pf_3pkg_3mod_6BaseOp_5value___get__(struct __pyx_obj *__pyx_v_self) {
+  __Pyx_RefNannySetupContext("__get__", 0);
+  return NULL;
+}
+'''
+
+
+def test_c_functions(tmp_path):
+    c_path = tmp_path / "mod.c"
+    c_path.write_text(GENERATED_HEADER + GENERATED_FUNCTIONS)
+    functions = c_functions(c_path)
+
+    assert [(f.kind, f.qualname) for f in functions] == [
+        ("f", "BaseOp.compute"),
+        ("pw", "BaseOp.compute"),
+        ("pf", "BaseOp.value.__get__"),
+    ]
+    compute = functions[0]
+    assert compute.symbol == "__pyx_f_3pkg_3mod_6BaseOp_compute"
+    assert (compute.source_file, compute.source_line) == ("pkg/mod.pyx", 7)
+    assert compute.markers == [(27, "pkg/mod.pyx", 8)]
+    assert "__Pyx_PyObject_GetAttrStr" in compute.body
@@ -0,0 +1,60 @@
+import pytest
+from setuptools.extension import Extension
+
+from hwh_backend import dispatch
+from hwh_backend.dispatch import (
+    _variant_name,
+    dispatched_modules,
+    expand_dispatch_variants,
+    write_loader,
+)
+from hwh_backend.hwh_config import CythonConfig
+
+
+def test_variant_name():
+    assert _variant_name("pkg.sub.mod", "x86-64-v3") == "pkg.sub._hwh_dispatch.x86_64_v3.mod"
+    assert _variant_name("mod", "x86-64") == "_hwh_dispatch.x86_64.mod"
+
+
+def test_dispatched_modules():
+    names = [
+        "pkg.plain",
+        "pkg._hwh_dispatch.x86_64.mod",
+        "pkg._hwh_dispatch.x86_64_v3.mod",
+    ]
+    assert dispatched_modules(names) == {"pkg.mod": ["x86_64", "x86_64_v3"]}
+
+
+def test_loader_orders_best_first(tmp_path):
+    loader = tmp_path / "mod.py"
+    write_loader(loader, "pkg.mod", ["x86_64", "x86_64_v4", "x86_64_v3"], "mod.so")
+
+    namespace = {}
+    source = loader.read_text()
+    # Only evaluate the variant table, not the import itself
+    exec(source.split("\n\n\ndef ")[0], namespace)
+    assert [target for target, _ in namespace["_VARIANTS"]] == [
+        "x86_64_v4",
+        "x86_64_v3",
+        "x86_64",
+    ]
+    compile(source, str(loader), "exec")
+
+
+def test_invalid_dispatch_target():
+    with pytest.raises(ValueError, match="Invalid CPU dispatch targets"):
+        CythonConfig(dispatch_modules=["pkg.mod"], dispatch_targets=["pentium4"])
+
+
+def test_no_supported_dispatch_target(tmp_path, monkeypatch):
+    monkeypatch.setattr(dispatch.platform, "machine", lambda: "x86_64")
+    monkeypatch.setattr(dispatch.toolchain, "supports", lambda capability: False)
+    ext_modules = [Extension("pkg.mod", [str(tmp_path / "mod.c")])]
+
+    # Built without dispatch instead of left out of the wheel
+    assert (
+        expand_dispatch_variants(
+            ext_modules, ["pkg.mod"], ["x86-64", "x86-64-v3"], tmp_path / "variants"
+        )
+        == ext_modules
+    )
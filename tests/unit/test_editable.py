@@ -0,0 +1,136 @@
+import json
+import subprocess
+import sys
+import time
+import zipfile
+
+from setuptools.extension import Extension
+
+from hwh_backend.editable import (
+    add_import_hook,
+    extension_sources,
+    fingerprint,
+    hook_module_name,
+    hook_source,
+    update_manifest,
+)
+
+GENERATED_HEADER = """/* BEGIN: Cython Metadata
+{{"distutils": {{"sources": ["{pyx}"]}}, "module_name": "pkg.mod"}}
+END: Cython Metadata */
+"""
+
+
+def _generated(tmp_path):
+    pyx = tmp_path / "pkg" / "mod.pyx"
+    pyx.parent.mkdir()
+    pyx.write_text("def f():\n    return 1\n")
+    c_path = tmp_path / "pkg" / "mod.c"
+    c_path.write_text(GENERATED_HEADER.format(pyx=pyx))
+    return pyx, c_path
+
+
+def test_extension_sources(tmp_path):
+    pyx, c_path = _generated(tmp_path)
+    exts = [
+        Extension("pkg.mod", [str(c_path)]),
+        # CPU dispatch variant, imported through the loader named pkg.mod
+        Extension("pkg._hwh_dispatch.x86_64_v3.mod", [str(c_path)]),
+    ]
+    assert extension_sources(exts) == {"pkg.mod": str(pyx)}
+
+
+def test_update_manifest(tmp_path):
+    pyx, _ = _generated(tmp_path)
+    manifest = tmp_path / "build" / "hwh-editable.json"
+
+    update_manifest(manifest, {"pkg.mod": str(pyx)}, time.time_ns())
+    assert json.loads(manifest.read_text()) == {"pkg.mod": fingerprint(pyx)}
+
+    # Changed after the build started
+    update_manifest(manifest, {"pkg.mod": str(pyx)}, 0)
+    assert json.loads(manifest.read_text()) == {}
+
+
+def test_hook_rebuilds_stale_module(tmp_path):
+    pyx, _ = _generated(tmp_path)
+    (tmp_path / "pkg" / "__init__.py").touch()
+    (tmp_path / "pkg" / "mod.py").write_text("VALUE = 1\n")
+    manifest = tmp_path / "build" / "hwh-editable.json"
+    update_manifest(manifest, {"pkg.mod": str(pyx)}, time.time_ns())
+    (tmp_path / "hook.py").write_text(
+        hook_source("pkg", tmp_path, {"pkg.mod": str(pyx)})
+    )
+
+    script = (
+        "import hook, subprocess\n"
+        "subprocess.run = lambda cmd, **kwargs: print(*cmd[-2:]) or "
+        "subprocess.CompletedProcess(cmd, 0)\n"
+        "import pkg.mod\n"
+    )
+    run = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert run.stdout == ""
+
+    pyx.write_text("def f():\n    return 2\n")
+    run = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert run.stdout == "rebuild pkg.mod\n"
+    assert "rebuilding stale extension pkg.mod" in run.stderr
+
+
+def test_hook_rebuilds_with_config_settings(tmp_path):
+    pyx, _ = _generated(tmp_path)
+    (tmp_path / "pkg" / "__init__.py").touch()
+    (tmp_path / "pkg" / "mod.py").write_text("VALUE = 1\n")
+    (tmp_path / "hook.py").write_text(
+        hook_source(
+            "pkg",
+            tmp_path,
+            {"pkg.mod": str(pyx)},
+            {"profile": "release", "linetrace": "true"},
+        )
+    )
+
+    script = (
+        "import hook, subprocess\n"
+        "subprocess.run = lambda cmd, **kwargs: print(*cmd[3:]) or "
+        "subprocess.CompletedProcess(cmd, 0)\n"
+        "import pkg.mod\n"
+    )
+    run = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert run.stdout == "rebuild -C profile=release -C linetrace=true pkg.mod\n"
+
+
+def test_add_import_hook(tmp_path):
+    wheel = tmp_path / "pkg-0.1.0-py3-none-any.whl"
+    with zipfile.ZipFile(wheel, "w") as zf:
+        zf.writestr("pkg-0.1.0.dist-info/METADATA", "Name: pkg\n")
+        zf.writestr("pkg-0.1.0.dist-info/RECORD", "pkg-0.1.0.dist-info/RECORD,,\n")
+
+    add_import_hook(wheel, "My-Pkg", "# hook\n")
+    module = hook_module_name("My-Pkg")
+    assert module == "_hwh_editable_my_pkg"
+    with zipfile.ZipFile(wheel) as zf:
+        assert zf.read(f"{module}.pth") == f"import {module}\n".encode()
+        assert zf.read(f"{module}.py") == b"# hook\n"
+        record = zf.read("pkg-0.1.0.dist-info/RECORD").decode().splitlines()
+    assert record[1].startswith(f"{module}.py,sha256=")
+    assert record[1].endswith(",7")
+    assert record[2].startswith(f"{module}.pth,sha256=")
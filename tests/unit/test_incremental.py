@@ -0,0 +1,110 @@
+import os
+
+from setuptools.extension import Extension
+
+from hwh_backend.incremental import (
+    header_dependencies,
+    parse_depfile,
+    remove_if_flags_changed,
+    reuse_objects,
+    write_extension_stamp,
+)
+
+
+class FakeCompiler:
+    compiler_so = ["cc"]
+    compiler_type = "unix"
+
+    def __init__(self, headers=()):
+        self.compiled = []
+        self.headers = headers
+
+    def _compile(self, obj, src, ext, cc_args, extra_postargs, pp_opts):
+        self.compiled.append(obj)
+        with open(obj, "w") as f:
+            f.write("object")
+        if "-MF" in extra_postargs:
+            depfile = extra_postargs[extra_postargs.index("-MF") + 1]
+            with open(depfile, "w") as f:
+                f.write(f"{obj}: {src} \\\n " + " ".join(self.headers) + "\n")
+
+
+def test_reuse_up_to_date_objects(tmp_path):
+    source = tmp_path / "mod.c"
+    source.write_text("int x;")
+    obj = str(tmp_path / "mod.o")
+    compiler = FakeCompiler()
+    reuse_objects(compiler)
+
+    compiler._compile(obj, str(source), ".c", [], ["-O2"], [])
+    compiler._compile(obj, str(source), ".c", [], ["-O2"], [])
+    assert len(compiler.compiled) == 1
+
+    # Different flags
+    compiler._compile(obj, str(source), ".c", [], ["-O0"], [])
+    assert len(compiler.compiled) == 2
+
+    # Newer source
+    os.utime(source, (os.path.getmtime(obj) + 10,) * 2)
+    compiler._compile(obj, str(source), ".c", [], ["-O0"], [])
+    assert len(compiler.compiled) == 3
+
+
+def test_parse_depfile(tmp_path):
+    depfile = tmp_path / "mod.o.d"
+    depfile.write_text(
+        "build/mod.o: mod.c /usr/include/stdio.h \\\n"
+        " inc/my\\ header.h\n"
+        "inc/my\\ header.h:\n"
+    )
+    assert parse_depfile(str(depfile)) == [
+        "mod.c",
+        "/usr/include/stdio.h",
+        "inc/my header.h",
+    ]
+
+
+def test_recompile_on_header_change(tmp_path):
+    source = tmp_path / "mod.c"
+    source.write_text('#include "lib.h"')
+    header = tmp_path / "lib.h"
+    header.write_text("#define X 1")
+    obj = str(tmp_path / "mod.o")
+    compiler = FakeCompiler(headers=[str(header)])
+    reuse_objects(compiler)
+
+    compiler._compile(obj, str(source), ".c", [], [], [])
+    assert header_dependencies([obj]) == [str(header)]
+    compiler._compile(obj, str(source), ".c", [], [], [])
+    assert len(compiler.compiled) == 1
+
+    os.utime(header, (os.path.getmtime(obj) + 10,) * 2)
+    compiler._compile(obj, str(source), ".c", [], [], [])
+    assert len(compiler.compiled) == 2
+
+
+def test_force_recompiles(tmp_path):
+    source = tmp_path / "mod.c"
+    source.write_text("int x;")
+    obj = str(tmp_path / "mod.o")
+    compiler = FakeCompiler()
+    reuse_objects(compiler, force=True)
+
+    compiler._compile(obj, str(source), ".c", [], [], [])
+    compiler._compile(obj, str(source), ".c", [], [], [])
+    assert len(compiler.compiled) == 2
+
+
+def test_rebuild_on_changed_flags(tmp_path):
+    ext_path = tmp_path / "mod.so"
+    stamp = tmp_path / "stamps" / "mod.flags"
+    ext = Extension("mod", ["mod.c"], extra_link_args=["-Wl,-O1"])
+    ext_path.write_text("extension")
+    write_extension_stamp(ext, stamp)
+
+    remove_if_flags_changed(ext, str(ext_path), stamp)
+    assert ext_path.exists()
+
+    ext.extra_link_args.append("-Wl,--gc-sections")
+    remove_if_flags_changed(ext, str(ext_path), stamp)
+    assert not ext_path.exists()
@@ -0,0 +1,22 @@
+import sys
+
+import pytest
+
+from hwh_backend.interpreters import interpreter_tag
+
+
+def test_interpreter_tag():
+    assert interpreter_tag(sys.executable) == sys.implementation.cache_tag
+
+
+def test_missing_interpreter():
+    with pytest.raises(ValueError, match="not found"):
+        interpreter_tag("hwh-no-such-python")
+
+
+def test_interpreter_without_backend(tmp_path):
+    python = tmp_path / "python"
+    python.write_text("#!/bin/sh\necho 'No module named hwh_backend' >&2\nexit 1\n")
+    python.chmod(0o755)
+    with pytest.raises(ValueError, match="can't run hwh-backend: No module named"):
+        interpreter_tag(str(python))
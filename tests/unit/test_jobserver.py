@@ -0,0 +1,173 @@
+import fcntl
+import os
+import threading
+import time
+
+import pytest
+
+from hwh_backend import jobserver
+from hwh_backend.jobserver import Jobserver
+
+
+@pytest.fixture
+def no_makeflags(monkeypatch):
+    monkeypatch.delenv("MAKEFLAGS", raising=False)
+    yield
+    jobserver.stop()
+
+
+def test_from_makeflags_pipe():
+    read_fd, write_fd = os.pipe()
+    try:
+        client = Jobserver.from_makeflags(f" -j4 --jobserver-auth={read_fd},{write_fd}")
+        assert client.write_fd == write_fd
+        # Pre 4.2 name
+        old = Jobserver.from_makeflags(f"--jobserver-fds={read_fd},{write_fd} -j")
+        assert old
+        os.write(write_fd, b"+")
+        assert client.acquire_available(2) == [b"+"]
+        client.close()
+        old.close()
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+def test_from_makeflags_unusable():
+    assert Jobserver.from_makeflags("-j4") is None
+    assert Jobserver.from_makeflags("--jobserver-auth=fifo:/nonexistent") is None
+    # Closed descriptors, e.g. a recipe without +
+    read_fd, write_fd = os.pipe()
+    os.close(read_fd)
+    os.close(write_fd)
+    assert Jobserver.from_makeflags(f"--jobserver-auth={read_fd},{write_fd}") is None
+
+
+def test_tokens_limit_concurrency():
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"++")
+    client = Jobserver(read_fd, write_fd)
+    running, peak = [], []
+    lock = threading.Lock()
+
+    def job():
+        with client.token():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+
+    threads = [threading.Thread(target=job) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # Two tokens and the implicit one
+    assert max(peak) == 3
+    assert client.acquire_available(5) == [b"+", b"+"]
+    os.close(read_fd)
+    os.close(write_fd)
+
+
+def test_token_taken_between_select_and_read(no_makeflags, monkeypatch):
+    client = jobserver.start(2)
+    other = Jobserver.from_makeflags(os.environ["MAKEFLAGS"])
+    select = jobserver.select.select
+
+    def select_then_drain(*args):
+        readable = select(*args)
+        # Another client reads the token first
+        assert os.read(other.read_fd, 1) == b"+"
+        return readable
+
+    monkeypatch.setattr(jobserver.select, "select", select_then_drain)
+    acquired = []
+    thread = threading.Thread(target=lambda: acquired.append(client.acquire_available(1)))
+    thread.start()
+    thread.join(timeout=5)
+    monkeypatch.undo()
+    if thread.is_alive():
+        # Unblock the read before failing
+        other.release([b"+"])
+        thread.join()
+        pytest.fail("reading a token taken by another client blocked")
+    assert acquired == [[]]
+    other.close()
+
+
+def test_inherited_pipe_read_does_not_block(monkeypatch):
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"+")
+    client = Jobserver.from_makeflags(f"--jobserver-auth={read_fd},{write_fd}")
+    select = jobserver.select.select
+
+    def select_then_drain(*args):
+        readable = select(*args)
+        # make reads the token first
+        assert os.read(read_fd, 1) == b"+"
+        return readable
+
+    monkeypatch.setattr(jobserver.select, "select", select_then_drain)
+    assert client.acquire_available(1) == []
+    monkeypatch.undo()
+    client.close()
+    # make's own descriptor stays blocking
+    assert not fcntl.fcntl(read_fd, fcntl.F_GETFL) & os.O_NONBLOCK
+    os.close(read_fd)
+    os.close(write_fd)
+
+
+def test_token_waits_for_implicit_token():
+    # make -j1 hands out no tokens
+    read_fd, write_fd = os.pipe()
+    client = Jobserver(read_fd, write_fd)
+    done = []
+
+    def job():
+        with client.token():
+            done.append(1)
+
+    with client.token():
+        thread = threading.Thread(target=job)
+        thread.start()
+        time.sleep(0.1)
+        assert not done
+    thread.join(timeout=5)
+    assert done == [1]
+    os.close(read_fd)
+    os.close(write_fd)
+
+
+def test_start_own_jobserver(no_makeflags):
+    client = jobserver.start(3)
+    makeflags = os.environ["MAKEFLAGS"]
+    assert makeflags.startswith("-j3 --jobserver-auth=fifo:")
+    assert jobserver.start(8) is client
+
+    # Child processes join through MAKEFLAGS
+    child = Jobserver.from_makeflags(makeflags)
+    tokens = child.acquire_available(5)
+    assert len(tokens) == 2
+    assert client.acquire_available(1) == []
+    child.release(tokens)
+    child.close()
+
+    fifo = makeflags.split("fifo:")[1]
+    jobserver.stop()
+    assert "MAKEFLAGS" not in os.environ
+    assert not os.path.exists(fifo)
+    assert jobserver.current() is None
+
+
+def test_start_joins_makeflags(monkeypatch):
+    read_fd, write_fd = os.pipe()
+    monkeypatch.setenv("MAKEFLAGS", f"-j2 --jobserver-auth={read_fd},{write_fd}")
+    try:
+        assert jobserver.start(8).write_fd == write_fd
+        assert os.environ["MAKEFLAGS"] == f"-j2 --jobserver-auth={read_fd},{write_fd}"
+    finally:
+        jobserver.stop()
+        os.close(read_fd)
+        os.close(write_fd)
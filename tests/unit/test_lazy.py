@@ -0,0 +1,72 @@
+import importlib
+import sys
+
+from hwh_backend.lazy import (
+    lazy_packages,
+    public_names,
+    read_lazy_submodules,
+    write_lazy_module,
+)
+
+
+def test_public_names(tmp_path):
+    pyx = tmp_path / "mod.pyx"
+    pyx.write_text(
+        """
+cdef class Vector:
+    def method(self):
+        pass
+
+cpdef double area(double r):
+    return r
+
+cpdef list[int] numbers():
+    return []
+
+def hello():
+    pass
+
+class Plain:
+    pass
+
+cdef int hidden(int x):
+    return x
+
+def _private():
+    pass
+"""
+    )
+    assert public_names(pyx) == ["Plain", "Vector", "area", "hello", "numbers"]
+
+
+def test_lazy_packages():
+    modules = {"pkg.a": ["f"], "pkg.sub.b": [], "top": []}
+    assert lazy_packages(modules) == {"pkg": {"a": ["f"]}, "pkg.sub": {"b": []}}
+
+
+def test_lazy_module_imports_on_access(tmp_path, monkeypatch):
+    pkg = tmp_path / "lazypkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("from ._hwh_lazy import __getattr__, __dir__\n")
+    (pkg / "heavy.py").write_text("def compute():\n    return 42\n")
+    write_lazy_module(pkg / "_hwh_lazy.py", "lazypkg", {"heavy": ["compute"]})
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+    try:
+        lazypkg = importlib.import_module("lazypkg")
+        assert "lazypkg.heavy" not in sys.modules
+        assert "compute" in dir(lazypkg)
+
+        assert lazypkg.compute() == 42
+        assert "lazypkg.heavy" in sys.modules
+        assert lazypkg.heavy.compute is lazypkg.compute
+    finally:
+        for name in ("lazypkg", "lazypkg._hwh_lazy", "lazypkg.heavy"):
+            sys.modules.pop(name, None)
+
+
+def test_read_lazy_submodules(tmp_path):
+    path = tmp_path / "_hwh_lazy.py"
+    assert read_lazy_submodules(path) == {}
+    write_lazy_module(path, "pkg", {"a": ["f"], "b": []})
+    assert read_lazy_submodules(path) == {"a": ["f"], "b": []}
@@ -0,0 +1,140 @@
+import importlib.machinery
+import shutil
+import subprocess
+import sysconfig
+
+import pytest
+
+from hwh_backend.load_report import (
+    LoadCost,
+    extension_modules,
+    format_report,
+    measure,
+    parse_importtime,
+    write_load_report,
+)
+
+_SUFFIX = importlib.machinery.EXTENSION_SUFFIXES[0]
+
+_EXTENSION = """\
+#include <Python.h>
+
+static struct PyModuleDef module = {PyModuleDef_HEAD_INIT, "fast", NULL, -1, NULL};
+
+PyMODINIT_FUNC PyInit_fast(void) { return PyModule_Create(&module); }
+"""
+
+
+def _compile(source: str, path):
+    c_path = path.with_suffix(".c")
+    c_path.write_text(source)
+    subprocess.run(
+        [
+            "cc",
+            "-shared",
+            "-fPIC",
+            f"-I{sysconfig.get_path('include')}",
+            str(c_path),
+            "-o",
+            str(path),
+        ],
+        check=True,
+    )
+    c_path.unlink()
+
+
+def test_extension_modules(tmp_path):
+    for path in [
+        f"pkg/mod{_SUFFIX}",
+        f"pkg/_hwh_dispatch/x86_64/fast{_SUFFIX}",
+        f"pkg/_hwh_dispatch/x86_64_v3/fast{_SUFFIX}",
+        "pkg/libhelper.so.1",
+    ]:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).touch()
+
+    assert extension_modules(tmp_path) == {
+        "pkg.fast": None,
+        "pkg.mod": tmp_path / f"pkg/mod{_SUFFIX}",
+    }
+
+
+def test_parse_importtime():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   pkg.mod\n"
+        "import time:        30 |        150 | pkg\n"
+        "Traceback (most recent call last):\n"
+    )
+    assert parse_importtime(stderr, "pkg.mod") == (120, 120)
+    assert parse_importtime(stderr, "pkg") == (30, 150)
+    assert parse_importtime(stderr, "other") == (None, None)
+
+
+def test_report_ranks_by_import_time():
+    report = format_report(
+        [
+            LoadCost("pkg.cheap", import_cumulative_us=10),
+            LoadCost("pkg.broken", error="ImportError: boom"),
+            LoadCost("pkg.costly", import_cumulative_us=5000, preloaded=True),
+        ]
+    )
+    modules = [line.split()[0] for line in report.splitlines()[1:4]]
+    assert modules == ["pkg.costly", "pkg.cheap", "pkg.broken"]
+    assert "failed: ImportError: boom" in report
+    assert "only have import times" in report
+
+
+def test_measure_writes_no_bytecode(tmp_path):
+    package = tmp_path / "pkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("from . import helper\n")
+    (package / "helper.py").touch()
+    (package / "mod.py").touch()
+
+    assert measure(tmp_path, "pkg.mod", None).error is None
+    assert not list(tmp_path.rglob("__pycache__"))
+    assert not list(tmp_path.rglob("*.pyc"))
+
+
+@pytest.mark.skipif(shutil.which("cc") is None, reason="needs a C compiler")
+def test_measure_imports_build_dependencies(tmp_path, monkeypatch):
+    # Build isolation puts the build dependencies on PYTHONPATH
+    dependencies = tmp_path / "overlay"
+    dependencies.mkdir()
+    (dependencies / "builddep.py").touch()
+    monkeypatch.syspath_prepend(str(dependencies))
+    package = tmp_path / "root" / "pkg"
+    package.mkdir(parents=True)
+    (package / "__init__.py").touch()
+    path = package / f"fast{_SUFFIX}"
+    _compile(
+        _EXTENSION.replace(
+            "return PyModule_Create(&module);",
+            'return PyImport_ImportModule("builddep") ? PyModule_Create(&module) : NULL;',
+        ),
+        path,
+    )
+
+    assert measure(tmp_path / "root", "pkg.fast", path).error is None
+
+
+@pytest.mark.skipif(shutil.which("cc") is None, reason="needs a C compiler")
+def test_write_load_report(tmp_path):
+    package = tmp_path / "root" / "pkg"
+    package.mkdir(parents=True)
+    (package / "__init__.py").touch()
+    _compile(_EXTENSION, package / f"fast{_SUFFIX}")
+    (package / f"broken{_SUFFIX}").write_text("not an object")
+
+    costs = {
+        cost.module: cost
+        for cost in write_load_report(tmp_path / "root", tmp_path / "report")
+    }
+    fast = costs["pkg.fast"]
+    assert fast.error is None
+    assert fast.import_cumulative_us is not None
+    assert fast.dlopen_us is not None and fast.rss_kib is not None
+    assert fast.relocations is not None
+    assert costs["pkg.broken"].error is not None
+    assert (tmp_path / "report" / "load-report.txt").exists()
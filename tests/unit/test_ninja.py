@@ -0,0 +1,84 @@
+import json
+import shutil
+
+import pytest
+
+from hwh_backend.__main__ import main
+from hwh_backend.ninja import (
+    NinjaRecorder,
+    cython_command,
+    run_ninja,
+    write_ninja_file,
+)
+
+
+def _record():
+    recorder = NinjaRecorder()
+    recorder.spawn(["cc", "-x", "c-header", "-c", "pch.h", "-o", "pch.h.gch"])
+    recorder.spawn(["cc", "-O2", "-c", "pkg/mod.c", "-o", "tmp/mod.o", "-include", "pch.h"])
+    recorder.spawn(["cc", "-shared", "tmp/mod.o", "-o", "lib/pkg/mod.so"])
+    return recorder
+
+
+def test_write_ninja_file(tmp_path):
+    cython = cython_command("pkg/mod.pyx", "pkg/mod.c", {"boundscheck": False}, ["inc"])
+    path = write_ninja_file(
+        tmp_path / "build.ninja", _record().commands, {"pkg/mod.c": cython}
+    )
+    content = path.read_text()
+    assert "build pkg/mod.c: cython pkg/mod.pyx\n" in content
+    assert "  depfile = build/depfiles/pkg/mod.c.dep\n" in content
+    assert "build tmp/mod.o: cc pkg/mod.c | pch.h.gch\n" in content
+    assert "build lib/pkg/mod.so: link tmp/mod.o\n" in content
+    assert "  cmd = cc -O2 -c pkg/mod.c -o tmp/mod.o -include pch.h\n" in content
+
+
+def test_cython_command():
+    cmd = cython_command(
+        "pkg/mod.pyx",
+        "build/cython/pkg/mod.c",
+        {"boundscheck": False},
+        ["inc"],
+        c_line_in_traceback=False,
+    )
+    assert cmd[1:4] == ["-m", "hwh_backend", "cythonize"]
+    assert json.loads(cmd[cmd.index("--directives") + 1]) == {"boundscheck": False}
+    assert "--no-c-in-traceback" in cmd
+    assert cmd[-3:] == ["-o", "build/cython/pkg/mod.c", "pkg/mod.pyx"]
+
+
+def test_cythonize_command(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "__init__.py").touch()
+    (tmp_path / "pkg" / "mod.pyx").write_text("def f():\n    return 1\n")
+
+    main(["cythonize", "-o", "build/cython/pkg/mod.c", "pkg/mod.pyx"])
+    c_path = tmp_path / "build" / "cython" / "pkg" / "mod.c"
+    assert '"module_name": "pkg.mod"' in c_path.read_text()
+    depfile = tmp_path / "build" / "depfiles" / "build" / "cython" / "pkg" / "mod.c.dep"
+    assert depfile.read_text().startswith("build/cython/pkg/mod.c:")
+    assert not (tmp_path / "build" / "cython" / "pkg" / "mod.c.dep").exists()
+
+
+def test_cythonize_command_in_source_tree(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "mod.pyx").write_text("def f():\n    return 1\n")
+
+    main(["cythonize", "-o", "pkg/mod.c", "pkg/mod.pyx"])
+    # Only the generated C is written next to the .pyx file
+    assert sorted(p.name for p in (tmp_path / "pkg").iterdir()) == ["mod.c", "mod.pyx"]
+    assert (tmp_path / "build" / "depfiles" / "pkg" / "mod.c.dep").exists()
+
+
+@pytest.mark.skipif(shutil.which("ninja") is None, reason="ninja is not installed")
+def test_run_ninja(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "mod.c").write_text("int f(void) { return 1; }\n")
+    commands = [["cc", "-c", "mod.c", "-o", "mod.o"]]
+    path = write_ninja_file(tmp_path / "build.ninja", commands, {})
+
+    run_ninja(shutil.which("ninja"), path, 1)
+    assert (tmp_path / "mod.o").exists()
+    assert (tmp_path / "mod.o.d").exists()
@@ -0,0 +1,51 @@
+from setuptools.errors import CompileError
+
+from hwh_backend.pch import PCH_HEADER, PrecompiledHeader, pch_source
+
+
+class FakeCompiler:
+    compiler_so = ["cc"]
+
+    def __init__(self, fail_header=False):
+        self.calls = []
+        self.fail_header = fail_header
+
+    def _compile(self, obj, src, ext, cc_args, extra_postargs, pp_opts):
+        if self.fail_header and src.endswith(".h"):
+            raise CompileError("unsupported")
+        self.calls.append((obj, cc_args, extra_postargs))
+
+
+def test_pch_source_defines_ssize_t_clean_first():
+    source = pch_source(["Python.h", "numpy/arrayobject.h"])
+    assert source.index("#define PY_SSIZE_T_CLEAN") < source.index(
+        '#include "Python.h"'
+    )
+    assert '#include "numpy/arrayobject.h"' in source
+
+
+def test_precompiled_header_used_with_common_flags(tmp_path):
+    compiler = FakeCompiler()
+    PrecompiledHeader(compiler, ["Python.h"], tmp_path, ["-O2"]).install()
+
+    compiler._compile("a.o", "a.c", ".c", ["-c"], ["-O2"], [])
+    compiler._compile("b.o", "b.c", ".c", ["-c"], ["-O2"], [])
+    compiler._compile("c.o", "c.c", ".c", ["-c"], ["-O2", "-march=x86-64-v3"], [])
+
+    header_obj, header_args, _ = compiler.calls[0]
+    assert header_obj.endswith(f"{PCH_HEADER}.gch")
+    assert header_args == ["-x", "c-header", "-c"]
+    header = header_obj.removesuffix(".gch")
+    assert [call[2] for call in compiler.calls[1:]] == [
+        ["-include", header, "-O2"],
+        ["-include", header, "-O2"],
+        ["-O2", "-march=x86-64-v3"],
+    ]
+
+
+def test_precompiled_header_failure_falls_back(tmp_path):
+    compiler = FakeCompiler(fail_header=True)
+    PrecompiledHeader(compiler, ["Python.h"], tmp_path, ["-O2"]).install()
+
+    compiler._compile("a.o", "a.c", ".c", ["-c"], ["-O2"], [])
+    assert compiler.calls == [("a.o", ["-c"], ["-O2"])]
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from hwh_backend.hwh_config import PerfGate
+from hwh_backend.perf_gate import (
+    PerfGateError,
+    check_perf_gate,
+    count_python_interaction,
+)
+
+GENERATED = '''/* BEGIN: Cython Metadata
+{"module_name": "pkg.mod"}
+END: Cython Metadata */
+
+/* "pkg/mod.pyx":1
+ * def scale(x):             # <<<<<<<<<<<<<<
+ */
+
+static PyObject *__pyx_pf_3pkg_3mod_scale(PyObject *__pyx_self, PyObject *__pyx_v_x) {
+  __Pyx_RefNannySetupContext("scale", 0);
+%s
+  __Pyx_RefNannyFinishContext();
+  return __pyx_r;
+}
+'''
+
+MULTIPLY = """
+  __pyx_t_1 = PyNumber_Multiply(__pyx_v_x, __pyx_int_2);
+  __Pyx_GOTREF(__pyx_t_1);
+  __Pyx_XDECREF(__pyx_r);
+"""
+
+
+def test_count_python_interaction():
+    counts = count_python_interaction(
+        MULTIPLY + "  /* PyList_New(0) in a comment */\n  Py_INCREF(x);\n"
+    )
+    assert counts == {"python_api": 1, "refcount": 2}
+
+
+@pytest.fixture
+def generated(tmp_path):
+    c_path = tmp_path / "mod.c"
+    c_path.write_text(GENERATED % MULTIPLY)
+    return c_path
+
+
+def test_missing_baseline_is_written(tmp_path, generated):
+    baseline = tmp_path / "baseline.json"
+    check_perf_gate({"pkg.mod": generated}, baseline, PerfGate.FAIL)
+    assert json.loads(baseline.read_text()) == {
+        "pkg.mod": {"scale": {"python_api": 1, "refcount": 1}}
+    }
+
+
+def test_regression_fails(tmp_path, generated):
+    baseline = tmp_path / "baseline.json"
+    check_perf_gate({"pkg.mod": generated}, baseline, PerfGate.UPDATE)
+
+    generated.write_text(GENERATED % (MULTIPLY * 2))
+    with pytest.raises(PerfGateError, match="pkg.mod.scale: python_api 1 -> 2"):
+        check_perf_gate({"pkg.mod": generated}, baseline, PerfGate.FAIL)
+
+    # Within threshold or warning only
+    check_perf_gate({"pkg.mod": generated}, baseline, PerfGate.FAIL, threshold=1)
+    check_perf_gate({"pkg.mod": generated}, baseline, PerfGate.WARN)
@@ -0,0 +1,65 @@
+import errno
+import os
+
+from hwh_backend import placement
+from hwh_backend.placement import place_file, place_tree, unshare
+
+
+def test_place_file_links_and_keeps_mtime(tmp_path):
+    src = tmp_path / "build" / "mod.so"
+    src.parent.mkdir()
+    src.write_bytes(b"\x7fELF")
+    os.utime(src, ns=(1_000_000_000, 1_000_000_000))
+    dst = tmp_path / "pkg" / "mod.so"
+
+    assert place_file(src, dst)
+    assert dst.read_bytes() == b"\x7fELF"
+    assert dst.stat().st_mtime_ns == 1_000_000_000
+    assert not list(dst.parent.glob(".*.tmp"))
+
+    # Unchanged files are left alone
+    assert not place_file(src, dst)
+    assert not place_file(src, dst.parent)
+
+
+def test_place_file_replaces_changed(tmp_path):
+    src = tmp_path / "mod.so"
+    src.write_bytes(b"new")
+    dst = tmp_path / "out.so"
+    dst.write_bytes(b"old!")
+    inode = dst.stat().st_ino
+
+    assert place_file(src, dst)
+    assert dst.read_bytes() == b"new"
+    # Renamed over, a process that loaded the old file keeps it
+    assert dst.stat().st_ino != inode
+
+
+def test_place_file_falls_back_to_copy(tmp_path, monkeypatch):
+    def unsupported(src, dst):
+        raise OSError(errno.EXDEV, "cross-device link")
+
+    monkeypatch.setattr(placement, "_reflink", unsupported)
+    monkeypatch.setattr(os, "link", unsupported)
+    src = tmp_path / "mod.so"
+    src.write_bytes(b"data")
+    dst = tmp_path / "out" / "mod.so"
+
+    assert place_file(src, dst)
+    assert dst.read_bytes() == b"data"
+    assert dst.stat().st_ino != src.stat().st_ino
+    assert dst.stat().st_mtime_ns == src.stat().st_mtime_ns
+
+
+def test_place_tree_and_unshare(tmp_path):
+    src = tmp_path / "lib"
+    (src / "pkg").mkdir(parents=True)
+    (src / "pkg" / "mod.so").write_bytes(b"data")
+    dst = tmp_path / "wheel"
+
+    assert place_tree(src, dst) == [str(dst / "pkg" / "mod.so")]
+    placed = dst / "pkg" / "mod.so"
+    unshare(placed)
+    assert placed.stat().st_nlink == 1
+    placed.write_bytes(b"stripped")
+    assert (src / "pkg" / "mod.so").read_bytes() == b"data"
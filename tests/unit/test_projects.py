@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+from hwh_backend import projects
+from hwh_backend.projects import Project, notify_translated, project_graph
+
+
+def _project(tmp_path, name, files, dependencies=()):
+    project_dir = tmp_path / name
+    package = project_dir / name
+    package.mkdir(parents=True)
+    (package / "__init__.py").touch()
+    for file_name, content in files.items():
+        (package / file_name).write_text(content)
+    deps = ", ".join(f'"{dep}"' for dep in dependencies)
+    (project_dir / "pyproject.toml").write_text(
+        f'[project]\nname = "{name}"\nversion = "0.1.0"\ndependencies = [{deps}]\n'
+    )
+    return Project(project_dir)
+
+
+def test_project_graph(tmp_path):
+    base = _project(
+        tmp_path, "base_math", {"operations.pxd": "cdef class Vector:\n    pass\n"}
+    )
+    shapes = "from base_math.operations cimport Vector\nfrom libc.math cimport sqrt\n"
+    geometry = _project(tmp_path, "geometry", {"shapes.pyx": shapes})
+    app = _project(tmp_path, "app", {}, dependencies=["Geometry>=0.1", "numpy"])
+
+    assert project_graph([app, geometry, base]) == {
+        "app": {"geometry"},
+        "geometry": {"base-math"},
+        "base-math": set(),
+    }
+    assert geometry.package_roots == [str(tmp_path / "geometry")]
+
+
+def test_project_graph_cycle(tmp_path):
+    a = _project(tmp_path, "a", {"a.pyx": "cimport b\n"})
+    b = _project(tmp_path, "b", {}, dependencies=["a"])
+    with pytest.raises(ValueError, match="cycle"):
+        project_graph([a, b])
+
+
+def test_notify_translated(monkeypatch):
+    read_fd, write_fd = os.pipe()
+    monkeypatch.setenv(projects.TRANSLATED_FD_ENV, str(write_fd))
+    notify_translated()
+    # Only the first build of the process notifies
+    notify_translated()
+    assert os.read(read_fd, 2) == b"1"
+    assert projects.TRANSLATED_FD_ENV not in os.environ
+    os.close(read_fd)
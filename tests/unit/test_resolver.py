@@ -0,0 +1,158 @@
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from importlib.machinery import ModuleSpec
+
+import pytest
+
+from hwh_backend import cache, resolver
+from hwh_backend.hwh_config import CythonConfig, SitePackages
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("HWH_CACHE_DIR", str(tmp_path / "cache"))
+
+
+def _fake_numpy(tmp_path, monkeypatch, include_dir="_core/include"):
+    package = tmp_path / "numpy"
+    header = package / include_dir / "numpy" / "arrayobject.h"
+    header.parent.mkdir(parents=True)
+    header.touch()
+    spec = ModuleSpec("numpy", None, is_package=True)
+    spec.submodule_search_locations = [str(package)]
+    monkeypatch.setattr(
+        importlib.util, "find_spec", lambda name: spec if name == "numpy" else None
+    )
+    return header
+
+
+def test_cache_roundtrip():
+    assert cache.load("test", "key") is None
+    cache.store("test", "key", {"a": [1]})
+    assert cache.load("test", "key") == {"a": [1]}
+
+
+@pytest.mark.parametrize("include_dir", ["_core/include", "core/include"])
+def test_find_numpy_include(tmp_path, monkeypatch, include_dir):
+    _fake_numpy(tmp_path, monkeypatch, include_dir)
+    assert resolver.find_numpy_include() == str(tmp_path / "numpy" / include_dir)
+
+
+def test_find_numpy_include_without_headers(tmp_path, monkeypatch):
+    _fake_numpy(tmp_path, monkeypatch).unlink()
+    with pytest.raises(FileNotFoundError):
+        resolver.find_numpy_include()
+
+
+def test_find_numpy_include_without_numpy(monkeypatch):
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    with pytest.raises(ModuleNotFoundError):
+        resolver.find_numpy_include()
+
+
+def test_resolve_paths_verifies_cached_numpy_include(tmp_path, monkeypatch):
+    (tmp_path / "inc").mkdir()
+    config = CythonConfig(
+        include_dirs=[str(tmp_path / "inc")],
+        site_packages=SitePackages.NONE,
+        use_numpy_include=True,
+    )
+    header = _fake_numpy(tmp_path, monkeypatch)
+    include_dirs, library_dirs = resolver.resolve_paths(config)
+    assert include_dirs == [
+        str(tmp_path / "inc"),
+        str(tmp_path / "numpy" / "_core" / "include"),
+    ]
+    assert library_dirs == []
+
+    # A cached path without the headers is resolved again
+    header.unlink()
+    with pytest.raises(FileNotFoundError):
+        resolver.resolve_paths(config)
+
+
+@pytest.mark.parametrize("setting", ["include_dirs", "library_dirs"])
+def test_resolve_paths_missing_directory(tmp_path, setting):
+    config = CythonConfig(
+        site_packages=SitePackages.NONE, **{setting: [str(tmp_path / "missing")]}
+    )
+    with pytest.raises(ValueError, match=f"{setting}: directory .*missing does not"):
+        resolver.resolve_paths(config)
+
+
+def test_cimported_packages(tmp_path):
+    pyx = tmp_path / "shapes.pyx"
+    pyx.write_text(
+        "from base_math.operations cimport Vector\n"
+        "cimport numpy as cnp, scipy.linalg\n"
+        "from libc.math cimport sqrt\n"
+        "from ..core cimport BaseOp\n"
+        "import json\n"
+    )
+    assert resolver.cimported_packages([pyx]) == {"base_math", "numpy", "scipy", "libc"}
+
+
+def test_build_pxd_index(tmp_path, monkeypatch):
+    from importlib.metadata import PackagePath
+
+    class FakeDistribution:
+        files = [
+            PackagePath("base_math/operations.pxd"),
+            PackagePath("base_math/operations.py"),
+            PackagePath("single.pxd"),
+            PackagePath("../../include/header.h"),
+        ]
+
+        def locate_file(self, path):
+            return tmp_path / path
+
+    monkeypatch.setattr(resolver, "distributions", lambda: [FakeDistribution()])
+    assert resolver.build_pxd_index() == {
+        "base_math": [str(tmp_path / "base_math")],
+        "single": [str(tmp_path / "single.pxd")],
+    }
+
+
+def test_stage_cimported_packages(tmp_path, monkeypatch):
+    installed = tmp_path / "site-packages"
+    (installed / "base_math").mkdir(parents=True)
+    (installed / "unused").mkdir()
+    monkeypatch.setattr(
+        resolver,
+        "pxd_index",
+        lambda: {
+            "base_math": [str(installed / "base_math")],
+            "unused": [str(installed / "unused")],
+            "geometry": [str(installed / "geometry")],
+        },
+    )
+    pyx = tmp_path / "shapes.pyx"
+    pyx.write_text(
+        "from base_math.operations cimport Vector\n"
+        "from geometry.other cimport Shape\n"
+        "from libc.math cimport sqrt\n"
+    )
+    staging_dir = tmp_path / "pxd"
+
+    links_dir = resolver.stage_cimported_packages([pyx], ["geometry"], staging_dir)
+    assert links_dir.parent == staging_dir
+    assert sorted(p.name for p in links_dir.iterdir()) == ["base_math"]
+    assert (links_dir / "base_math").resolve() == installed / "base_math"
+
+    # Concurrent builds staging the same packages share the links, other
+    # packages get a directory of their own
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        staged = list(
+            executor.map(
+                lambda _: resolver.stage_cimported_packages(
+                    [pyx], ["geometry"], staging_dir
+                ),
+                range(16),
+            )
+        )
+    assert set(staged) == {links_dir}
+    assert sorted(p.name for p in links_dir.iterdir()) == ["base_math"]
+    other = resolver.stage_cimported_packages([pyx], [], staging_dir)
+    assert other != links_dir
+    assert sorted(p.name for p in other.iterdir()) == ["base_math", "geometry"]
+    assert sorted(p.name for p in links_dir.iterdir()) == ["base_math"]
@@ -0,0 +1,83 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from hwh_backend.scheduler import CompileJob, CompileScheduler, MemoryBudget
+
+
+def test_budget_limits_concurrency():
+    budget = MemoryBudget(100)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def job():
+        with budget.reserve(40):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+
+    threads = [threading.Thread(target=job) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(peak) == 2
+
+
+def test_oversized_job_runs_alone():
+    budget = MemoryBudget(10)
+    with budget.reserve(50):
+        pass
+
+
+def test_estimate_uses_history(tmp_path):
+    source = tmp_path / "mod.c"
+    source.write_text("x" * 1000)
+    scheduler = CompileScheduler(1 << 30, 2, tmp_path / "history.json")
+    job = CompileJob("pkg.mod", [str(source)], "c", lambda: None)
+    default = scheduler.estimate(job)
+
+    scheduler.history["other"] = {"source_size": 100, "peak_rss": 100_000}
+    assert scheduler.estimate(job) == 1_000_000
+
+    scheduler.history["pkg.mod"] = {"source_size": 500, "peak_rss": 3_000_000}
+    assert scheduler.estimate(job) == 6_000_000
+    assert default != 6_000_000
+
+
+def test_run_measures_and_saves_history(tmp_path):
+    source = tmp_path / "mod.c"
+    source.write_text("int x;\n")
+    history = tmp_path / "history.json"
+    scheduler = CompileScheduler(1 << 30, 2, history)
+
+    def run():
+        scheduler.spawn([sys.executable, "-c", "pass"])
+
+    futures = scheduler.run([CompileJob("pkg.mod", [str(source)], "c", run)])
+    futures[0].result()
+
+    assert scheduler.history["pkg.mod"]["peak_rss"] > 0
+    assert "pkg.mod" in CompileScheduler(1, 1, history).history
+
+
+def test_spawn_failure(tmp_path):
+    from setuptools.errors import ExecError
+
+    scheduler = CompileScheduler(1 << 30, 1, tmp_path / "history.json")
+    with pytest.raises(ExecError):
+        scheduler.spawn([sys.executable, "-c", "raise SystemExit(3)"])
+
+
+def test_spawn_missing_command(tmp_path):
+    from setuptools.errors import ExecError
+
+    scheduler = CompileScheduler(1 << 30, 1, tmp_path / "history.json")
+    with pytest.raises(ExecError, match="No such file"):
+        scheduler.spawn([str(tmp_path / "no-such-compiler"), "-c", "mod.c"])
@@ -0,0 +1,91 @@
+import json
+import tarfile
+
+import pytest
+
+from hwh_backend.sdist import (
+    GENERATED_MANIFEST,
+    add_generated_sources,
+    generated_manifest,
+    pregenerated_sources,
+    translated_with_other_settings,
+)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "mod.pyx").write_text("cimport pkg.other\n")
+    (tmp_path / "pkg" / "other.pxd").write_text("cdef int x\n")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "mod.c").write_text("/* generated */\n")
+    return tmp_path
+
+
+def _dependencies(pyx_path):
+    return [pyx_path, "pkg/other.pxd", "/usr/include/libc/math.pxd"]
+
+
+def test_generated_manifest(project):
+    manifest = generated_manifest({"pkg/mod.pyx": "build/mod.c"}, _dependencies, "abc")
+    assert manifest["settings"] == "abc"
+    entry = manifest["files"]["pkg/mod.pyx"]
+    assert entry["c"] == "pkg/mod.c"
+    # Files outside the project aren't verified
+    assert sorted(entry["sources"]) == ["pkg/mod.pyx", "pkg/other.pxd"]
+
+    manifest = generated_manifest(
+        {"pkg/mod.pyx": "build/mod.c"}, _dependencies, "abc", in_sdist=False
+    )
+    assert manifest["files"]["pkg/mod.pyx"]["c"] == "build/mod.c"
+
+
+def test_pregenerated_sources(project):
+    manifest = generated_manifest({"pkg/mod.pyx": "build/mod.c"}, _dependencies, "abc")
+    (project / GENERATED_MANIFEST).write_text(json.dumps(manifest))
+    (project / "pkg" / "mod.c").write_text("/* generated */\n")
+
+    assert pregenerated_sources(project / GENERATED_MANIFEST, "abc") == {
+        "pkg/mod.pyx": "pkg/mod.c"
+    }
+    assert pregenerated_sources(project / GENERATED_MANIFEST, "other") == {}
+    assert pregenerated_sources(project / "missing.json", "abc") == {}
+
+    (project / "pkg" / "other.pxd").write_text("cdef long x\n")
+    assert pregenerated_sources(project / GENERATED_MANIFEST, "abc") == {}
+
+
+def test_translated_with_other_settings(project):
+    manifest = generated_manifest({"pkg/mod.pyx": "build/mod.c"}, _dependencies, "abc")
+    (project / GENERATED_MANIFEST).write_text(json.dumps(manifest))
+
+    path = project / GENERATED_MANIFEST
+    assert translated_with_other_settings(path, "abc") == set()
+    assert translated_with_other_settings(path, "other") == {"pkg/mod.pyx"}
+    assert translated_with_other_settings(project / "missing.json", "abc") == set()
+
+
+def test_add_generated_sources(project):
+    sdist = project / "pkg-0.1.0.tar.gz"
+    with tarfile.open(sdist, "w:gz") as tar:
+        tar.add(project / "pkg" / "mod.pyx", "pkg-0.1.0/pkg/mod.pyx")
+
+    sources = {"pkg/mod.pyx": "build/mod.c"}
+    manifest = generated_manifest(sources, _dependencies, "abc")
+    add_generated_sources(sdist, sources, manifest)
+
+    with tarfile.open(sdist) as tar:
+        names = sorted(tar.getnames())
+        c_member = tar.getmember("pkg-0.1.0/pkg/mod.c")
+        assert tar.extractfile(c_member).read() == b"/* generated */\n"
+        assert c_member.mtime >= tar.getmember("pkg-0.1.0/pkg/mod.pyx").mtime
+        added = json.load(tar.extractfile(f"pkg-0.1.0/{GENERATED_MANIFEST}"))
+    assert added == manifest
+    assert names == [
+        f"pkg-0.1.0/{GENERATED_MANIFEST}",
+        "pkg-0.1.0/pkg/mod.c",
+        "pkg-0.1.0/pkg/mod.pyx",
+        # Sources of the manifest the sdist was missing
+        "pkg-0.1.0/pkg/other.pxd",
+    ]
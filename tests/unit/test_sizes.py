@@ -0,0 +1,56 @@
+import shutil
+import subprocess
+
+import pytest
+
+from hwh_backend.elf import ElfInfo, elf_info
+from hwh_backend.sizes import BASELINE, record_sizes, size_report
+
+_SOURCE = """\
+int hwh_internal(int x) { return x + 1; }
+__attribute__((visibility("default"))) int PyInit_mod(void) { return hwh_internal(1); }
+"""
+
+
+def _shared_object(tmp_path, name, *flags):
+    source = tmp_path / "mod.c"
+    source.write_text(_SOURCE)
+    path = tmp_path / name
+    subprocess.run(
+        ["cc", "-shared", "-fPIC", *flags, str(source), "-o", str(path)], check=True
+    )
+    return path
+
+
+@pytest.mark.skipif(shutil.which("cc") is None, reason="needs a C compiler")
+def test_elf_info(tmp_path):
+    default = elf_info(_shared_object(tmp_path, "default.so"))
+    hidden = elf_info(_shared_object(tmp_path, "hidden.so", "-fvisibility=hidden"))
+    assert default.exported_symbols == hidden.exported_symbols + 1
+    assert 0 < hidden.loaded_size < hidden.file_size
+    assert default.relocations >= default.symbol_relocations
+    assert elf_info(tmp_path / "mod.c") is None
+
+
+def test_size_report(tmp_path, monkeypatch):
+    infos = iter([ElfInfo(1000, 800, 10, 50, 20), ElfInfo(750, 600, 1, 40, 12)])
+    monkeypatch.setattr("hwh_backend.sizes.elf_info", lambda path: next(infos))
+    record = tmp_path / "sizes.json"
+    record_sizes(record, BASELINE, {"pkg.mod": tmp_path / "mod.so"})
+    records = record_sizes(record, "optimize_size", {"pkg.mod": tmp_path / "mod.so"})
+
+    row = size_report(records, "optimize_size", ["pkg.mod"]).splitlines()[2]
+    assert row.split()[:4] == ["pkg.mod", "1000", "750", "-25.0%"]
+    assert row.endswith("10 -> 1")
+
+    records["pkg.other"] = {"optimize_size": records["pkg.mod"]["optimize_size"]}
+    report = size_report(records, "optimize_size", ["pkg.mod", "pkg.other"])
+    assert "pkg.other" in report
+    assert "no baseline of pkg.other: build once with size_baseline=true" in report
+
+
+def test_truncated_elf(tmp_path):
+    path = tmp_path / "truncated.so"
+    path.write_bytes(b"\x7fELF\x02\x01" + bytes(10))
+    with pytest.raises(ValueError, match="not a valid ELF file"):
+        elf_info(path)
@@ -0,0 +1,70 @@
+import shutil
+import subprocess
+
+import pytest
+
+from hwh_backend.strip import _has_debug_info, strip_extensions
+
+pytestmark = pytest.mark.skipif(
+    not all(shutil.which(t) for t in ("gcc", "strip", "objcopy", "readelf")),
+    reason="requires gcc and binutils",
+)
+
+
+@pytest.fixture
+def debug_so(tmp_path):
+    """Build a tiny shared object with debug info."""
+    root = tmp_path / "wheel"
+    pkg = root / "pkg"
+    pkg.mkdir(parents=True)
+    src = tmp_path / "mod.c"
+    src.write_text("int answer(void) { return 42; }\n")
+    so_path = pkg / "mod.so"
+    subprocess.run(
+        ["gcc", "-g", "-shared", "-fPIC", str(src), "-o", str(so_path)], check=True
+    )
+    return root, so_path
+
+
+def test_strip_without_debug_dir(debug_so):
+    root, so_path = debug_so
+    assert _has_debug_info(so_path)
+
+    assert strip_extensions(root) == [so_path]
+    assert not _has_debug_info(so_path)
+
+
+def test_split_debug(debug_so, tmp_path):
+    root, so_path = debug_so
+    debug_dir = tmp_path / "debug"
+
+    strip_extensions(root, debug_dir)
+
+    debug_files = list(debug_dir.rglob("*.debug"))
+    assert len(debug_files) == 1
+    assert _has_debug_info(debug_files[0])
+    assert not _has_debug_info(so_path)
+
+    # Stripping again must not overwrite the debug file with an empty one
+    assert strip_extensions(root, debug_dir) == [so_path]
+    assert list(debug_dir.rglob("*.debug")) == debug_files
+    assert _has_debug_info(debug_files[0])
+
+
+def test_strip_without_debug_info(tmp_path):
+    root = tmp_path / "wheel"
+    root.mkdir()
+    src = tmp_path / "mod.c"
+    src.write_text(
+        "static int helper(void) { return 1; }\n"
+        "int answer(void) { return helper(); }\n"
+    )
+    so_path = root / "mod.so"
+    subprocess.run(["gcc", "-shared", "-fPIC", str(src), "-o", str(so_path)], check=True)
+    assert not _has_debug_info(so_path)
+
+    assert strip_extensions(root, tmp_path / "debug") == [so_path]
+    assert ".symtab" not in subprocess.run(
+        ["readelf", "-S", "--wide", str(so_path)], capture_output=True, text=True
+    ).stdout
+    assert not (tmp_path / "debug").exists()
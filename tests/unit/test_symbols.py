@@ -0,0 +1,51 @@
+import json
+
+from hwh_backend.__main__ import main
+from hwh_backend.symbols import Symbolizer, sidecar_path, symbolize, write_symbol_map
+
+from .test_csource import GENERATED_FUNCTIONS, GENERATED_HEADER
+
+SYMBOL = "__pyx_f_3pkg_3mod_6BaseOp_compute"
+
+
+def _write_map(tmp_path):
+    c_path = tmp_path / "mod.c"
+    c_path.write_text(GENERATED_HEADER + GENERATED_FUNCTIONS)
+    ext_path = tmp_path / "mod.cpython-311-x86_64-linux-gnu.so"
+    write_symbol_map(c_path, ext_path)
+    return ext_path
+
+
+def test_write_symbol_map(tmp_path):
+    ext_path = _write_map(tmp_path)
+    data = json.loads(sidecar_path(ext_path).read_text())
+    assert data["module"] == "pkg.mod"
+    assert data["functions"][SYMBOL]["qualname"] == "BaseOp.compute"
+    assert data["functions"][SYMBOL]["line"] == 7
+
+
+def test_symbolize_collapsed_stacks(tmp_path):
+    _write_map(tmp_path)
+    symbolizer = Symbolizer()
+    symbolizer.load(tmp_path)
+    lines = [f"python;{SYMBOL};PyFloat_FromDouble 5\n"]
+    assert list(symbolize(lines, symbolizer)) == [
+        "python;pkg.mod.BaseOp.compute (pkg/mod.pyx:7);PyFloat_FromDouble 5\n"
+    ]
+
+
+def test_symbolize_perf_script(tmp_path, capsys):
+    ext_path = _write_map(tmp_path)
+    perf_output = tmp_path / "perf.txt"
+    perf_output.write_text(
+        f"\t    7f0012 {SYMBOL}+0x1a ({ext_path})\n"
+        # srcline of the line after the marker of line 8
+        "  mod.c:28\n"
+        "  other.c:28\n"
+    )
+    main(["symbolize", str(perf_output)])
+    assert capsys.readouterr().out.splitlines() == [
+        f"\t    7f0012 pkg.mod.BaseOp.compute (pkg/mod.pyx:7)+0x1a ({ext_path})",
+        "  pkg/mod.pyx:8",
+        "  other.c:28",
+    ]
@@ -0,0 +1,91 @@
+import pytest
+
+from hwh_backend import sysinfo
+from hwh_backend.sysinfo import default_parallelism, memory_limit, parse_size
+
+
+@pytest.mark.parametrize(
+    "size,expected",
+    [("512", 512), ("512M", 512 << 20), ("16G", 16 << 30), ("1.5GiB", 3 << 29)],
+)
+def test_parse_size(size, expected):
+    assert parse_size(size) == expected
+
+
+def test_parse_invalid_size():
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def _cgroup(tmp_path, monkeypatch, proc_cgroup: str = "0::/\n"):
+    root = tmp_path / "cgroup"
+    root.mkdir()
+    (tmp_path / "proc-cgroup").write_text(proc_cgroup)
+    monkeypatch.setattr(sysinfo, "_CGROUP_ROOT", root)
+    monkeypatch.setattr(sysinfo, "_PROC_CGROUP", tmp_path / "proc-cgroup")
+    return root
+
+
+def test_cgroup_v2_memory_limit(tmp_path, monkeypatch):
+    root = _cgroup(tmp_path, monkeypatch)
+    (root / "memory.max").write_text("1073741824\n")
+    assert memory_limit() == 1 << 30
+
+
+def test_cgroup_unlimited_memory(tmp_path, monkeypatch):
+    root = _cgroup(tmp_path, monkeypatch)
+    (root / "memory.max").write_text("max\n")
+    assert memory_limit() is None
+
+
+def test_cgroup_v2_memory_limit_of_ancestor(tmp_path, monkeypatch):
+    root = _cgroup(tmp_path, monkeypatch, "0::/user.slice/build.scope\n")
+    (root / "user.slice" / "build.scope").mkdir(parents=True)
+    (root / "user.slice" / "build.scope" / "memory.max").write_text("max\n")
+    (root / "user.slice" / "memory.max").write_text("2147483648\n")
+    assert memory_limit() == 2 << 30
+
+
+def test_cgroup_v1_lowest_memory_limit(tmp_path, monkeypatch):
+    root = _cgroup(tmp_path, monkeypatch, "5:memory:/docker/build\n0::/\n")
+    build = root / "memory" / "docker" / "build"
+    build.mkdir(parents=True)
+    (build / "memory.limit_in_bytes").write_text("4294967296\n")
+    (build.parent / "memory.limit_in_bytes").write_text("1073741824\n")
+    (root / "memory" / "memory.limit_in_bytes").write_text("9223372036854771712\n")
+    assert memory_limit() == 1 << 30
+
+
+def test_parallelism_from_cgroup_v2_quota(tmp_path, monkeypatch):
+    root = _cgroup(tmp_path, monkeypatch)
+    (root / "cpu.max").write_text("250000 100000\n")
+    monkeypatch.setattr(sysinfo.os, "sched_getaffinity", lambda pid: set(range(96)))
+    assert default_parallelism() == (3, "cgroup CPU quota")
+
+
+def test_parallelism_from_cgroup_v2_quota_of_ancestor(tmp_path, monkeypatch):
+    root = _cgroup(tmp_path, monkeypatch, "0::/ci/job\n")
+    (root / "ci" / "job").mkdir(parents=True)
+    (root / "ci" / "job" / "cpu.max").write_text("800000 100000\n")
+    (root / "ci" / "cpu.max").write_text("400000 100000\n")
+    monkeypatch.setattr(sysinfo.os, "sched_getaffinity", lambda pid: set(range(96)))
+    assert default_parallelism() == (4, "cgroup CPU quota")
+
+
+def test_parallelism_from_cgroup_v1_quota(tmp_path, monkeypatch):
+    root = _cgroup(tmp_path, monkeypatch, "3:cpu,cpuacct:/docker/build\n0::/\n")
+    cpu_dir = root / "cpu,cpuacct" / "docker" / "build"
+    cpu_dir.mkdir(parents=True)
+    (cpu_dir / "cpu.cfs_quota_us").write_text("800000\n")
+    (cpu_dir / "cpu.cfs_period_us").write_text("100000\n")
+    (cpu_dir.parent / "cpu.cfs_quota_us").write_text("-1\n")
+    (cpu_dir.parent / "cpu.cfs_period_us").write_text("100000\n")
+    monkeypatch.setattr(sysinfo.os, "sched_getaffinity", lambda pid: set(range(96)))
+    assert default_parallelism() == (8, "cgroup CPU quota")
+
+
+def test_parallelism_from_affinity(tmp_path, monkeypatch):
+    root = _cgroup(tmp_path, monkeypatch)
+    (root / "cpu.max").write_text("max 100000\n")
+    monkeypatch.setattr(sysinfo.os, "sched_getaffinity", lambda pid: {0, 1})
+    assert default_parallelism() == (2, "CPU affinity")
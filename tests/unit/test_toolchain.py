@@ -0,0 +1,83 @@
+import shutil
+
+import pytest
+
+from hwh_backend import toolchain
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch, tmp_path):
+    monkeypatch.setenv("HWH_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(toolchain, "_CAPABILITIES", None)
+
+
+def test_missing_compiler(monkeypatch):
+    monkeypatch.setenv("CC", "hwh-no-such-compiler")
+    assert not any(toolchain.capabilities().values())
+
+
+def test_probed_once(monkeypatch):
+    probed = []
+
+    def probe(compiler):
+        probed.append(compiler)
+        return {name: name == "flto=auto" for name in toolchain.PROBES}
+
+    monkeypatch.setenv("CC", "cc")
+    monkeypatch.setattr(toolchain, "probe_toolchain", probe)
+    assert toolchain.supports("flto=auto")
+    assert not toolchain.supports("fuse-ld=mold")
+
+    # A new process finds the capabilities in the per-user cache
+    monkeypatch.setattr(toolchain, "_CAPABILITIES", None)
+    assert toolchain.supports("flto=auto")
+    assert len(probed) == 1
+
+    toolchain.capabilities(refresh=True)
+    assert len(probed) == 2
+
+
+def test_key_follows_compiler(monkeypatch, tmp_path):
+    compiler = tmp_path / "cc"
+    compiler.write_text("#!/bin/sh\necho 'cc 1.0'\n")
+    compiler.chmod(0o755)
+    key = toolchain.toolchain_key([str(compiler)])
+    assert key == toolchain.toolchain_key([str(compiler)])
+    assert key != toolchain.toolchain_key([str(compiler), "-pthread"])
+
+    compiler.write_text("#!/bin/sh\necho 'cc 2.0'\n")
+    assert key != toolchain.toolchain_key([str(compiler)])
+
+
+@pytest.mark.skipif(shutil.which("cc") is None, reason="needs a C compiler")
+def test_probe_rejects_unknown_flags(monkeypatch):
+    monkeypatch.setitem(toolchain.PROBES, "bogus", ("compile", ["-fhwh-bogus"]))
+    results = toolchain.probe_toolchain(["cc"])
+    assert results["fvisibility=hidden"]
+    assert not results["bogus"]
+
+
+def test_select_linker(monkeypatch):
+    available = {"fuse-ld=lld", "fuse-ld=gold", "fuse-ld=bfd"}
+    monkeypatch.setattr(
+        toolchain, "_CAPABILITIES", {name: name in available for name in toolchain.PROBES}
+    )
+    assert toolchain.select_linker("auto") == "lld"
+    assert toolchain.select_linker("gold") == "gold"
+    with pytest.raises(ValueError, match="-fuse-ld=mold doesn't work"):
+        toolchain.select_linker("mold")
+
+    # gold is never picked automatically
+    available.remove("fuse-ld=lld")
+    monkeypatch.setattr(
+        toolchain, "_CAPABILITIES", {name: name in available for name in toolchain.PROBES}
+    )
+    assert toolchain.select_linker("auto") is None
+
+
+def test_select_default_linker_does_not_probe(monkeypatch):
+    def probe(refresh=False):
+        raise AssertionError("probed the toolchain")
+
+    monkeypatch.setattr(toolchain, "capabilities", probe)
+    assert toolchain.select_linker("default") is None